@@ -1,6 +1,7 @@
 from machine import Pin, PWM
 import neopixel
-import time
+import clock
+from effect_engine import EffectEngine
 
 # Pin definitions
 PIN_LED = 12        # LED output
@@ -48,19 +49,36 @@ class ActuatorManager:
         self.window_servo.freq(WINDOW_FREQ_OFF)
         self.window_servo.duty(WINDOW_CLOSED_DUTY)  # Start with window closed
         
+        # Timed effects (beeps, tunes, window moves) played without blocking
+        self.effects = EffectEngine()
+        
+        # Number of actuator commands issued (for the loop stats)
+        self.calls = 0
+        self.light_level = 0  # Brightness of the RGB strip in %, for the status page
+        
         print("Actuator manager initialized")
     
+    def tick(self):
+        """Advance the running timed effects
+        Returns:
+            int: Milliseconds until the next effect step, or None if idle
+        """
+        return self.effects.tick()
+    
     # LED methods
     def led_on(self):
         """Turn on the LED"""
+        self.calls += 1
         self.led.value(1)
     
     def led_off(self):
         """Turn off the LED"""
+        self.calls += 1
         self.led.value(0)
     
     def led_toggle(self):
         """Toggle the LED state"""
+        self.calls += 1
         self.led.value(not self.led.value())
     
     # Buzzer methods
@@ -69,12 +87,14 @@ class ActuatorManager:
         Args:
             freq: Frequency in Hz (default: 1000Hz)
         """
+        self.calls += 1
         self.buzzer.freq(freq)
         self.buzzer.duty(512)  # 50% duty cycle
     
     def buzzer_off(self):
         """Turn off buzzer"""
         self.buzzer.duty(0)
+        self.calls += 1
     
     def buzzer_beep(self, freq=880, duration=0.2):
         """Make the buzzer beep once
@@ -82,19 +102,49 @@ class ActuatorManager:
             freq: Frequency in Hz (default: 880Hz)
             duration: Beep duration in seconds (default: 0.2s)
         """
+        for delay in self.beep_steps(freq, duration):
+            clock.sleep(delay)
+    
+    def beep_steps(self, freq=880, duration=0.2):
+        """Step sequence for one beep (yields delays in seconds)
+        Args:
+            freq: Frequency in Hz (default: 880Hz)
+            duration: Beep duration in seconds (default: 0.2s)
+        """
         self.buzzer_on(freq)
-        time.sleep(duration)
-        self.buzzer_off()
+        try:
+            yield duration
+        finally:
+            self.buzzer_off()
+    
+    def start_beep(self, freq=880, duration=0.2):
+        """Beep without blocking (queued behind other buzzer effects)
+        Args:
+            freq: Frequency in Hz (default: 880Hz)
+            duration: Beep duration in seconds (default: 0.2s)
+        """
+        self.effects.submit(self.beep_steps(freq, duration), "buzzer")
     
     def play_happy_birthday(self):
         """Play Happy Birthday tune on buzzer"""
+        for delay in self.happy_birthday_steps():
+            clock.sleep(delay)
+    
+    def start_happy_birthday(self):
+        """Play Happy Birthday tune without blocking"""
+        self.effects.submit(self.happy_birthday_steps(), "buzzer")
+    
+    def happy_birthday_steps(self):
+        """Step sequence for the Happy Birthday tune (yields delays in seconds)"""
         notes = [294, 440, 392, 532, 494, 392, 440, 392, 587, 532, 
                  392, 784, 659, 532, 494, 440, 698, 659, 532, 587, 532]
-        for note in notes:
-            self.buzzer.freq(note)
-            self.buzzer.duty(1000)
-            time.sleep(0.25)
-        self.buzzer.duty(0)
+        try:
+            for note in notes:
+                self.buzzer.freq(note)
+                self.buzzer.duty(1000)
+                yield 0.25
+        finally:
+            self.buzzer.duty(0)
     
     # Servo methods
     def servo_angle(self, angle):
@@ -102,6 +152,7 @@ class ActuatorManager:
         Args:
             angle: Angle in degrees (0-180)
         """
+        self.calls += 1
         self.servo.freq(SERVO_FREQ)
 
         # Map angle to duty cycle
@@ -141,6 +192,8 @@ class ActuatorManager:
         g = int(g * brightness / 100)
         b = int(b * brightness / 100)
         
+        self.calls += 1
+        self.light_level = round(max(r, g, b) * 100 / 255)
         # Set all pixels
         for i in range(NUM_PIXELS):
             self.neopixel[i] = (r, g, b)
@@ -161,6 +214,7 @@ class ActuatorManager:
             g = int(g * brightness / 100)
             b = int(b * brightness / 100)
             
+            self.calls += 1
             self.neopixel[index] = (r, g, b)
             self.neopixel.write()
     
@@ -190,6 +244,7 @@ class ActuatorManager:
         Args:
             speed: Motor speed (0-1023)
         """
+        self.calls += 1
         self.motor_a.duty(speed)
         self.motor_b.duty(1)
     
@@ -198,32 +253,56 @@ class ActuatorManager:
         Args:
             speed: Motor speed (0-1023)
         """
+        self.calls += 1
         self.motor_a.duty(0)
         self.motor_b.duty(speed)
     
     def motor_stop(self):
         """Stop the motor"""
+        self.calls += 1
         self.motor_a.duty(0)
         self.motor_b.duty(0)
     
     # Window methods
     def window_open(self):
         """Open the window"""
-        self.window_servo.freq(WINDOW_FREQ)
-        self.window_servo.duty(WINDOW_OPEN_DUTY)
-        time.sleep(1)
-        self.window_servo.freq(WINDOW_FREQ_OFF)
+        for delay in self.window_open_steps():
+            clock.sleep(delay)
 
+    def window_open_steps(self):
+        """Step sequence that opens the window (yields delays in seconds)"""
+        yield from self._window_move_steps(WINDOW_OPEN_DUTY)
+    
+    def start_window_open(self):
+        """Open the window without blocking (overrides a move in progress)"""
+        self.effects.submit(self.window_open_steps(), "window", replace=True)
     
     def window_close(self):
         """Close the window"""
+        for delay in self.window_close_steps():
+            clock.sleep(delay)
+
+    def window_close_steps(self):
+        """Step sequence that closes the window (yields delays in seconds)"""
+        yield from self._window_move_steps(WINDOW_CLOSED_DUTY)
+    
+    def start_window_close(self):
+        """Close the window without blocking (overrides a move in progress)"""
+        self.effects.submit(self.window_close_steps(), "window", replace=True)
+
+    def _window_move_steps(self, duty):
+        self.calls += 1
+        # Drive the servo, give it a second to travel, then cut the PWM
         self.window_servo.freq(WINDOW_FREQ)
-        self.window_servo.duty(WINDOW_CLOSED_DUTY)
-        time.sleep(1)
-        self.window_servo.freq(WINDOW_FREQ_OFF)
+        self.window_servo.duty(duty)
+        try:
+            yield 1
+        finally:
+            self.window_servo.freq(WINDOW_FREQ_OFF)
     
     def window_toggle(self):
         """Toggle the window state"""
+        self.calls += 1
         current_duty = self.window_servo.duty()
         if current_duty == WINDOW_CLOSED_DUTY:
             self.window_servo.duty(WINDOW_OPEN_DUTY)
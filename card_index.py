@@ -0,0 +1,172 @@
+HASH_MASK = 0x3FFFFFFF   # Keep hashes small ints (no heap allocation in MicroPython)
+
+
+def uid_hash(uid, length=None):
+    """Fold UID bytes into a small integer
+    Args:
+        uid: UID bytes (list, tuple, bytes or bytearray)
+        length: Number of bytes to use (default: all)
+    Returns:
+        int: 30-bit hash, different for UIDs of different lengths too
+    """
+    if length is None:
+        length = len(uid)
+    h = length
+    for i in range(length):
+        h = (h * 31 + uid[i]) & HASH_MASK
+    return h
+
+
+def parse_uid(card_id):
+    """Get the UID bytes of a card ID
+    Args:
+        card_id: UID bytes, or the "84-12-125-63" form RFIDManager prints
+    Returns:
+        bytes: UID
+    """
+    if isinstance(card_id, str):
+        return bytes(int(part) for part in card_id.split("-"))
+    return bytes(card_id)
+
+
+def format_uid(uid):
+    """Get the "84-12-125-63" form of UID bytes"""
+    return "-".join(str(b) for b in uid)
+
+
+def encode_name(name, size):
+    """Get the UTF-8 bytes of an owner name, cut to at most size bytes
+    on a character boundary"""
+    data = name.encode("utf-8")
+    if len(data) <= size:
+        return data
+    end = size
+    while end > 0 and data[end] & 0xC0 == 0x80:
+        end -= 1                 # Continuation byte: the character starts earlier
+    return data[:end]
+
+
+def decode_name(data, strict=False):
+    """Get an owner name from its UTF-8 bytes
+    Args:
+        data: Name bytes
+        strict: Raise UnicodeError for bytes that are not UTF-8, instead
+            of showing the bytes that are not ASCII as "?"
+    """
+    try:
+        return bytes(data).decode("utf-8")
+    except UnicodeError:
+        if strict:
+            raise
+        return "".join(chr(b) if b < 0x80 else "?" for b in data)
+
+
+def _same(key, uid, length):
+    if len(key) != length:
+        return False
+    for i in range(length):
+        if key[i] != uid[i]:
+            return False
+    return True
+
+
+class CardIndex:
+    """Cards keyed on their raw UID bytes
+
+    Entries are stored under a 30-bit hash of the UID and hold the UID as
+    bytes, so a lookup is one small-int hash, one dict probe and a byte
+    compare: no strings or other objects are built per check, and two
+    cards never share an entry (hash collisions are told apart by the
+    compare). Each entry costs a short bytes object and a tuple, so
+    thousands of tags fit in a few tens of kB.
+    """
+
+    def __init__(self):
+        self.slots = {}    # Hash -> (uid bytes, value), or a list of them on a hash collision
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, uid):
+        return self.find(uid) is not None
+
+    def find(self, uid, length=None):
+        """Get the entry of a UID
+        Args:
+            uid: UID bytes
+            length: Number of bytes of uid to use (default: all)
+        Returns:
+            tuple: (uid bytes, value), or None if the UID is not enrolled
+        """
+        if length is None:
+            length = len(uid)
+        entry = self.slots.get(uid_hash(uid, length))
+        if entry is None:
+            return None
+        if type(entry) is tuple:
+            return entry if _same(entry[0], uid, length) else None
+        for item in entry:
+            if _same(item[0], uid, length):
+                return item
+        return None
+
+    def get(self, uid, default=None, length=None):
+        """Get the value enrolled for a UID, or default"""
+        entry = self.find(uid, length)
+        return default if entry is None else entry[1]
+
+    def add(self, uid, value):
+        """Enroll a UID, replacing its value if it is already enrolled"""
+        uid = bytes(uid)
+        h = uid_hash(uid)
+        entry = self.slots.get(h)
+        if entry is None:
+            self.slots[h] = (uid, value)
+        elif type(entry) is tuple:
+            if entry[0] == uid:
+                self.slots[h] = (uid, value)
+                return
+            self.slots[h] = [entry, (uid, value)]
+        else:
+            for i, item in enumerate(entry):
+                if item[0] == uid:
+                    entry[i] = (uid, value)
+                    return
+            entry.append((uid, value))
+        self.count += 1
+
+    def remove(self, uid):
+        """Remove a UID
+        Returns:
+            The value it had, or None if it was not enrolled
+        """
+        uid = bytes(uid)
+        h = uid_hash(uid)
+        entry = self.slots.get(h)
+        if entry is None:
+            return None
+        if type(entry) is tuple:
+            if entry[0] != uid:
+                return None
+            del self.slots[h]
+            self.count -= 1
+            return entry[1]
+        for i, item in enumerate(entry):
+            if item[0] == uid:
+                entry.pop(i)
+                if len(entry) == 1:
+                    self.slots[h] = entry[0]
+                self.count -= 1
+                return item[1]
+        return None
+
+    def items(self):
+        """Get every (uid bytes, value) pair"""
+        items = []
+        for entry in self.slots.values():
+            if type(entry) is tuple:
+                items.append(entry)
+            else:
+                items.extend(entry)
+        return items
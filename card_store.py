@@ -0,0 +1,372 @@
+import os
+import struct
+from binascii import crc32
+from card_index import CardIndex, format_uid, encode_name, decode_name
+from schedule import SLEEP_TIME, WAKE_TIME
+import clock
+
+STORE_PATH = "cards.db"
+HEADER = b"CST1"             # File format marker and version
+
+# Record: magic, type, payload length, payload, CRC32 of type/length/payload
+RECORD_MAGIC = 0xA5
+RECORD_HEAD = "<BBB"
+RECORD_HEAD_SIZE = 3
+RECORD_CRC_SIZE = 4
+ENROLL = 1                   # Payload: UID length, UID, sleep time, wake time, name
+REVOKE = 2                   # Payload: UID length, UID
+
+NAME_MAX = 32                # Bytes of the owner name kept
+COMPACT_MIN_BYTES = 4096     # Never compact for less dead data than one flash block
+
+
+class Profile:
+    """Owner profile of an enrolled card
+
+    Attributes:
+        uid: UID bytes
+        name: Owner name
+        sleep_time: Bedtime in seconds since midnight
+        wake_time: Wake-up time in seconds since midnight
+    """
+
+    def __init__(self, uid, name, sleep_time=SLEEP_TIME, wake_time=WAKE_TIME):
+        self.uid = bytes(uid)
+        self.name = name
+        self.sleep_time = sleep_time
+        self.wake_time = wake_time
+
+    def __repr__(self):
+        return f"Profile({format_uid(self.uid)}, {self.name})"
+
+
+def _encode(kind, payload):
+    head = struct.pack(RECORD_HEAD, RECORD_MAGIC, kind, len(payload))
+    crc = crc32(payload, crc32(head[1:]))
+    return head + payload + struct.pack("<I", crc)
+
+
+def _read_record(f):
+    # Read the record at the file position
+    # Returns (type, payload, size), or None at the end or a damaged record
+    head = f.read(RECORD_HEAD_SIZE)
+    if len(head) < RECORD_HEAD_SIZE or head[0] != RECORD_MAGIC:
+        return None
+    length = head[2]
+    body = f.read(length + RECORD_CRC_SIZE)
+    if len(body) < length + RECORD_CRC_SIZE:
+        return None
+    payload = body[:length]
+    if struct.unpack("<I", body[length:])[0] != crc32(payload, crc32(head[1:])):
+        return None
+    return (head[1], payload, RECORD_HEAD_SIZE + length + RECORD_CRC_SIZE)
+
+
+def _exists(path):
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+
+class CardStore:
+    """Enrolled cards and their owner profiles in an append-only log
+
+    Every enrollment or revocation appends one CRC-checked record to the
+    log file, so a change costs the record's bytes and nothing is
+    rewritten in place. The log is scanned on first use (not at
+    construction) into a CardIndex of UID -> record offset; profiles are
+    read back from their record when asked for. Superseded and revoked
+    records are dead weight until compaction rewrites the live records
+    to a new file, which happens once the dead bytes outweigh the live
+    ones (and fill at least a flash block).
+
+    Damaged bytes (a write torn by a reset, a corrupted sector) are
+    skipped up to the next record with a good CRC, and the file is
+    rewritten before the next append so records never land behind the
+    damage. Works on a plain file on Linux as well as on the board's
+    flash filesystem.
+    """
+
+    def __init__(self, path=None, compact_min_bytes=COMPACT_MIN_BYTES):
+        self.path = STORE_PATH if path is None else path
+        self.compact_min_bytes = compact_min_bytes
+        self.index = None           # CardIndex of UID -> offset, built on first use
+        self.size = 0               # End of the scanned file, where the next record goes
+        self.live_bytes = 0
+        self.dead_bytes = 0
+        self.damaged = False        # The file holds bytes that are not valid records
+        self.bytes_logged = 0       # Record bytes appended for changes
+        self.bytes_written = 0      # All bytes written, compaction included
+        self.compactions = 0
+        self.load_ms = 0
+
+    # ---- Loading ----
+
+    def _ensure_loaded(self):
+        if self.index is None:
+            self.load()
+
+    def _ensure_current(self):
+        # Before using record offsets: another CardStore on the same file
+        # may have appended or compacted since the scan
+        self._ensure_loaded()
+        try:
+            size = os.stat(self.path)[6]
+        except OSError:
+            size = 0
+        if size != self.size:
+            self.load()
+
+    def load(self):
+        """Scan the log and build the index
+        Returns:
+            int: Number of enrolled cards
+        """
+        start = clock.ticks_ms()
+        tmp = self.path + ".tmp"
+        if _exists(tmp):
+            if _exists(self.path):
+                os.remove(tmp)                  # Compaction did not finish: the log is intact
+            else:
+                os.rename(tmp, self.path)       # Reset between removing the log and renaming
+        self.index = CardIndex()
+        self.size = 0
+        self.live_bytes = 0
+        self.dead_bytes = 0
+        self.damaged = False
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            self.load_ms = clock.ticks_diff(clock.ticks_ms(), start)
+            return 0
+        with f:
+            if f.read(len(HEADER)) != HEADER:
+                self.damaged = True
+                print(f"Card store {self.path}: not a card store, starting empty")
+            else:
+                end = f.seek(0, 2)
+                offset = len(HEADER)
+                lost = 0
+                while offset < end:
+                    f.seek(offset)
+                    record = _read_record(f)
+                    if record is None:
+                        # Resynchronise on the next record with a good CRC
+                        lost += 1
+                        offset += 1
+                        continue
+                    kind, payload, size = record
+                    self._apply(kind, payload, size, offset)
+                    offset += size
+                self.size = offset
+                if lost:
+                    self.damaged = True
+                    print(f"Card store {self.path}: {lost} damaged bytes dropped")
+        self.load_ms = clock.ticks_diff(clock.ticks_ms(), start)
+        return len(self.index)
+
+    def _apply(self, kind, payload, size, offset):
+        # Update the index and the byte counts for one record
+        uid = payload[1:1 + payload[0]]
+        old = self.index.find(uid)
+        if old is not None:
+            self.live_bytes -= old[1][1]
+            self.dead_bytes += old[1][1]
+        if kind == ENROLL:
+            self.index.add(uid, (offset, size))
+            self.live_bytes += size
+        else:
+            if old is not None:
+                self.index.remove(uid)
+            self.dead_bytes += size
+
+    # ---- Queries ----
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self.index)
+
+    def __contains__(self, uid):
+        return self.is_enrolled(uid)
+
+    def is_enrolled(self, uid, length=None):
+        """Check if a card is enrolled
+        Args:
+            uid: UID bytes
+            length: Number of bytes of uid to use (default: all)
+        """
+        self._ensure_loaded()
+        return self.index.find(uid, length) is not None
+
+    def get(self, uid, length=None):
+        """Get the profile of an enrolled card
+        Returns:
+            Profile, or None if the card is not enrolled
+        """
+        self._ensure_current()
+        entry = self.index.find(uid, length)
+        if entry is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(entry[1][0])
+            record = _read_record(f)
+        if record is None:
+            return None
+        return self._profile(record[1])
+
+    def profiles(self):
+        """Get the profiles of all enrolled cards, in log order"""
+        self._ensure_current()
+        offsets = sorted(value[0] for uid, value in self.index.items())
+        profiles = []
+        if not offsets:
+            return profiles        # The file may not exist yet
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                record = _read_record(f)
+                if record is not None:
+                    profiles.append(self._profile(record[1]))
+        return profiles
+
+    @staticmethod
+    def _profile(payload):
+        n = payload[0]
+        sleep_time, wake_time = struct.unpack("<II", payload[1 + n:9 + n])
+        return Profile(payload[1:1 + n], decode_name(payload[9 + n:]), sleep_time, wake_time)
+
+    # ---- Changes ----
+
+    def enroll(self, uid, name, sleep_time=SLEEP_TIME, wake_time=WAKE_TIME):
+        """Enroll a card, or replace the profile of an enrolled one
+        Args:
+            uid: UID bytes
+            name: Owner name (cut to NAME_MAX bytes, on a character boundary)
+            sleep_time: Bedtime in seconds since midnight
+            wake_time: Wake-up time in seconds since midnight
+        """
+        uid = bytes(uid)
+        name = encode_name(name, NAME_MAX)
+        payload = bytes([len(uid)]) + uid + struct.pack("<II", sleep_time, wake_time) + name
+        self._append(ENROLL, payload)
+
+    def revoke(self, uid):
+        """Revoke an enrolled card
+        Returns:
+            bool: True if the card was enrolled
+        """
+        self._ensure_loaded()
+        uid = bytes(uid)
+        if self.index.find(uid) is None:
+            return False
+        self._append(REVOKE, bytes([len(uid)]) + uid)
+        return True
+
+    def _append(self, kind, payload):
+        self._ensure_current()
+        if self.damaged:
+            self.compact()
+        record = _encode(kind, payload)
+        if self.size == 0:
+            data = HEADER + record      # New file
+            offset = len(HEADER)
+        else:
+            data = record
+            offset = self.size
+        with open(self.path, "ab") as f:
+            f.write(data)
+        self.size = offset + len(record)
+        self.bytes_logged += len(record)
+        self.bytes_written += len(data)
+        self._apply(kind, payload, len(record), offset)
+        if self.dead_bytes >= self.compact_min_bytes and self.dead_bytes > self.live_bytes:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with only the live records
+        Returns:
+            int: Bytes freed
+        """
+        self._ensure_loaded()
+        before = self.size
+        tmp = self.path + ".tmp"
+        entries = sorted(((value[0], value[1], uid) for uid, value in self.index.items()))
+        index = CardIndex()
+        offset = len(HEADER)
+        with open(tmp, "wb") as out:
+            out.write(HEADER)
+            if entries:
+                with open(self.path, "rb") as f:
+                    for old_offset, size, uid in entries:
+                        f.seek(old_offset)
+                        out.write(f.read(size))
+                        index.add(uid, (offset, size))
+                        offset += size
+        try:
+            os.rename(tmp, self.path)
+        except OSError:
+            # Filesystems without rename-over (FAT): a reset in between is
+            # recovered by load()
+            os.remove(self.path)
+            os.rename(tmp, self.path)
+        self.index = index
+        self.bytes_written += offset
+        self.size = offset
+        self.live_bytes = offset - len(HEADER)
+        self.dead_bytes = 0
+        self.damaged = False
+        self.compactions += 1
+        return before - offset
+
+
+BENCH_CARDS = 1000
+
+
+def store_benchmark(path="cards_bench.db", cards=BENCH_CARDS):
+    """Time enrollment, revocation, loading and recovery on a scratch file"""
+    for name in (path, path + ".tmp"):
+        if _exists(name):
+            os.remove(name)
+    uids = [bytes([(i >> 8) & 0xFF, i & 0xFF, 0x5A, (i * 7) & 0xFF]) for i in range(cards)]
+    store = CardStore(path)
+    start = clock.ticks_us()
+    for i, uid in enumerate(uids):
+        store.enroll(uid, f"Owner {i}")
+    enroll_us = clock.ticks_diff(clock.ticks_us(), start) // cards
+    start = clock.ticks_us()
+    for uid in uids[::2]:
+        store.revoke(uid)
+    revoke_us = clock.ticks_diff(clock.ticks_us(), start) // len(uids[::2])
+    print(f"Card store: {cards} enrolled ({enroll_us}us each), {len(uids[::2])} revoked ({revoke_us}us each)")
+    print(f"  file {store.size} bytes, {store.compactions} compactions, "
+          f"write amplification {store.bytes_written / store.bytes_logged:.2f}")
+
+    store = CardStore(path)
+    start = clock.ticks_us()
+    store.load()
+    print(f"  load {clock.ticks_diff(clock.ticks_us(), start)}us for {len(store)} cards")
+    start = clock.ticks_us()
+    for uid in uids:
+        store.is_enrolled(uid)
+    print(f"  lookup {clock.ticks_diff(clock.ticks_us(), start) // cards}us")
+    start = clock.ticks_us()
+    store.get(uids[-1])
+    print(f"  profile read {clock.ticks_diff(clock.ticks_us(), start)}us")
+
+    with open(path, "ab") as f:
+        f.write(bytes([RECORD_MAGIC, ENROLL, 40]) + b"torn")   # Reset in the middle of a write
+    store = CardStore(path)
+    start = clock.ticks_us()
+    store.load()
+    load_us = clock.ticks_diff(clock.ticks_us(), start)
+    store.enroll(uids[0], "Owner 0")
+    recovered = CardStore(path)
+    print(f"  torn write: load {load_us}us, {len(recovered)} cards after the next enroll, "
+          f"damaged {recovered.damaged}")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    store_benchmark()
@@ -0,0 +1,246 @@
+import time as _time
+
+# Every sleep and time query in the managers goes through this module, so the
+# wall clock can be swapped for a VirtualClock that jumps straight to the next
+# deadline (a full simulated night then runs in milliseconds on a host).
+
+try:
+    _ticks_ms = _time.ticks_ms
+    _ticks_us = _time.ticks_us
+    _ticks_diff = _time.ticks_diff
+    _ticks_add = _time.ticks_add
+    _sleep_ms = _time.sleep_ms
+    _sleep_us = _time.sleep_us
+except AttributeError:
+    # CPython host: emulate the MicroPython helpers
+    def _ticks_ms():
+        return int(_time.monotonic() * 1000)
+
+    def _ticks_us():
+        return int(_time.monotonic() * 1000000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+    def _ticks_add(a, b):
+        return a + b
+
+    def _sleep_ms(ms):
+        _time.sleep(ms / 1000)
+
+    def _sleep_us(us):
+        _time.sleep(us / 1000000)
+
+
+class RealClock:
+    """Wall clock backed by the time module (the default)"""
+
+    def time(self):
+        return _time.time()
+
+    def localtime(self, secs=None):
+        if secs is None:
+            return _time.localtime()
+        return _time.localtime(secs)
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+    def sleep_ms(self, ms):
+        _sleep_ms(ms)
+
+    def sleep_us(self, us):
+        _sleep_us(us)
+
+    def ticks_ms(self):
+        return _ticks_ms()
+
+    def ticks_us(self):
+        return _ticks_us()
+
+    def ticks_diff(self, a, b):
+        return _ticks_diff(a, b)
+
+    def ticks_add(self, a, b):
+        return _ticks_add(a, b)
+
+
+class VirtualClock:
+    """Discrete-event clock: time only moves when slept on or advanced
+
+    Sleeping advances virtual time instantly. run_until() repeatedly calls a
+    step function and then jumps directly to the next deadline, taken from
+    the one-shot timers (call_at/call_later) and the registered deadline
+    sources, instead of polling through the time in between.
+
+    Args:
+        start: Initial time in seconds since the epoch (default: 0)
+    """
+
+    def __init__(self, start=0):
+        self.start = start
+        self.elapsed_us = 0
+        self.timers = []             # Sorted [due_us, callback] one-shot timers
+        self.deadline_sources = []   # Callables returning the next deadline time
+        self.steps = 0               # Number of run_until() steps so far
+
+    def time(self):
+        return self.start + self.elapsed_us / 1000000
+
+    def localtime(self, secs=None):
+        # The virtual clock runs in UTC, like a device without a time zone
+        if secs is None:
+            secs = self.time()
+        return _time.gmtime(int(secs))
+
+    def sleep(self, seconds):
+        self.advance_us(round(seconds * 1000000))
+
+    def sleep_ms(self, ms):
+        self.advance_us(ms * 1000)
+
+    def sleep_us(self, us):
+        self.advance_us(us)
+
+    def ticks_ms(self):
+        return self.elapsed_us // 1000
+
+    def ticks_us(self):
+        return self.elapsed_us
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+    def ticks_add(self, a, b):
+        return a + b
+
+    def advance_us(self, us):
+        """Move time forward, firing the timers that fall due on the way
+        Args:
+            us: Microseconds to advance
+        """
+        target = self.elapsed_us + max(0, int(us))
+        while self.timers and self.timers[0][0] <= target:
+            due, callback = self.timers.pop(0)
+            self.elapsed_us = max(self.elapsed_us, due)
+            callback()
+        self.elapsed_us = max(self.elapsed_us, target)
+
+    def advance_to(self, when):
+        """Move time forward to an absolute time
+        Args:
+            when: Time in seconds since the epoch
+        """
+        self.advance_us(round((when - self.time()) * 1000000))
+
+    def call_at(self, when, callback):
+        """Run callback once the clock reaches an absolute time
+        Args:
+            when: Time in seconds since the epoch
+            callback: Callable without arguments
+        """
+        due = round((when - self.start) * 1000000)
+        index = 0
+        while index < len(self.timers) and self.timers[index][0] <= due:
+            index += 1
+        self.timers.insert(index, [due, callback])
+
+    def call_later(self, delay, callback):
+        """Run callback after delay seconds of virtual time"""
+        self.call_at(self.time() + delay, callback)
+
+    def add_deadline_source(self, source):
+        """Register a callable returning the time of its next deadline
+        Args:
+            source: Callable returning seconds since the epoch, or None
+        """
+        self.deadline_sources.append(source)
+
+    def remove_deadline_source(self, source):
+        if source in self.deadline_sources:
+            self.deadline_sources.remove(source)
+
+    def next_deadline(self):
+        """Get the earliest future deadline
+        Returns:
+            float: Seconds since the epoch, or None if nothing is pending
+        """
+        now = self.time()
+        best = None
+        if self.timers:
+            best = self.start + self.timers[0][0] / 1000000
+        for source in self.deadline_sources:
+            when = source()
+            if when is not None and when > now and (best is None or when < best):
+                best = when
+        return best
+
+    def run_until(self, end, step):
+        """Discrete-event loop: run step, then jump to the next deadline
+        Args:
+            end: Stop time in seconds since the epoch
+            step: Callable run at every deadline
+        """
+        while self.time() < end:
+            step()
+            self.steps += 1
+            when = self.next_deadline()
+            if when is None or when > end:
+                when = end
+            self.advance_to(max(when, self.time() + 0.000001))
+
+
+_clock = RealClock()
+
+
+def install(new_clock):
+    """Replace the active clock
+    Args:
+        new_clock: RealClock or VirtualClock instance
+    Returns: The previously active clock
+    """
+    global _clock
+    previous = _clock
+    _clock = new_clock
+    return previous
+
+
+def get_clock():
+    """Get the active clock"""
+    return _clock
+
+
+def time():
+    return _clock.time()
+
+
+def localtime(secs=None):
+    return _clock.localtime(secs)
+
+
+def sleep(seconds):
+    _clock.sleep(seconds)
+
+
+def sleep_ms(ms):
+    _clock.sleep_ms(ms)
+
+
+def sleep_us(us):
+    _clock.sleep_us(us)
+
+
+def ticks_ms():
+    return _clock.ticks_ms()
+
+
+def ticks_us():
+    return _clock.ticks_us()
+
+
+def ticks_diff(a, b):
+    return _clock.ticks_diff(a, b)
+
+
+def ticks_add(a, b):
+    return _clock.ticks_add(a, b)
@@ -1,15 +1,14 @@
 from machine import Pin, PWM
-import time
+import clock
 import neopixel
+from input_events import InputEvents, RELEASE
+from schedule import get_schedule
 
 # Pin definitions
 COFFEE_BUTTON = 16  # Button 1 (left button) with pull-up
 BUZZER_PIN = 25     # Buzzer for coffee sounds
 LED_PIN = 26        # Neopixel RGB LEDs
 
-# Coffee time settings
-COFFEE_CUTOFF_HOUR = 17  # 5 PM - no coffee after this time
-
 # Create a class for the coffee habit tracker
 class CoffeeHabitTracker:
     def __init__(self):
@@ -36,70 +35,89 @@ class CoffeeHabitTracker:
         Returns:
             bool: True if coffee is allowed, False if too late
         """
-        current_time = time.localtime()
-        current_hour = current_time[3]  # Hour in 24h format
+        t = clock.localtime()
+        current_time = t[3] * 3600 + t[4] * 60 + t[5]
         
-        # No coffee after cutoff time (5 PM)
-        return current_hour < COFFEE_CUTOFF_HOUR
+        # No coffee from the soft cutoff (5 PM) until wake time
+        windows = get_schedule().active_windows(current_time)
+        return "coffee_warning" not in windows and "coffee_denied" not in windows
     
     def brew_coffee(self):
         """Simulate coffee brewing with lights and sounds"""
+        for delay in self.brew_steps():
+            clock.sleep(delay)
+    
+    def brew_steps(self):
+        """Start brewing and return its step sequence
+        
+        The sequence is a generator that yields the delay in seconds before
+        its next step, so it can be played blocking or as a separate task.
+        """
         self.brewing = True
         self.coffee_count += 1
-        
+        return self._brew_sequence()
+    
+    def _brew_sequence(self):
         print("Brewing coffee...")
         
-        # Set all LEDs to coffee brown color
-        self.set_coffee_color()
-        
-        # Brewing phases with sounds
-        # Phase 1: Initial water heating
-        self.buzzer.freq(220)  # Low hum for heating
-        self.buzzer.duty(300)  # Lower volume
-        time.sleep(1)
-        
-        # Phase 2: Initial brewing/dripping
-        for _ in range(5):
-            self.buzzer.freq(900)  # High pitch for water
-            self.buzzer.duty(200)
-            time.sleep(0.1)
-            self.buzzer.duty(0)
-            time.sleep(0.2)
-        
-        # Phase 3: Main brewing phase
-        self.buzzer.freq(350)  # Medium pitch for steady brewing
-        self.buzzer.duty(400)
-        time.sleep(1.5)
-        
-        # Phase 4: Final drips
-        for _ in range(3):
-            self.buzzer.freq(800)
-            self.buzzer.duty(200)
-            time.sleep(0.1)
-            self.buzzer.duty(0)
-            time.sleep(0.3)
-        
-        # Coffee ready!
-        self.buzzer.duty(0)  # Stop sound
-        
-        # Pulse the LEDs to indicate coffee is ready
-        for brightness in range(100, 0, -10):
-            self.set_coffee_color(brightness)
-            time.sleep(0.05)
-        
-        for brightness in range(0, 101, 10):
-            self.set_coffee_color(brightness)
-            time.sleep(0.05)
+        try:
+            # Set all LEDs to coffee brown color
+            self.set_coffee_color()
+        
+            # Brewing phases with sounds
+            # Phase 1: Initial water heating
+            self.buzzer.freq(220)  # Low hum for heating
+            self.buzzer.duty(300)  # Lower volume
+            yield 1
+        
+            # Phase 2: Initial brewing/dripping
+            for _ in range(5):
+                self.buzzer.freq(900)  # High pitch for water
+                self.buzzer.duty(200)
+                yield 0.1
+                self.buzzer.duty(0)
+                yield 0.2
+        
+            # Phase 3: Main brewing phase
+            self.buzzer.freq(350)  # Medium pitch for steady brewing
+            self.buzzer.duty(400)
+            yield 1.5
+        
+            # Phase 4: Final drips
+            for _ in range(3):
+                self.buzzer.freq(800)
+                self.buzzer.duty(200)
+                yield 0.1
+                self.buzzer.duty(0)
+                yield 0.3
+        
+            # Coffee ready!
+            self.buzzer.duty(0)  # Stop sound
+        
+            # Pulse the LEDs to indicate coffee is ready
+            for brightness in range(100, 0, -10):
+                self.set_coffee_color(brightness)
+                yield 0.05
+        
+            for brightness in range(0, 101, 10):
+                self.set_coffee_color(brightness)
+                yield 0.05
             
-        time.sleep(1)
-        
-        # Turn off LEDs
-        self.turn_off_leds()
-        self.brewing = False
-        print("Coffee ready! Enjoy!")
+            yield 1
+            print("Coffee ready! Enjoy!")
+        finally:
+            # Also runs when the sequence is cancelled part way
+            self.buzzer.duty(0)
+            self.turn_off_leds()
+            self.brewing = False
     
     def deny_coffee(self):
         """Display feedback when coffee is denied due to late hour"""
+        for delay in self.deny_steps():
+            clock.sleep(delay)
+    
+    def deny_steps(self):
+        """Step sequence for the coffee denied feedback (yields delays in seconds)"""
         print("Coffee denied: It's too late for coffee!")
         
         # Visual indicator - red LEDs
@@ -109,11 +127,11 @@ class CoffeeHabitTracker:
         for _ in range(2):
             self.buzzer.freq(200)  # Low warning tone
             self.buzzer.duty(512)
-            time.sleep(0.2)
+            yield 0.2
             self.buzzer.duty(0)
-            time.sleep(0.1)
+            yield 0.1
         
-        time.sleep(1)
+        yield 1
         
         # Turn off LEDs
         self.turn_off_leds()
@@ -155,16 +173,17 @@ class CoffeeHabitTracker:
         try:
             # Display initial color to show system is ready
             self.set_all_leds(0, 0, 50)  # Soft blue
-            time.sleep(1)
+            clock.sleep(1)
             self.turn_off_leds()
             
+            # Debounced button events from the pin IRQ
+            inputs = InputEvents()
+            inputs.add_input("coffee", self.coffee_button)
+            
             while True:
-                # Check if coffee button is pressed (active low)
-                if not self.coffee_button.value() and not self.brewing:
-                    # Wait for button release to avoid multiple triggers
-                    while not self.coffee_button.value():
-                        time.sleep(0.01)
-                    
+                # Brew when the coffee button is released
+                event = inputs.get_event()
+                if event is not None and event.kind == RELEASE and not self.brewing:
                     # Check if coffee is allowed at this hour
                     if self.check_time_allowed():
                         self.brew_coffee()
@@ -172,7 +191,7 @@ class CoffeeHabitTracker:
                         self.deny_coffee()
                         
                         # Display the time and message on LCD if available
-                        current_time = time.localtime()
+                        current_time = clock.localtime()
                         hour = current_time[3]
                         minute = current_time[4]
                         time_str = f"{hour:02d}:{minute:02d}"
@@ -180,7 +199,7 @@ class CoffeeHabitTracker:
                         print("No coffee after 5 PM for better sleep")
                 
                 # Small delay to prevent tight loop
-                time.sleep(0.1)
+                clock.sleep(0.1)
                 
         except KeyboardInterrupt:
             # Clean up
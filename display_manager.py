@@ -1,6 +1,6 @@
 from machine import SoftI2C, Pin
 from i2c_lcd import I2cLcd
-import time
+import clock
 
 # LCD default address
 DEFAULT_I2C_ADDR = 0x27
@@ -12,7 +12,24 @@ PIN_SCL = 22
 PIN_SDA = 21
 
 class DisplayManager:
+    """2x16 LCD with a shadow framebuffer
+    
+    The shadow holds what the panel currently shows. Every draw is compared
+    cell by cell against it and only the changed cells are sent, using one
+    cursor move per run of changed cells (the controller advances the cursor
+    by itself after each character), so an unchanged frame costs no I/O at
+    all and the panel is never cleared just to redraw it.
+    """
+    
     def __init__(self):
+        # Shadow framebuffer and where the controller's cursor is
+        self.shadow = [bytearray(LCD_COLS) for _ in range(LCD_ROWS)]
+        self.cursor = None
+        
+        # Statistics
+        self.cells_written = 0
+        self.cursor_moves = 0
+        
         # Initialize SCL/SDA pins with internal pull-up
         scl_pin = Pin(PIN_SCL, Pin.OUT, pull=Pin.PULL_UP)
         sda_pin = Pin(PIN_SDA, Pin.OUT, pull=Pin.PULL_UP)
@@ -32,12 +49,57 @@ class DisplayManager:
             self.lcd = I2cLcd(self.i2c, DEFAULT_I2C_ADDR, LCD_ROWS, LCD_COLS)
             self.lcd.backlight_on()
             self.lcd.clear()
+            self._reset_shadow()
             self.is_connected = True
             print("LCD display initialized")
         except Exception as e:
             print("LCD initialization failed:", e)
             self.is_connected = False
     
+    def _reset_shadow(self):
+        # The panel was just cleared: every cell is a space, cursor at home
+        for row in self.shadow:
+            for col in range(LCD_COLS):
+                row[col] = 0x20
+        self.cursor = (0, 0)
+    
+    def _invalidate_shadow(self):
+        # Panel contents unknown (e.g. after a write error): redraw every cell
+        for row in self.shadow:
+            for col in range(LCD_COLS):
+                row[col] = 0
+        self.cursor = None
+    
+    def _draw(self, text, row, col=0):
+        """Write text at a position, sending only the cells that changed
+        Args:
+            text: Text to display (cut at the end of the row)
+            row: Row (0-1)
+            col: Column (0-15)
+        """
+        shadow = self.shadow[row]
+        self.lcd.begin_bulk()  # Send the whole draw in one I2C transaction
+        try:
+            self._draw_cells(shadow, text[:LCD_COLS - col], row, col)
+        finally:
+            self.lcd.end_bulk()
+        # Keep the driver's own cursor in step with the controller
+        if self.cursor is not None:
+            self.lcd.cursor_x, self.lcd.cursor_y = self.cursor
+    
+    def _draw_cells(self, shadow, text, row, col):
+        for char in text:
+            code = ord(char) & 0xFF
+            if shadow[col] != code:
+                if self.cursor != (col, row):
+                    self.lcd.move_to(col, row)
+                    self.cursor_moves += 1
+                self.lcd.hal_write_data(code)
+                shadow[col] = code
+                self.cells_written += 1
+                self.cursor = (col + 1, row)
+            col += 1
+    
     def display_text(self, text, row=0, col=0):
         """Display text at specified position
         Args:
@@ -49,9 +111,9 @@ class DisplayManager:
             return
             
         try:
-            self.lcd.move_to(col, row)
-            self.lcd.putstr(text[:LCD_COLS-col])  # Limit to screen width
+            self._draw(text, row, col)  # Limited to screen width
         except Exception as e:
+            self._invalidate_shadow()
             print("LCD display error:", e)
     
     def display_two_lines(self, line1, line2):
@@ -64,20 +126,32 @@ class DisplayManager:
             return
             
         try:
-            self.lcd.clear()
-            self.lcd.move_to(0, 0)
-            self.lcd.putstr(line1[:LCD_COLS])
-            self.lcd.move_to(0, 1)
-            self.lcd.putstr(line2[:LCD_COLS])
+            # Pad with spaces instead of clearing, so unchanged cells are skipped
+            padding = " " * LCD_COLS
+            self.lcd.begin_bulk()
+            try:
+                self._draw((line1 + padding)[:LCD_COLS], 0)
+                self._draw((line2 + padding)[:LCD_COLS], 1)
+            finally:
+                self.lcd.end_bulk()
         except Exception as e:
+            self._invalidate_shadow()
             print("LCD display error:", e)
     
+    def i2c_transactions(self):
+        """Get the number of I2C transactions sent to the LCD so far"""
+        if not self.is_connected:
+            return 0
+        return self.lcd.transactions
+    
     def clear(self):
         """Clear the display"""
         if self.is_connected:
             try:
                 self.lcd.clear()
+                self._reset_shadow()
             except Exception as e:
+                self._invalidate_shadow()
                 print("LCD clear error:", e)
     
     def display_sensor_values(self, temp, humidity):
@@ -90,11 +164,10 @@ class DisplayManager:
             return
             
         try:
-            self.lcd.move_to(0, 0)
-            self.lcd.putstr(f"Temp: {temp}C")
-            self.lcd.move_to(0, 1)
-            self.lcd.putstr(f"Humidity: {humidity}%")
+            self._draw(f"Temp: {temp}C", 0)
+            self._draw(f"Humidity: {humidity}%", 1)
         except Exception as e:
+            self._invalidate_shadow()
             print("LCD display error:", e)
     
     def display_scrolling_text(self, text, row=0, delay=0.3):
@@ -113,10 +186,10 @@ class DisplayManager:
             full_text = text + padding
             
             for i in range(len(full_text) - LCD_COLS + 1):
-                self.lcd.move_to(0, row)
-                self.lcd.putstr(full_text[i:i+LCD_COLS])
-                time.sleep(delay)
+                self._draw(full_text[i:i+LCD_COLS], row)
+                clock.sleep(delay)
         except Exception as e:
+            self._invalidate_shadow()
             print("LCD scrolling error:", e)
     
     def backlight_on(self):
@@ -0,0 +1,126 @@
+from clock import ticks_ms, ticks_diff, ticks_add
+
+
+class EffectEngine:
+    """Queue of timed effects advanced from a single tick() call
+
+    An effect is a step generator: it performs actions and yields the number
+    of seconds to wait before its next step, e.g. "buzzer on, yield 0.2,
+    buzzer off". submit() runs the first step right away and returns, and
+    tick() advances every effect whose wait has elapsed, so any number of
+    effects overlap without adding their durations to the caller's loop.
+
+    Effects may be given a channel (e.g. "buzzer", "window"). Effects on a
+    busy channel are queued behind the running one, or replace it.
+    """
+
+    def __init__(self):
+        self.active = []     # [due_tick, steps, channel] for each running effect
+        self.pending = {}    # channel -> effects waiting for that channel
+
+        # Statistics
+        self.submitted = 0
+        self.completed = 0
+        self.max_step_ms = 0  # Longest time a single step took
+
+    def submit(self, steps, channel=None, replace=False):
+        """Start an effect without blocking
+        Args:
+            steps: Step generator yielding delays in seconds
+            channel: Optional channel name the effect occupies
+            replace: Stop the effect running on the channel instead of
+                     queueing behind it
+        """
+        self.submitted += 1
+        if channel is not None:
+            current = self._find(channel)
+            if current is not None:
+                if not replace:
+                    self.pending.setdefault(channel, []).append(steps)
+                    return
+                self.cancel(channel)
+        self._start(steps, channel, ticks_ms())
+
+    def cancel(self, channel):
+        """Stop the effect on a channel and drop its queued effects
+        Args:
+            channel: Channel name
+        Returns:
+            bool: True if an effect was running
+        """
+        self.pending.pop(channel, None)
+        effect = self._find(channel)
+        if effect is None:
+            return False
+        self.active.remove(effect)
+        effect[1].close()  # Runs the effect's finally clauses (e.g. buzzer off)
+        return True
+
+    def is_busy(self, channel):
+        """Check if an effect is running on a channel"""
+        return self._find(channel) is not None
+
+    def tick(self):
+        """Advance every effect that is due
+        Returns:
+            int: Milliseconds until the next effect is due, or None if idle
+        """
+        now = ticks_ms()
+        for effect in self.active[:]:
+            if ticks_diff(effect[0], now) <= 0:
+                self._advance(effect, now)
+        return self.next_due_ms(now)
+
+    def next_due_ms(self, now=None):
+        """Get the time until the next effect step
+        Returns:
+            int: Milliseconds (0 if overdue), or None if no effect is running
+        """
+        if not self.active:
+            return None
+        if now is None:
+            now = ticks_ms()
+        wait = min(ticks_diff(effect[0], now) for effect in self.active)
+        return max(0, wait)
+
+    def _find(self, channel):
+        for effect in self.active:
+            if effect[2] == channel:
+                return effect
+        return None
+
+    def _start(self, steps, channel, now):
+        effect = [now, steps, channel]
+        self.active.append(effect)
+        self._advance(effect, now)
+
+    def _advance(self, effect, now):
+        # Run steps until the effect waits for a time in the future
+        while ticks_diff(effect[0], now) <= 0:
+            start = ticks_ms()
+            try:
+                delay = next(effect[1])
+            except StopIteration:
+                self._finish(effect, now)
+                return
+            except Exception as e:
+                print("Effect error:", e)
+                self._finish(effect, now)
+                return
+            step_ms = ticks_diff(ticks_ms(), start)
+            if step_ms > self.max_step_ms:
+                self.max_step_ms = step_ms
+            # Each wait starts when its step ran, so a late tick never
+            # shortens the next step (a beep stays as long as requested)
+            effect[0] = ticks_add(now, int(delay * 1000))
+
+    def _finish(self, effect, now):
+        self.active.remove(effect)
+        self.completed += 1
+        channel = effect[2]
+        queued = self.pending.get(channel)
+        if queued:
+            steps = queued.pop(0)
+            if not queued:
+                del self.pending[channel]
+            self._start(steps, channel, now)
@@ -0,0 +1,281 @@
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+import json
+from clock import ticks_ms, ticks_diff, ticks_add
+
+ECONNRESET = 104
+EAGAIN = 11
+TIMEOUT_S = 10             # Waiting for a response
+CONNECT_TIMEOUT_S = 2      # Connecting; a server that is down costs this much once
+RETRY_MIN_MS = 2000        # No new connection after a failed one for this long, doubling...
+RETRY_MAX_MS = 60000       # ...up to this
+PIPELINE_DEPTH = 8         # Requests written before their responses are read
+RECV_SIZE = 1024
+
+
+def split_url(url):
+    """Split an http:// URL
+    Returns:
+        tuple: (host, port, path)
+    Raises:
+        ValueError: For any other scheme
+    """
+    scheme, _, rest = url.partition("://")
+    if scheme != "http":
+        raise ValueError("Unsupported scheme: " + scheme)
+    host, slash, path = rest.partition("/")
+    port = 80
+    if ":" in host:
+        host, port = host.split(":", 1)
+        port = int(port)
+    return host, port, slash + path or "/"
+
+
+class Response:
+    """Status and body of one HTTP response, read in full"""
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+class HttpClient:
+    """Minimal HTTP/1.1 client keeping one connection to one server
+
+    urequests resolves the host, connects, sends one request and closes
+    the socket every time. HttpClient resolves the host once, keeps the
+    connection open between requests and writes queued requests
+    back to back (pipelining) before reading their responses in order.
+    When the server has closed the connection (idle timeout, restart) the
+    requests still unanswered are sent again on a new connection, once;
+    a second failure is raised to the caller as OSError.
+
+    Connecting waits at most connect_timeout. After a failed connect no
+    new connection is tried for RETRY_MIN_MS, doubling up to RETRY_MAX_MS,
+    and requests meanwhile fail right away with OSError(EAGAIN), so a
+    server that is down does not stall the run loop on every upload.
+
+    Responses must carry Content-Length or chunked encoding, or close the
+    connection after the body. A resent POST may reach the server twice.
+    """
+
+    def __init__(self, host, port=80, timeout=TIMEOUT_S, keep_alive=True,
+                 connect_timeout=CONNECT_TIMEOUT_S):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keep_alive = keep_alive   # False: one connection per request, like urequests
+        self.addr = None           # Cached getaddrinfo() result
+        self.sock = None
+        self.rbuf = b""
+        self.queued = []           # Encoded requests not sent yet
+        self.retry_ms = RETRY_MIN_MS
+        self.retry_at = None       # Tick before which no connection is tried
+
+        # Counters
+        self.lookups = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.requests = 0
+        self.failures = 0          # Failed connects
+
+    def stats(self):
+        """Get the counters
+        Returns:
+            dict: lookups, connects, reconnects, requests, failures
+        """
+        return {"lookups": self.lookups, "connects": self.connects,
+                "reconnects": self.reconnects, "requests": self.requests,
+                "failures": self.failures}
+
+    # ---- Requests ----
+
+    def request(self, method, path, body=None, headers=None):
+        """Send one request and read its response
+        Args:
+            method: "GET", "POST", ...
+            path: Path on the server (starting with "/")
+            body: bytes or str to send, or None
+            headers: Dict of extra headers
+        Returns:
+            Response: The response
+        """
+        self.queue(method, path, body, headers)
+        return self.flush()[-1]
+
+    def queue(self, method, path, body=None, headers=None):
+        """Queue a request for the next flush()"""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+        if not self.keep_alive:
+            head += "Connection: close\r\n"
+        if headers:
+            for name, value in headers.items():
+                head += f"{name}: {value}\r\n"
+        if body:
+            head += f"Content-Length: {len(body)}\r\n\r\n"
+            self.queued.append(head.encode("utf-8") + body)
+        else:
+            self.queued.append(head.encode("utf-8") + b"\r\n")
+
+    def flush(self):
+        """Send the queued requests and read their responses
+        Returns:
+            list: One Response per request, in order
+        Raises:
+            OSError: When the server cannot be reached, or right away
+                     while waiting to retry a failed connect; the
+                     requests that were not answered are dropped
+        """
+        queued = self.queued
+        self.queued = []
+        responses = []
+        failed_at = None
+        while len(responses) < len(queued):
+            try:
+                self._exchange(queued[len(responses):], responses)
+            except OSError:
+                self.close()
+                if failed_at == len(responses) or self.retry_at is not None:
+                    raise          # Failed again without any progress, or could not connect
+                failed_at = len(responses)
+                self.reconnects += 1
+        return responses
+
+    def close(self):
+        """Close the connection (the next request opens a new one)"""
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+        self.rbuf = b""
+
+    def _exchange(self, requests, responses):
+        # Write up to PIPELINE_DEPTH requests back to back, then read their
+        # responses; returns early when the server closes the connection
+        if self.sock is None:
+            self._connect()
+        batch = requests[:PIPELINE_DEPTH] if self.keep_alive else requests[:1]
+        self.sock.sendall(b"".join(batch))
+        for _ in batch:
+            response, close = self._read_response()
+            responses.append(response)
+            self.requests += 1
+            if close:
+                self.close()
+                return
+
+    def _connect(self):
+        if self.retry_at is not None and ticks_diff(ticks_ms(), self.retry_at) < 0:
+            raise OSError(EAGAIN)
+        try:
+            if self.addr is None:
+                self.addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+                self.lookups += 1
+            sock = socket.socket()
+            try:
+                sock.settimeout(self.connect_timeout)
+                sock.connect(self.addr)
+                sock.settimeout(self.timeout)
+            except OSError:
+                sock.close()
+                self.addr = None   # The server may have moved
+                raise
+        except OSError:
+            # Retry later instead of waiting out the timeout on every request
+            self.failures += 1
+            self.retry_at = ticks_add(ticks_ms(), self.retry_ms)
+            self.retry_ms = min(self.retry_ms * 2, RETRY_MAX_MS)
+            raise
+        self.sock = sock
+        self.rbuf = b""
+        self.connects += 1
+        self.retry_ms = RETRY_MIN_MS
+        self.retry_at = None
+
+    # ---- Response parsing ----
+
+    def _fill(self):
+        data = self.sock.recv(RECV_SIZE)
+        if not data:
+            raise OSError(ECONNRESET)
+        self.rbuf += data
+
+    def _read_line(self):
+        while True:
+            end = self.rbuf.find(b"\r\n")
+            if end >= 0:
+                line = self.rbuf[:end]
+                self.rbuf = self.rbuf[end + 2:]
+                return line
+            self._fill()
+
+    def _read_bytes(self, size):
+        while len(self.rbuf) < size:
+            self._fill()
+        data = self.rbuf[:size]
+        self.rbuf = self.rbuf[size:]
+        return data
+
+    def _read_response(self):
+        # Returns (Response, True if the server closes the connection)
+        status = self._read_line().split(None, 2)
+        if len(status) < 2 or not status[0].startswith(b"HTTP/"):
+            raise OSError(ECONNRESET)
+        status_code = int(status[1])
+        length = None
+        chunked = False
+        close = not self.keep_alive or status[0] == b"HTTP/1.0"
+        while True:
+            line = self._read_line()
+            if not line:
+                break
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            value = value.strip().lower()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"transfer-encoding":
+                chunked = value == b"chunked"
+            elif name == b"connection":
+                close = value == b"close"
+        if chunked:
+            parts = []
+            while True:
+                size = int(self._read_line().split(b";")[0], 16)
+                if not size:
+                    while self._read_line():
+                        pass       # Trailers
+                    break
+                parts.append(self._read_bytes(size))
+                self._read_bytes(2)
+            body = b"".join(parts)
+        elif length is not None:
+            body = self._read_bytes(length)
+        else:
+            # Body runs to the end of the connection
+            while True:
+                try:
+                    self._fill()
+                except OSError:
+                    break
+            body = self.rbuf
+            self.rbuf = b""
+            close = True
+        return Response(status_code, body), close
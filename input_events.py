@@ -0,0 +1,250 @@
+from machine import Pin
+from clock import ticks_ms, ticks_diff
+
+# Event kinds. For a sensor source (PIR), PRESS means the input became
+# active (motion) and RELEASE that it went quiet again.
+PRESS = "press"
+RELEASE = "release"
+LONG_PRESS = "long_press"
+CHORD = "chord"
+
+RING_SIZE = 32          # Edges buffered between two polls
+QUEUE_SIZE = 16         # Events kept for consumers (oldest dropped first)
+DEBOUNCE_MS = 30        # A level must hold this long to count
+LONG_PRESS_MS = 1000
+
+
+class InputEvent:
+    """One debounced input event
+
+    Attributes:
+        kind: PRESS, RELEASE, LONG_PRESS or CHORD
+        source: Name of the input (the chord name for CHORD)
+        ticks: ticks_ms() when the level change happened
+        held_ms: How long the input was active (RELEASE, LONG_PRESS, CHORD)
+        claimed: True on a RELEASE whose press already produced a
+            LONG_PRESS or CHORD, so consumers can ignore it
+    """
+
+    def __init__(self, kind, source, ticks, held_ms=0, claimed=False):
+        self.kind = kind
+        self.source = source
+        self.ticks = ticks
+        self.held_ms = held_ms
+        self.claimed = claimed
+
+    def __repr__(self):
+        return f"InputEvent({self.kind}, {self.source}, {self.held_ms}ms)"
+
+
+class EdgeRing:
+    """Preallocated ring of pin edges, filled from IRQ handlers
+
+    push() only stores small integers into lists allocated up front, so it
+    is safe to call from an interrupt. Edges arriving while the ring is
+    full are dropped and flagged in overflow.
+    """
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.sources = [0] * size
+        self.levels = [0] * size
+        self.ticks = [0] * size
+        self.head = 0       # Next slot to write (IRQ side)
+        self.tail = 0       # Next slot to read (main loop side)
+        self.overflow = False
+
+    def push(self, source, level, ticks):
+        head = self.head
+        next_head = (head + 1) % self.size
+        if next_head == self.tail:
+            self.overflow = True
+            return
+        self.sources[head] = source
+        self.levels[head] = level
+        self.ticks[head] = ticks
+        self.head = next_head
+
+    def pending(self):
+        return self.head != self.tail
+
+
+class _Source:
+    # Debounce state of one input
+
+    def __init__(self, index, name, pin, active_low, debounce_ms, long_ms):
+        self.index = index
+        self.name = name
+        self.pin = pin
+        self.active_low = active_low
+        self.debounce_ms = debounce_ms
+        self.long_ms = long_ms
+        self.active = self.is_active_level(pin.value())
+        self.candidate = self.active      # Level waiting to be debounced
+        self.candidate_ticks = ticks_ms()
+        self.active_since = self.candidate_ticks
+        self.claimed = False              # Press used by a long press or chord
+
+    def is_active_level(self, level):
+        return (not level) if self.active_low else bool(level)
+
+
+class InputEvents:
+    """Interrupt-driven inputs turned into debounced events
+
+    Pin IRQs timestamp every edge into an EdgeRing. poll(), called from the
+    main loop, drains the ring and debounces each input: a new level is
+    accepted once it has held for the input's debounce time, which emits
+    PRESS or RELEASE. A press held past the long-press time emits
+    LONG_PRESS, and two chorded inputs both down emit CHORD. Consumers take
+    events with get_event() instead of polling GPIO.
+    """
+
+    def __init__(self, ring_size=RING_SIZE, queue_size=QUEUE_SIZE):
+        self.ring = EdgeRing(ring_size)
+        self.sources = []
+        self.by_name = {}
+        self.chords = []      # (name, first source, second source)
+        self.queue = []
+        self.queue_size = queue_size
+        self.dropped = 0
+
+    def add_input(self, name, pin, active_low=True, debounce_ms=DEBOUNCE_MS,
+                  long_ms=LONG_PRESS_MS):
+        """Watch a pin through its IRQ
+        Args:
+            name: Input name used in the events
+            pin: machine.Pin configured as an input
+            active_low: True if the input reads 0 when active (buttons)
+            debounce_ms: Time a level must hold to count
+            long_ms: Hold time for LONG_PRESS, or None for no long presses
+        """
+        source = _Source(len(self.sources), name, pin, active_low, debounce_ms, long_ms)
+        self.sources.append(source)
+        self.by_name[name] = source
+        ring = self.ring
+        index = source.index
+
+        def edge(p):
+            ring.push(index, p.value(), ticks_ms())
+
+        pin.irq(handler=edge, trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING)
+
+    def add_chord(self, name, first, second):
+        """Emit CHORD when both named inputs are active together"""
+        self.chords.append((name, self.by_name[first], self.by_name[second]))
+
+    def is_active(self, name):
+        """Get the debounced state of an input"""
+        self.poll()
+        return self.by_name[name].active
+
+    def poll(self):
+        """Drain the edge ring and queue the events it produces
+        Returns:
+            int: Number of events queued
+        """
+        before = len(self.queue) + self.dropped
+        ring = self.ring
+        while ring.head != ring.tail:
+            tail = ring.tail
+            source = self.sources[ring.sources[tail]]
+            level = ring.levels[tail]
+            ticks = ring.ticks[tail]
+            ring.tail = (tail + 1) % ring.size
+            self._settle(source, ticks)
+            source.candidate = source.is_active_level(level)
+            source.candidate_ticks = ticks
+        now = ticks_ms()
+        if ring.overflow:
+            # Edges were lost: trust the pins as they read now
+            ring.overflow = False
+            for source in self.sources:
+                source.candidate = source.is_active_level(source.pin.value())
+                source.candidate_ticks = now
+        for source in self.sources:
+            self._settle(source, now)
+            if source.active and not source.claimed and source.long_ms is not None:
+                held = ticks_diff(now, source.active_since)
+                if held >= source.long_ms:
+                    source.claimed = True
+                    self._emit(InputEvent(LONG_PRESS, source.name, now, held))
+        return len(self.queue) + self.dropped - before
+
+    def _settle(self, source, now):
+        # Accept the candidate level if it held for the debounce time by now
+        if source.candidate == source.active:
+            return
+        if ticks_diff(now, source.candidate_ticks) < source.debounce_ms:
+            return
+        ticks = source.candidate_ticks
+        source.active = source.candidate
+        if source.active:
+            source.active_since = ticks
+            source.claimed = False
+            self._emit(InputEvent(PRESS, source.name, ticks))
+            self._check_chords(source, ticks)
+        else:
+            held = ticks_diff(ticks, source.active_since)
+            self._emit(InputEvent(RELEASE, source.name, ticks, held, source.claimed))
+
+    def _check_chords(self, source, ticks):
+        for name, first, second in self.chords:
+            if source is first:
+                other = second
+            elif source is second:
+                other = first
+            else:
+                continue
+            if other.active:
+                first.claimed = True
+                second.claimed = True
+                held = ticks_diff(ticks, other.active_since)
+                self._emit(InputEvent(CHORD, name, ticks, held))
+
+    def _emit(self, event):
+        if len(self.queue) >= self.queue_size:
+            self.queue.pop(0)
+            self.dropped += 1
+        self.queue.append(event)
+
+    def get_event(self):
+        """Take the oldest event
+        Returns:
+            InputEvent, or None if there is none
+        """
+        self.poll()
+        if not self.queue:
+            return None
+        return self.queue.pop(0)
+
+    def drain(self):
+        """Take every pending event
+        Returns:
+            list: InputEvents, oldest first
+        """
+        self.poll()
+        events = self.queue
+        self.queue = []
+        return events
+
+    def next_deadline_ms(self):
+        """Get the time until a pending debounce or long press resolves
+        Returns:
+            int: Milliseconds, or None if nothing is pending
+        """
+        now = ticks_ms()
+        wait = None
+        for source in self.sources:
+            if source.candidate != source.active:
+                due = source.debounce_ms - ticks_diff(now, source.candidate_ticks)
+            elif source.active and not source.claimed and source.long_ms is not None:
+                due = source.long_ms - ticks_diff(now, source.active_since)
+            else:
+                continue
+            due = max(0, due)
+            if wait is None or due < wait:
+                wait = due
+        if self.ring.pending():
+            wait = 0
+        return wait
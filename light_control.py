@@ -1,6 +1,8 @@
 from machine import Pin, PWM
-import time
+import clock
 import math
+import schedule
+from schedule import get_schedule, DAY, DAY_PHASE
 
 # Pin definitions
 PIN_MAIN_LIGHT = 5    # Main light PWM control
@@ -8,18 +10,22 @@ PIN_RGB_STRIP = 14    # Optional RGB strip control (if different from neopixel)
 
 # Constants
 MAIN_LIGHT_FREQ = 1000  # PWM frequency for main light
+WAKE_UP_S = 3600        # Brightening period after wake time
 
 class LightManager:
-    def __init__(self):
-        """Initialize light control system"""
+    def __init__(self, daily_schedule=None):
+        """Initialize light control system
+        
+        Args:
+            daily_schedule: Schedule built by schedule.daily_schedule() the
+                light phases follow (default: the shared get_schedule())
+        """
         # Initialize main light PWM
         self.main_light = PWM(Pin(PIN_MAIN_LIGHT), MAIN_LIGHT_FREQ)
         
-        # Sleep schedule parameters (can be customized)
-        self.sleep_time = 22 * 3600       # 10 PM (default)
-        self.wake_time = 7 * 3600         # 7 AM (default)
-        self.dimming_start = 20.5 * 3600  # 8:30 PM (default)
-        self.coffee_cutoff = 17 * 3600    # 5 PM (default)
+        # Dimming follows pre_sleep, lights off follows night: moving the
+        # daily times moves the light phases with them
+        self.schedule = get_schedule() if daily_schedule is None else daily_schedule
         
         # Set initial brightness to 0
         self.set_brightness(0)
@@ -38,17 +44,45 @@ class LightManager:
         duty = int(percent * 10.23)  # Convert % to 0-1023
         self.main_light.duty(duty)
     
-    def set_sleep_schedule(self, sleep_hour=22, wake_hour=7, dimming_hour=20.5):
-        """Set sleep schedule parameters
+    @property
+    def dimming_start(self):
+        return self.schedule.window("pre_sleep")[0]
+    
+    @property
+    def sleep_time(self):
+        return self.schedule.window("night")[0]
+    
+    @property
+    def wake_time(self):
+        return self.schedule.window("night")[1]
+    
+    def set_sleep_schedule(self, sleep_hour=None, wake_hour=None):
+        """Move the sleep and wake times of the daily schedule
+        
+        Dimming keeps its lead time before sleep. The schedule is shared:
+        in the assistant, use SmartSleepAssistant.set_daily_times instead.
         
         Args:
-            sleep_hour: Hour to sleep (24-hour format)
-            wake_hour: Hour to wake up (24-hour format)
-            dimming_hour: Hour to start dimming lights (24-hour format)
+            sleep_hour: Hour to sleep (24-hour format), None to keep the current one
+            wake_hour: Hour to wake up (24-hour format), None to keep the current one
         """
-        self.sleep_time = sleep_hour * 3600
-        self.wake_time = wake_hour * 3600
-        self.dimming_start = dimming_hour * 3600
+        sleep_time = self.sleep_time if sleep_hour is None else int(sleep_hour * 3600)
+        wake_time = self.wake_time if wake_hour is None else int(wake_hour * 3600)
+        coffee_cutoff = self.schedule.window("coffee_denied")[0]
+        schedule.set_daily_times(self.schedule, sleep_time, wake_time, coffee_cutoff)
+    
+    def phase(self, time):
+        """Get the light phase at a time of day
+        Returns:
+            str: "dimming", "sleep", "wake_up" (WAKE_UP_S after wake time) or "day"
+        """
+        if self.schedule.is_active("night", time):
+            return "sleep"
+        if self.schedule.is_active("pre_sleep", time):
+            return "dimming"
+        if (time - self.wake_time) % DAY < WAKE_UP_S:
+            return "wake_up"
+        return DAY_PHASE
     
     def get_current_time_seconds(self):
         """Get current time of day in seconds
@@ -56,7 +90,7 @@ class LightManager:
         Returns:
             int: Current time in seconds since midnight
         """
-        t = time.localtime()
+        t = clock.localtime()
         return t[3] * 3600 + t[4] * 60 + t[5]
     
     def calculate_evening_brightness(self):
@@ -66,15 +100,16 @@ class LightManager:
             float: Brightness percentage (0-100)
         """
         current_time = self.get_current_time_seconds()
+        phase = self.phase(current_time)
         
-        if current_time < self.dimming_start:
-            return 100  # Full brightness
-        
-        if current_time >= self.sleep_time:
+        if phase == "sleep":
             return 0  # Lights off at sleep time
         
+        if phase != "dimming":
+            return 100  # Full brightness
+        
         # Linear dimming from 100% to 0% between dimming start and sleep time
-        progress = (current_time - self.dimming_start) / (self.sleep_time - self.dimming_start)
+        progress = ((current_time - self.dimming_start) % DAY) / ((self.sleep_time - self.dimming_start) % DAY)
         return max(0, 100 - (progress * 100))
     
     def calculate_morning_brightness(self):
@@ -84,18 +119,18 @@ class LightManager:
             float: Brightness percentage (0-100)
         """
         current_time = self.get_current_time_seconds()
+        phase = self.phase(current_time)
         
         # Before wake time, lights off
-        if current_time < self.wake_time:
+        if phase == "sleep":
             return 0
         
         # One hour after wake time, full brightness
-        wake_end = self.wake_time + 3600
-        if current_time >= wake_end:
+        if phase != "wake_up":
             return 100
         
         # Linear brightening from 0% to 100% during wake-up hour
-        progress = (current_time - self.wake_time) / (wake_end - self.wake_time)
+        progress = ((current_time - self.wake_time) % DAY) / WAKE_UP_S
         return min(100, progress * 100)
     
     def simulate_sunrise(self, duration_minutes=30):
@@ -111,7 +146,7 @@ class LightManager:
         for i in range(steps + 1):
             brightness = (i / steps) * 100
             self.set_brightness(brightness)
-            time.sleep(delay_seconds)
+            clock.sleep(delay_seconds)
         
         print("Sunrise simulation complete")
     
@@ -128,7 +163,7 @@ class LightManager:
         for i in range(steps + 1):
             brightness = 100 - (i / steps) * 100
             self.set_brightness(brightness)
-            time.sleep(delay_seconds)
+            clock.sleep(delay_seconds)
         
         print("Sunset simulation complete")
     
@@ -138,21 +173,21 @@ class LightManager:
         Returns:
             float: Applied brightness level (0-100)
         """
-        current_time = self.get_current_time_seconds()
+        phase = self.phase(self.get_current_time_seconds())
         
         # Evening dimming
-        if self.dimming_start <= current_time < self.sleep_time:
+        if phase == "dimming":
             brightness = self.calculate_evening_brightness()
             self.set_brightness(brightness)
             return brightness
         
         # Sleep time
-        elif current_time >= self.sleep_time or current_time < self.wake_time:
+        elif phase == "sleep":
             self.set_brightness(0)
             return 0
         
         # Morning wake-up
-        elif self.wake_time <= current_time < self.wake_time + 3600:
+        elif phase == "wake_up":
             brightness = self.calculate_morning_brightness()
             self.set_brightness(brightness)
             return brightness
@@ -181,15 +216,15 @@ class LightManager:
         for i in range(0, 101, 5):
             self.set_brightness(i)
             print(f"Brightness: {i}%")
-            time.sleep(0.2)
+            clock.sleep(0.2)
         
-        time.sleep(1)
+        clock.sleep(1)
         
         # Fade down
         for i in range(100, -1, -5):
             self.set_brightness(i)
             print(f"Brightness: {i}%")
-            time.sleep(0.2)
+            clock.sleep(0.2)
 
 # For backward compatibility with old code
 def init():
@@ -206,7 +241,7 @@ def set_brightness(percent):
 
 def calculate_evening_brightness():
     """Calculate appropriate light level based on time before sleep (legacy function)"""
-    current_time = time.localtime()[3] * 3600 + time.localtime()[4] * 60  # Hours and minutes in seconds
+    current_time = clock.localtime()[3] * 3600 + clock.localtime()[4] * 60  # Hours and minutes in seconds
     
     if current_time < LIGHT_DIMMING_START:
         return 100  # Full brightness
@@ -222,7 +257,7 @@ def simulate_sunrise():
     """Gradually increase light for natural wake-up (legacy function)"""
     for i in range(0, 101, 5):  # 0-100% in 5% steps
         set_brightness(i)
-        time.sleep(30)  # 30 seconds between steps (~30 minutes total)
+        clock.sleep(30)  # 30 seconds between steps (~30 minutes total)
 
 # Legacy globals for backward compatibility
 TARGET_SLEEP_TIME = 22 * 3600  # 10 PM
@@ -0,0 +1,189 @@
+from clock import ticks_us, ticks_diff
+
+# Histogram bucket upper bounds in microseconds (doubling from 0.25ms);
+# a last bucket catches everything slower
+BOUNDS_US = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000,
+             64000, 128000, 256000, 512000, 1024000)
+
+LCD_COLS = 16
+
+
+class Histogram:
+    """Fixed-size histogram of durations"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BOUNDS_US) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def add(self, us):
+        """Record one duration in microseconds"""
+        index = 0
+        for bound in BOUNDS_US:
+            if us < bound:
+                break
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def mean_us(self):
+        if self.count == 0:
+            return 0
+        return self.total_us // self.count
+
+    def percentile_us(self, percent):
+        """Get the upper bound of the bucket holding a percentile
+        Args:
+            percent: Percentile (0-100)
+        Returns:
+            int: Microseconds (the maximum for the last bucket)
+        """
+        if self.count == 0:
+            return 0
+        wanted = self.count * percent / 100
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= wanted and n:
+                if index < len(BOUNDS_US):
+                    return min(BOUNDS_US[index], self.max_us)
+                break
+        return self.max_us
+
+    def reset(self):
+        for index in range(len(self.buckets)):
+            self.buckets[index] = 0
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+
+def _ms(us):
+    # Milliseconds with one decimal, whole numbers from 100ms to fit the LCD
+    if us >= 100000:
+        return str(us // 1000)
+    return f"{us / 1000:.1f}"
+
+
+class LoopStats:
+    """Per-handler timing histograms and call counters for the run loop
+
+    Handlers are timed with run() (or wrapped once with timed()), which
+    costs two tick reads and a short bucket search per call. Counters are
+    either bumped with count() or read from a source callable when the
+    stats are shown (e.g. the LCD driver's I2C transaction count).
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.names = []       # Histogram names in first-use order
+        self.counters = {}
+        self.sources = []     # (name, callable returning a running total)
+
+    def histogram(self, name):
+        """Get (or create) the histogram for a name"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = Histogram()
+            self.histograms[name] = histogram
+            self.names.append(name)
+        return histogram
+
+    def add(self, name, us):
+        self.histogram(name).add(us)
+
+    def run(self, name, handler, *args):
+        """Call a handler and record how long it took
+        Returns: The handler's return value
+        """
+        start = ticks_us()
+        try:
+            return handler(*args)
+        finally:
+            self.histogram(name).add(ticks_diff(ticks_us(), start))
+
+    def timed(self, name, handler):
+        """Wrap a handler so every call is recorded under name"""
+        histogram = self.histogram(name)
+
+        def timed_handler(*args):
+            start = ticks_us()
+            try:
+                return handler(*args)
+            finally:
+                histogram.add(ticks_diff(ticks_us(), start))
+        return timed_handler
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_source(self, name, source):
+        """Register a counter read from a callable when the stats are shown"""
+        self.sources.append((name, source))
+
+    def counter_values(self):
+        """Get all counters
+        Returns:
+            list: (name, value) tuples, counters first, then sources
+        """
+        values = list(self.counters.items())
+        for name, source in self.sources:
+            try:
+                values.append((name, source()))
+            except Exception:
+                values.append((name, 0))
+        return values
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.counters = {}
+
+    def summary_lines(self):
+        """Get a text summary, one line per handler and one for counters"""
+        lines = ["Loop timing (ms): n avg p50 p95 max"]
+        for name in self.names:
+            h = self.histograms[name]
+            lines.append(f"  {name}: {h.count} {_ms(h.mean_us())} "
+                         f"{_ms(h.percentile_us(50))} {_ms(h.percentile_us(95))} "
+                         f"{_ms(h.max_us)}")
+        counters = " ".join(f"{name}={value}" for name, value in self.counter_values())
+        if counters:
+            lines.append("  calls: " + counters)
+        return lines
+
+    def report(self):
+        """Print the summary"""
+        for line in self.summary_lines():
+            print(line)
+
+    def lcd_page_count(self):
+        return len(self.names) + (len(self.counter_values()) + 1) // 2
+
+    def lcd_page(self, index):
+        """Get one page of the LCD debug view
+        Args:
+            index: Page number (wraps around)
+        Returns:
+            tuple: (line1, line2), at most 16 characters each
+        """
+        pages = self.lcd_page_count()
+        if pages == 0:
+            return ("No stats yet", "")
+        index %= pages
+        if index < len(self.names):
+            name = self.names[index]
+            h = self.histograms[name]
+            line1 = f"{name[:7]} {_ms(h.mean_us())}/{_ms(h.max_us)}"
+            line2 = f"n{h.count} p95<{_ms(h.percentile_us(95))}"
+        else:
+            values = self.counter_values()
+            first = (index - len(self.names)) * 2
+            shown = values[first:first + 2]
+            line1 = f"{shown[0][0][:9]} {shown[0][1]}"
+            line2 = f"{shown[1][0][:9]} {shown[1][1]}" if len(shown) > 1 else ""
+        return (line1[:LCD_COLS], line2[:LCD_COLS])
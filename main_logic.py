@@ -1,8 +1,36 @@
 from smart_home_controller import SmartHomeController
 from coffee_habit_tracker import CoffeeHabitTracker
 from light_control import LightManager
-from phone_controller import PhoneController
-import time
+from phone_controller import PhoneController, PHONE_OWNERS
+from task_scheduler import TaskScheduler, asyncio
+from loop_stats import LoopStats
+from status_server import StatusServer
+from input_events import RELEASE, LONG_PRESS, CHORD
+from rfid_manager import PRESENCE_ABSENT_MS
+import schedule
+import web_manager
+from clock import ticks_ms, ticks_diff, ticks_add
+import clock
+
+# Task periods for the cooperative runtime (milliseconds)
+INPUT_EVENTS_PERIOD_MS = 20
+COFFEE_REQUEST_PERIOD_MS = 50
+PHONE_PRESENCE_PERIOD_MS = 200
+SLEEP_REMINDER_PERIOD_MS = 1000
+SCHEDULE_PERIOD_MS = 1000
+MORNING_WAKE_UP_PERIOD_MS = 1000
+STATUS_DISPLAY_PERIOD_MS = 250
+EFFECTS_PERIOD_MS = 10
+LATENCY_REPORT_PERIOD_MS = 60000
+STATS_REPORT_PERIOD_MS = 60000
+TELEMETRY_PERIOD_MS = 1000
+STATUS_SERVER_PERIOD_MS = 50
+
+# Shortest slow presence poll interval in run_discrete (milliseconds)
+DISCRETE_POLL_MS = 30000
+
+# Hidden debug page: long-press button 2 to toggle it; pages flip by themselves
+DEBUG_PAGE_MS = 3000
 
 class SmartSleepAssistant:
     """Main logic for Smart Sleep Assistant system"""
@@ -12,7 +40,7 @@ class SmartSleepAssistant:
         print("Initializing Smart Sleep Assistant...")
         self.controller = SmartHomeController()
         self.light = LightManager()
-        self.phone_controller = PhoneController()
+        self.phone_controller = PhoneController(self.controller.rfid)   # Same reader and card store
         self.coffee_tracker = CoffeeHabitTracker()
         
         # Time simulation configuration
@@ -21,18 +49,24 @@ class SmartSleepAssistant:
         self.simulated_hour = 12                      # Default start: noon
         self.simulated_minute = 0
         self.simulated_second = 0
-        self.simulation_start_time = time.time()      # Real time when simulation started
+        self.simulation_start_time = clock.time()      # Real time when simulation started
         self.last_update_time = self.simulation_start_time
         
-        # Set time parameters (in seconds since midnight)
-        self.sleep_time = 22 * 3600        # 10 PM - night mode starts
-        self.wake_time = 6 * 3600          # 6 AM - night mode ends
-        self.pre_sleep_time = 20 * 3600 + 30 * 60  # 8:30 PM - 1.5 hours before sleep
-        self.pre_wake_time = 4 * 3600 + 30 * 60    # 4:30 AM - 1.5 hours before wake
+        # Time parameters (in seconds since midnight), from the shared daily schedule
+        self.sleep_time = schedule.SLEEP_TIME          # 10 PM - night mode starts
+        self.wake_time = schedule.WAKE_TIME            # 6 AM - night mode ends
+        self.pre_sleep_time = schedule.PRE_SLEEP_TIME  # 8:30 PM - 1.5 hours before sleep
+        self.pre_wake_time = schedule.PRE_WAKE_TIME    # 4:30 AM - 1.5 hours before wake
     
         # Coffee cutoff time
-        self.coffee_cutoff_soft = 17 * 3600  # 5 PM - warning
-        self.coffee_cutoff_hard = 18 * 3600  # 6 PM - no coffee allowed
+        self.coffee_cutoff_soft = schedule.COFFEE_CUTOFF_SOFT  # 5 PM - warning
+        self.coffee_cutoff_hard = schedule.COFFEE_CUTOFF_HARD  # 6 PM - no coffee until wake time
+        
+        # Compiled transition table answering which windows are active; its
+        # callbacks fire from handle_schedule()
+        self.schedule = schedule.get_schedule()
+        self.schedule.on_enter("reminder", self._on_sleep_reminder)
+        self.schedule.on_enter("wake_grace", self._on_wake_time)
         
         # Sleep environment parameters
         self.optimal_sleep_temp = 17  # Optimal sleeping temperature in °C
@@ -40,9 +74,47 @@ class SmartSleepAssistant:
         
         # System states
         self.night_mode = False
+        self.phones_reported = 0      # Phones on the reader in the last presence record
         self.coffee_warning_active = False
         self.coffee_warning_time = 0
         self.coffee_double_confirm_timeout = 10  # Seconds to confirm coffee after warning
+        self.coffee_requested = False    # Button 1 released since the last coffee check
+        self.last_sleep_alarm = None     # Tick of the last sleep time alarm
+        self.wake_routine_started = False
+        
+        # Cooperative runtime (set by run_async) and message hold for the status display
+        self.scheduler = None
+        self.display_hold_until = ticks_ms()
+        self.effects = self.controller.actuators.effects
+        
+        # Per-handler timing and call counters
+        self.stats = LoopStats()
+        self.stats.add_source("lcd_i2c", self.controller.display.i2c_transactions)
+        self.stats.add_source("rfid_i2c", self.controller.rfid.i2c_transactions)
+        self.stats.add_source("rfid_saved", self.controller.rfid.i2c_transactions_saved)
+        self.stats.add_source("actuator", lambda: self.controller.actuators.calls)
+        self.stats.add_source("rfid_probe", lambda: self.controller.rfid.presence.probes)
+        self.stats.add_source("rfid_rf_ms", self.controller.rfid.antenna_on_ms)
+        self.stats.add_source("rfid_bus_err", self.controller.rfid.bus_errors)
+        # Samples go to MQTT when a broker is configured, else batched HTTP
+        web = self.controller.web
+        if web_manager.MQTT_BROKER is not None:
+            web.use_mqtt(web_manager.MQTT_BROKER)
+        web.on_config = self._on_remote_config
+        self.stats.add_source("tm_queued", web.queue_depth)
+        self.stats.add_source("tm_dropped", lambda: (web.mqtt or web.telemetry).dropped)
+        
+        # Dashboard API (/state, /events), started by run() and run_async()
+        self.status_server = StatusServer(self.status_snapshot)
+        self.stats.add_source("http_clients", lambda: len(self.status_server.clients))
+        
+        # The antenna only comes on for the presence polls
+        self.controller.rfid.set_low_power(True)
+        # A phone tag carrying its owner's times moves the schedule when placed
+        self.controller.rfid.presence.on_profile = self._on_tag_profile
+        self.last_stats_report = ticks_ms()
+        self.debug_page = False
+        self.debug_page_start = 0
         
         self.controller.actuators.led_on()
         #self.controller.actuators.led_off()
@@ -56,7 +128,7 @@ class SmartSleepAssistant:
                 "SIMULATION MODE", 
                 f"Time Factor: {time_factor}x"
             )
-            time.sleep(2)
+            clock.sleep(2)
         
         self.controller.display.display_two_lines("Sleep Assistant", "System Ready")
         print("Smart Sleep Assistant initialized")
@@ -79,9 +151,12 @@ class SmartSleepAssistant:
         self.simulated_second = second
         
         # Reset simulation start time
-        self.simulation_start_time = time.time()
+        self.simulation_start_time = clock.time()
         self.last_update_time = self.simulation_start_time
         
+        # A jump in time does not fire the transitions jumped over
+        self.schedule.resync(self.get_time_of_day())
+        
         # Update the display to show the new time
         sim_time = self.format_time(self.get_current_time_seconds())
         self.controller.display.display_two_lines(
@@ -90,7 +165,7 @@ class SmartSleepAssistant:
         )
         
         print(f"Simulated time set to {sim_time} with {self.time_factor}x acceleration")
-        time.sleep(1)
+        self.hold_display(1)
     
     def set_time_factor(self, factor):
         """Set the time acceleration factor
@@ -105,7 +180,7 @@ class SmartSleepAssistant:
         
         # Reset simulation timing to avoid jumps
         current_seconds = self.get_current_time_seconds()
-        self.simulation_start_time = time.time()
+        self.simulation_start_time = clock.time()
         self.last_update_time = self.simulation_start_time
         
         # Convert current seconds back to h:m:s
@@ -120,14 +195,14 @@ class SmartSleepAssistant:
         )
         
         print(f"Time factor set to {factor}x")
-        time.sleep(1)
+        self.hold_display(1)
     
     def update_simulated_time(self):
         """Update the simulated time based on elapsed real time and time factor"""
         if not self.use_simulated_time:
             return
         
-        current_time = time.time()
+        current_time = clock.time()
         elapsed_real_seconds = current_time - self.last_update_time
         self.last_update_time = current_time
         
@@ -138,7 +213,7 @@ class SmartSleepAssistant:
         total_seconds = self.simulated_second + elapsed_sim_seconds
         self.simulated_second = total_seconds % 60
         
-        total_minutes = self.simulated_minute + (total_seconds // 60)
+        total_minutes = self.simulated_minute + int(total_seconds // 60)
         self.simulated_minute = total_minutes % 60
         
         total_hours = self.simulated_hour + (total_minutes // 60)
@@ -156,126 +231,241 @@ class SmartSleepAssistant:
                    int(self.simulated_second))
         else:
             # Use real system time
-            t = time.localtime()
+            t = clock.localtime()
             return t[3] * 3600 + t[4] * 60 + t[5]
     
+    def get_time_of_day(self):
+        """Get current time of day in seconds, including the fraction
+        Returns:
+            float: Seconds since midnight (real or simulated)
+        """
+        if self.use_simulated_time:
+            self.update_simulated_time()
+            return (self.simulated_hour * 3600 +
+                    self.simulated_minute * 60 +
+                    self.simulated_second)
+        t = clock.localtime()
+        return t[3] * 3600 + t[4] * 60 + t[5] + clock.time() % 1
+    
     def format_time(self, seconds):
         """Format seconds since midnight to HH:MM format"""
         hours = seconds // 3600
         minutes = (seconds % 3600) // 60
         return f"{hours:02d}:{minutes:02d}"
     
+    def run_sequence(self, steps, key=None, replace=False):
+        """Play a step sequence (generator yielding delays in seconds)
+        
+        The sequence is submitted to the actuators' effect engine and the
+        caller continues immediately; both run loops tick the engine.
+        
+        Args:
+            steps: Step generator
+            key: Optional channel; skipped while a sequence on it still plays
+            replace: Stop the sequence playing on the channel instead
+        """
+        if key is not None and not replace and self.effects.is_busy(key):
+            return
+        self.effects.submit(steps, key, replace)
+    
+    def hold_display(self, seconds):
+        """Keep the current message on screen instead of the status display
+        Args:
+            seconds: How long to hold the message
+        """
+        self.display_hold_until = ticks_add(ticks_ms(), int(seconds * 1000))
+    
+    def show_message(self, line1, line2, seconds=2):
+        """Display a two-line message and hold it for a while"""
+        self.controller.display.display_two_lines(line1, line2)
+        self.hold_display(seconds)
+    
     def check_phone_presence(self):
         """Check if phone is present and handle logic"""
         current_time = self.get_current_time_seconds()
         
         # Only enforce phone presence after sleep time
-        if current_time > self.sleep_time or current_time < self.wake_time:
+        if self.schedule.is_active("night", current_time):
             print('Night mode activated?', self.night_mode)
-            # card_present = False
-            # for _ in range(10):
-            #     card_present = self.controller.rfid.check_card()
-            #     if card_present:
-            #         break
             # Check if phone is on the RFID sensor
             print('Time since last scan:', self.controller.rfid.time_since_last_scan())
-            card_present = self.controller.rfid.check_card()
-            for _ in range(3):
-                if card_present:
-                    break
-                time.sleep(0.1)
-                card_present = self.controller.rfid.check_card()
+            # The tracker only probes the reader when its poll interval is due,
+            # and rides out single missed reads
+            presence = self.controller.rfid.presence
+            probes = presence.probes
+            card_present = self.stats.run("rfid", presence.update)
+            self._record_presence()
 
-            if self.night_mode and not card_present:
-                print("Phone not detected on RFID sensor")
-                # Alert user to place phone on the RFID sensor
-                self.controller.display.display_two_lines("You cheater", "Place phone here")
-                self.controller.actuators.rgb_red()
-                self.controller.actuators.buzzer_beep(220, 0.5)
-                return False
-            if not card_present and not self.night_mode:
+            if not card_present:
+                if presence.probes == probes:
+                    # Nothing new since the last poll: the alert is still on
+                    return False
                 print("Phone not detected on RFID sensor")
                 # Alert user to place phone on the RFID sensor
-                self.controller.display.display_two_lines("Time to sleep", "Place phone here")
+                if self.night_mode:
+                    self.show_message("You cheater", "Place phone here", 0.5)
+                else:
+                    self.show_message("Time to sleep", "Place phone here", 0.5)
                 self.controller.actuators.rgb_red()
-                self.controller.actuators.buzzer_beep(220, 0.5)
+                self.run_sequence(self.controller.actuators.beep_steps(220, 0.5), "phone_alert")
                 return False
-            if card_present:
-                # Phone is present, verify it's authorized
-                # if self.controller.rfid.check_card():
-                    # Phone detected and authorized - prepare for night mode
-                if not self.night_mode:
-                    self.controller.display.display_two_lines("Phone detected", "Securing home...")
-                    self.controller.actuators.motor_forward()
-
-                    self.controller.actuators.rgb_green()
-                    self.controller.actuators.buzzer_beep(660, 0.2)
-                    time.sleep(0.5)
-                    # Activate night mode (which will close door and window)
-                    self.activate_night_mode()
-                return True
-    
+            
+            # Phone is present - prepare for night mode
+            if not self.night_mode:
+                phones = len(self.controller.rfid.presence.present_uids())
+                self.show_message("Phone detected" if phones == 1 else f"{phones} phones here",
+                                  "Securing home...")
+                self.controller.actuators.motor_forward()
+                self.controller.actuators.rgb_green()
+                # Activate night mode (which will close door and window)
+                self.activate_night_mode(phone_detected=True)
+            return True
+        
+        # Before bedtime the reader is polled only for phones carrying a profile
+        if self.schedule.is_active("pre_sleep", current_time):
+            self.stats.run("rfid", self.controller.rfid.presence.update)
+            self._record_presence()
         return self.night_mode
     
+    def _record_presence(self):
+        """Record a presence sample when the number of phones on the reader changes"""
+        phones = len(self.controller.rfid.presence.present_uids())
+        if phones != self.phones_reported:
+            self.phones_reported = phones
+            self.controller.web.record("presence", {"present": phones > 0, "phones": phones})
+    
+    def _on_tag_profile(self, uid, profile):
+        """Presence callback: apply the times stored on an arriving phone tag"""
+        if not self.set_daily_times(profile.sleep_time, profile.wake_time, profile.coffee_cutoff):
+            return
+        print(f"Schedule from {profile.name}'s tag: sleep {self.format_time(self.sleep_time)}, "
+              f"wake {self.format_time(self.wake_time)}")
+        self.show_message(f"Hi {profile.name}"[:16], f"Sleep at {self.format_time(self.sleep_time)}", 2)
+    
+    def _on_remote_config(self, config):
+        """Config topic callback: {"sleep_time": "HH:MM", "wake_time": ..., "coffee_cutoff": ...}"""
+        times = []
+        for key, default in (("sleep_time", self.sleep_time), ("wake_time", self.wake_time),
+                             ("coffee_cutoff", self.coffee_cutoff_hard)):
+            value = config.get(key)
+            if value is None:
+                times.append(default)
+                continue
+            try:
+                hours, minutes = value.split(":")
+                times.append((int(hours) * 3600 + int(minutes) * 60) % schedule.DAY)
+            except (AttributeError, ValueError):
+                print(f"Bad {key} in config:", value)
+                return
+        if self.set_daily_times(*times):
+            print(f"Schedule from config: sleep {self.format_time(self.sleep_time)}, "
+                  f"wake {self.format_time(self.wake_time)}")
+            self.show_message("New schedule", f"Sleep at {self.format_time(self.sleep_time)}", 2)
+    
+    def set_daily_times(self, sleep_time, wake_time, coffee_cutoff):
+        """Move the daily routine (lead times of the other windows are kept)
+        Args:
+            sleep_time: Bedtime in seconds since midnight
+            wake_time: Wake-up time in seconds since midnight
+            coffee_cutoff: Hard coffee cutoff in seconds since midnight
+        Returns:
+            bool: True if anything changed
+        """
+        if (sleep_time, wake_time, coffee_cutoff) == \
+                (self.sleep_time, self.wake_time, self.coffee_cutoff_hard):
+            return False
+        schedule.set_daily_times(self.schedule, sleep_time, wake_time, coffee_cutoff)
+        self.sleep_time = sleep_time
+        self.wake_time = wake_time
+        self.pre_sleep_time = (sleep_time - schedule.PRE_SLEEP_LEAD_S) % schedule.DAY
+        self.pre_wake_time = (wake_time - schedule.PRE_WAKE_LEAD_S) % schedule.DAY
+        self.coffee_cutoff_hard = coffee_cutoff
+        self.coffee_cutoff_soft = (coffee_cutoff - schedule.COFFEE_WARNING_LEAD_S) % schedule.DAY
+        return True
+    
     def check_coffee_request(self):
         """Handle coffee button press based on time restrictions"""
         current_time = self.get_current_time_seconds()
         
-        # Check if coffee button (left button) is pressed
-        if self.controller.sensors.is_button1_pressed() and not self.coffee_tracker.brewing:
-            # Wait for button release
-            while self.controller.sensors.is_button1_pressed():
-                time.sleep(0.01)
+        # Coffee is requested when button 1 (left) is released (see handle_input_events)
+        released = self.coffee_requested
+        self.coffee_requested = False
+        
+        if released and not self.coffee_tracker.brewing:
+            windows = self.schedule.active_windows(current_time)
             
             # Coffee is not restricted before 5 PM
-            if current_time < self.coffee_cutoff_soft:
-                self.controller.display.display_two_lines("Brewing Coffee", "Please wait...")
-                self.coffee_tracker.brew_coffee()
+            if "coffee_warning" not in windows and "coffee_denied" not in windows:
+                self.brew_coffee()
                 return True
             
-            # Hard cutoff after 6 PM
-            elif current_time >= self.coffee_cutoff_hard:
-                self.controller.display.display_two_lines("Coffee Denied", "Too late for caffeine")
-                self.coffee_tracker.deny_coffee()
+            # Hard cutoff from 6 PM until wake time
+            elif "coffee_denied" in windows:
+                self.show_message("Coffee Denied", "Too late for caffeine", 1.6)
+                self.controller.web.record("coffee", {"brewed": False, "count": self.coffee_tracker.coffee_count})
+                self.run_sequence(self.coffee_tracker.deny_steps(), "coffee")
                 return False
             
             # Warning zone between 5-6 PM
             else:
                 # If warning was already shown and within timeout, proceed brewing
                 if (self.coffee_warning_active and 
-                    time.time() - self.coffee_warning_time < self.coffee_double_confirm_timeout):
+                    clock.time() - self.coffee_warning_time < self.coffee_double_confirm_timeout):
                     
                     self.coffee_warning_active = False
-                    self.controller.display.display_two_lines("Brewing Coffee", "Please wait...")
-                    self.coffee_tracker.brew_coffee()
+                    self.brew_coffee()
                     return True
                 
                 # Show warning and set status
                 else:
                     self.coffee_warning_active = True
-                    self.coffee_warning_time = time.time()
-                    self.controller.display.display_two_lines("Coffee after 5PM", "Press again to confirm")
-                    self.controller.actuators.rgb_red()
-                    self.controller.actuators.buzzer_beep(440, 0.2)
-                    time.sleep(0.2)
-                    self.controller.actuators.buzzer_beep(440, 0.2)
-                    time.sleep(2)
-                    self.controller.actuators.rgb_off()
+                    self.coffee_warning_time = clock.time()
+                    self.show_message("Coffee after 5PM", "Press again to confirm", 2.6)
+                    self.run_sequence(self._coffee_warning_steps(), "coffee")
                     return False
         
         # Reset warning after timeout
-        if self.coffee_warning_active and time.time() - self.coffee_warning_time >= self.coffee_double_confirm_timeout:
+        if self.coffee_warning_active and clock.time() - self.coffee_warning_time >= self.coffee_double_confirm_timeout:
             self.coffee_warning_active = False
         
         return False
     
-    def activate_night_mode(self):
-        """Activate night mode - secure home, turn off appliances"""
+    def brew_coffee(self):
+        """Start brewing; the status display is paused while brewing"""
+        self.controller.display.display_two_lines("Brewing Coffee", "Please wait...")
+        self.controller.web.record("coffee", {"brewed": True, "count": self.coffee_tracker.coffee_count + 1})
+        # Cut the warning beeps short: a brew queued behind them would leave
+        # brewing set without ever playing
+        self.run_sequence(self.coffee_tracker.brew_steps(), "coffee", replace=True)
+    
+    def _coffee_warning_steps(self):
+        actuators = self.controller.actuators
+        actuators.rgb_red()
+        yield from actuators.beep_steps(440, 0.2)
+        yield 0.2
+        yield from actuators.beep_steps(440, 0.2)
+        yield 2
+        actuators.rgb_off()
+    
+    def activate_night_mode(self, phone_detected=False):
+        """Activate night mode - secure home, turn off appliances
+        Args:
+            phone_detected: Play the phone confirmation beep first
+        """
         if self.night_mode:
             return
         
         print("Activating night mode")
         self.night_mode = True
+        self.controller.web.record("mode", {"night": True, "phone": phone_detected})
+        self.wake_routine_started = False
+        self.run_sequence(self._night_mode_steps(phone_detected), "mode", replace=True)
+    
+    def _night_mode_steps(self, phone_detected):
+        actuators = self.controller.actuators
+        if phone_detected:
+            yield from actuators.beep_steps(660, 0.2)
+            yield 0.5
         
         # Display message with wake-up time
         wake_time_formatted = self.format_time(self.wake_time)
@@ -284,38 +474,38 @@ class SmartSleepAssistant:
         
         # Security measures: First close window and door to secure the home
         print("Securing home - closing window and door")
-        self.controller.display.display_two_lines("Securing Home", "Please wait...")
+        self.show_message("Securing Home", "Please wait...", 4)
         
         # Ensure the window is fully closed
-        self.controller.actuators.window_close()
-        self.controller.actuators.led_off()
+        yield from actuators.window_close_steps()
+        actuators.led_off()
         print("Window closed")
         
 
-        time.sleep(0.5)  # Short delay between operations
+        yield 0.5  # Short delay between operations
         
         # Ensure the door is fully closed and locked
-        self.controller.actuators.servo_180_degrees()
-        time.sleep(0.5)
-        self.controller.actuators.servo_0_degrees()
-        time.sleep(0.5)  # Short delay between operations
+        actuators.servo_180_degrees()
+        yield 0.5
+        actuators.servo_0_degrees()
+        yield 0.5  # Short delay between operations
         
         # Turn off lights
         self.light.lights_off()
         
         # Turn off fan if available
-        if hasattr(self.controller.actuators, 'fan_available') and self.controller.actuators.fan_available:
-            self.controller.actuators.motor_stop()
+        if hasattr(actuators, 'fan_available') and actuators.fan_available:
+            actuators.motor_stop()
         
         # Visual and audio feedback to confirm night mode activation
-        self.controller.actuators.rgb_blue(30)  # Dim blue for night
-        self.controller.actuators.buzzer_beep(880, 0.2)
-        time.sleep(0.2)
-        self.controller.actuators.buzzer_beep(660, 0.2)
+        actuators.rgb_blue(30)  # Dim blue for night
+        yield from actuators.beep_steps(880, 0.2)
+        yield 0.2
+        yield from actuators.beep_steps(660, 0.2)
         
         # Confirmation message
-        self.controller.display.display_two_lines("Home Secured", "Sleep well!")
-        time.sleep(2)
+        self.show_message("Home Secured", "Sleep well!")
+        yield 2
         
         # Initial sleep environment optimization
         #self.optimize_sleep_environment()
@@ -327,23 +517,27 @@ class SmartSleepAssistant:
         
         print("Deactivating night mode")
         self.night_mode = False
-        
+        self.controller.web.record("mode", {"night": False})
+        self.run_sequence(self._wake_up_steps(), "mode", replace=True)
+    
+    def _wake_up_steps(self):
+        actuators = self.controller.actuators
         # Display message
-        self.controller.display.display_two_lines("Good Morning", "Wake-up time!")
+        self.show_message("Good Morning", "Wake-up time!", 2)
         
         # Open window for fresh air
-        self.controller.actuators.window_open()  # Half-open for ventilation
-        self.controller.actuators.led_on()
-        self.controller.actuators.rgb_green()
-        time.sleep(0.5)  # Short delay between operations
+        yield from actuators.window_open_steps()  # Half-open for ventilation
+        actuators.led_on()
+        actuators.rgb_green()
+        yield 0.5  # Short delay between operations
 
         # Turn on lights
-        self.controller.actuators.rgb_white(100)  # Full brightness
+        actuators.rgb_white(100)  # Full brightness
         
         # Visual and audio feedback
-        self.controller.actuators.buzzer_beep(660, 0.2)
-        time.sleep(0.2)
-        self.controller.actuators.buzzer_beep(880, 0.2)
+        yield from actuators.beep_steps(660, 0.2)
+        yield 0.2
+        yield from actuators.beep_steps(880, 0.2)
         #self.controller.actuators.rgb_off()
     
     def optimize_sleep_environment(self):
@@ -354,6 +548,7 @@ class SmartSleepAssistant:
         # Read current temperature and humidity
         temp, humidity = self.controller.sensors.read_temperature_humidity()
         print(f"Sleep environment: {temp}°C, {humidity}%")
+        self.controller.web.record("env", {"temperature": temp, "humidity": humidity})
         
         # Show current conditions
         self.controller.display.display_two_lines(
@@ -424,9 +619,9 @@ class SmartSleepAssistant:
     #     for note, duration in notes:
     #         self.controller.actuators.buzzer.freq(note)
     #         self.controller.actuators.buzzer.duty(300)  # Quiet volume
-    #         time.sleep(duration * 0.5)  # Play shorter to not disturb too much
+    #         clock.sleep(duration * 0.5)  # Play shorter to not disturb too much
     #         self.controller.actuators.buzzer.duty(0)
-    #         time.sleep(0.05)
+    #         clock.sleep(0.05)
         
     #     # Ensure buzzer is off
     #     self.controller.actuators.buzzer.duty(0)
@@ -435,69 +630,87 @@ class SmartSleepAssistant:
         """Handle pre-sleep reminders and light dimming"""
         current_time = self.get_current_time_seconds()
         
-        # Check if it's pre-sleep time (between 1 hour before sleep and sleep time)
-        if self.pre_sleep_time <= current_time < self.sleep_time:
-            # Calculate progress through the pre-sleep hour (0.0 to 1.0)
-            progress = (current_time - self.pre_sleep_time) / 3600  # 0 to 1 over one hour
-            
-            # Gradually dim lights from 100% to 0%
-            brightness = int(100 - (progress * 100))
-            brightness = max(5, brightness)  # Keep minimum 5% brightness until sleep time
-            
-            # Set the light brightness
-            
-            
-            # Every 10 minutes, show reminder
-            minutes_since_pre_sleep = (current_time - self.pre_sleep_time) // 60
-            if minutes_since_pre_sleep % 10 == 0 and minutes_since_pre_sleep > 0:
-                time_to_sleep = (self.sleep_time - current_time) // 60
-                self.controller.actuators.rgb_white(brightness)
-                self.controller.display.display_two_lines(
-                    "Sleep Reminder",
-                    f"{time_to_sleep}min left ({brightness}%)"
-                )
-                # Gentle reminder sound
-                self.controller.actuators.buzzer_beep(660, 0.2)
-                time.sleep(0.2)
-                self.controller.actuators.buzzer_beep(440, 0.2)
-                time.sleep(2)  # Show message for 2 seconds
+        windows = self.schedule.active_windows(current_time)
+        
+        # Check if it's pre-sleep time (between 1.5 hours before sleep and sleep time);
+        # the 10-minute reminders are fired by the schedule (_on_sleep_reminder)
+        if "pre_sleep" in windows:
+            brightness = self._pre_sleep_brightness(current_time)
             
             # For debug/simulation purposes, show brightness change more frequently
-            if self.use_simulated_time and int(time.time()) % 60 == 0:
+            if self.use_simulated_time and int(clock.time()) % 60 == 0:
                 self.controller.actuators.rgb_white(brightness)
                 print(f"Pre-sleep dimming: {brightness}% brightness, {(self.sleep_time - current_time)//60} minutes to sleep time")
         
         # At sleep time, remind user until phone is placed
-        elif current_time >= self.sleep_time and not self.night_mode:
+        elif "night" in windows and not self.night_mode:
             # Turn lights very low but not completely off until phone is placed
+            # (refresh_status_display shows "Sleep Time!" meanwhile)
             self.controller.actuators.rgb_white(0.05)
-            
-            self.controller.display.display_two_lines(
-                "Sleep Time!",
-                "Place phone on sensor"
-            )
-            if int(time.time()) % 30 < 1:  # Remind every 30 seconds
-                self.controller.actuators.rgb_red()
-                self.controller.actuators.buzzer_beep(440, 0.3)
-                time.sleep(0.3)
-                self.controller.actuators.buzzer_beep(330, 0.3)
-                time.sleep(3)
-                self.controller.actuators.rgb_off()
+            now = ticks_ms()
+            if self.last_sleep_alarm is None or ticks_diff(now, self.last_sleep_alarm) >= 30000:  # Remind every 30 seconds
+                self.last_sleep_alarm = now
+                self.hold_display(3.6)
+                self.run_sequence(self._sleep_alarm_steps(), "reminder")
+    
+    def _pre_sleep_brightness(self, current_time):
+        # Gradually dim lights from 100% over the first pre-sleep hour,
+        # keeping 5% until sleep time
+        progress = (current_time - self.pre_sleep_time) / 3600  # 0 to 1 over one hour
+        return max(5, int(100 - (progress * 100)))
+    
+    def _on_sleep_reminder(self, name, time_of_day):
+        """Schedule callback: 10-minute pre-sleep reminder"""
+        brightness = self._pre_sleep_brightness(time_of_day)
+        time_to_sleep = int(self.sleep_time - time_of_day) // 60
+        self.controller.actuators.rgb_white(brightness)
+        self.show_message(
+            "Sleep Reminder",
+            f"{time_to_sleep}min left ({brightness}%)",
+            2.6  # Show message for 2 seconds after the sound
+        )
+        self.run_sequence(self._sleep_reminder_steps(), "reminder")
+    
+    def _on_wake_time(self, name, time_of_day):
+        """Schedule callback: wake time ends night mode"""
+        if self.night_mode:
+            self.deactivate_night_mode()
+    
+    def handle_schedule(self):
+        """Fire the schedule callbacks for the transitions passed since the last call"""
+        self.schedule.update(self.get_time_of_day())
+    
+    def _sleep_reminder_steps(self):
+        # Gentle reminder sound
+        actuators = self.controller.actuators
+        yield from actuators.beep_steps(660, 0.2)
+        yield 0.2
+        yield from actuators.beep_steps(440, 0.2)
+        yield 2
+    
+    def _sleep_alarm_steps(self):
+        actuators = self.controller.actuators
+        actuators.rgb_red()
+        yield from actuators.beep_steps(440, 0.3)
+        yield 0.3
+        yield from actuators.beep_steps(330, 0.3)
+        yield 3
+        actuators.rgb_off()
     
     def handle_morning_wake_up(self):
         """Handle morning wake-up routine"""
         current_time = self.get_current_time_seconds()
         
-        # Check if it's pre-wake time
-        if self.pre_wake_time <= current_time < self.wake_time:
+        # Check if it's pre-wake time (wake time itself is handled by _on_wake_time)
+        if self.schedule.is_active("pre_wake", current_time):
             # If night mode still active, start wake-up routine
             if self.night_mode:
                 progress = (current_time - self.pre_wake_time) / 3600  # 0 to 1 over one hour
-                self.controller.actuators.window_open()
+                if not self.wake_routine_started:
+                    self.wake_routine_started = True
+                    self.run_sequence(self.controller.actuators.window_open_steps(), "window")
                 self.controller.actuators.led_on()  # Dim white light
                 
-                
-                
                 # Gradually increase light
                 brightness = progress * 100
                 self.controller.actuators.rgb_white(brightness)
@@ -509,11 +722,7 @@ class SmartSleepAssistant:
                     "Good Morning Soon",
                     f"Wake in {time_to_wake} mins"
                 )
-        
-        # At wake time, end night mode
-        elif current_time >= self.wake_time and current_time < self.wake_time + 300:  # Within 5 minutes
-            if self.night_mode:
-                self.deactivate_night_mode()
+
     
     def advance_to_next_transition(self):
         """Cycle through key time points:
@@ -571,7 +780,7 @@ class SmartSleepAssistant:
         elif next_point == 3:  # Wake time
             print(f"Advancing to wake time: Night mode ends")
         
-        time.sleep(2)  # Show message for 2 seconds
+        self.hold_display(2)  # Show message for 2 seconds
     
     def set_simulated_time_from_seconds(self, seconds_since_midnight):
         """Set the simulated time based on seconds since midnight
@@ -590,104 +799,339 @@ class SmartSleepAssistant:
         # Use existing function to set the time
         self.set_simulated_time(hour, minute, second)
     
+    def handle_input_events(self):
+        """Dispatch the debounced button events
+        
+        Button 1 (left) released: coffee request
+        Button 1 long press: enroll the phones on the reader
+        Both buttons: advance to the next transition (simulation)
+        Button 2 (right) released: cycle time acceleration (simulation)
+        Button 2 long press: toggle the hidden stats page
+        
+        Releases that ended a long press or a both-button chord are ignored.
+        """
+        for event in self.controller.sensors.drain_events():
+            if event.kind == CHORD:
+                if self.use_simulated_time:
+                    self.advance_to_next_transition()
+            elif event.kind == LONG_PRESS:
+                if event.source == "button1":
+                    self.enroll_phones()
+                elif event.source == "button2":
+                    self.toggle_debug_page()
+            elif event.kind == RELEASE and not event.claimed:
+                if event.source == "button1":
+                    self.coffee_requested = True
+                elif event.source == "button2" and self.use_simulated_time:
+                    self.cycle_time_factor()
+    
+    def enroll_phones(self):
+        """Enroll the phones on the reader that are not enrolled yet"""
+        enrolled = self.controller.rfid.enroll_present(PHONE_OWNERS)
+        if not enrolled:
+            self.show_message("No new phone", "Place it on reader", 2)
+            return
+        names = " & ".join(name for uid, name, profile in enrolled)
+        print(f"Enrolled phones: {names}")
+        self.show_message("Phone enrolled", names[:16], 2)
+        for uid, name, profile in enrolled:
+            if profile is not None:
+                self._on_tag_profile(uid, profile)
+    
+    def cycle_time_factor(self):
+        """Cycle time acceleration: 1x → 2x → 10x → 60x → 1x"""
+        if self.time_factor == 1:
+            self.set_time_factor(2)
+        elif self.time_factor == 2:
+            self.set_time_factor(10)
+        elif self.time_factor == 10:
+            self.set_time_factor(60)
+        else:
+            self.set_time_factor(1)
+    
+    def toggle_debug_page(self):
+        """Show or hide the hidden stats page"""
+        now = ticks_ms()
+        self.debug_page = not self.debug_page
+        self.debug_page_start = now
+        self.display_hold_until = now  # Show the change right away
+        print("Debug page", "on" if self.debug_page else "off")
+    
+    def report_stats(self):
+        """Print the loop timing summary once per STATS_REPORT_PERIOD_MS"""
+        now = ticks_ms()
+        if ticks_diff(now, self.last_stats_report) < STATS_REPORT_PERIOD_MS:
+            return
+        self.last_stats_report = now
+        self.stats.report()
+    
+    def refresh_status_display(self):
+        """Display current system status if no other message is showing"""
+        if ticks_diff(self.display_hold_until, ticks_ms()) > 0:
+            return
+        if self.coffee_warning_active or self.coffee_tracker.brewing:
+            return
+        
+        if self.debug_page:
+            page = ticks_diff(ticks_ms(), self.debug_page_start) // DEBUG_PAGE_MS
+            line1, line2 = self.stats.lcd_page(page)
+            self.controller.display.display_two_lines(line1, line2)
+            return
+        
+        current_time = self.get_current_time_seconds()
+        current_time_formatted = self.format_time(current_time)
+        if self.night_mode:
+            wake_time_formatted = self.format_time(self.wake_time)
+            self.controller.display.display_two_lines(
+                f"Night Mode {current_time_formatted}",
+                f"Wake: {wake_time_formatted}"
+            )
+        elif self.schedule.is_active("night", current_time):
+            # Past sleep time without a phone on the reader
+            self.controller.display.display_two_lines(
+                "Sleep Time!",
+                "Place phone on sensor"
+            )
+        else:
+            sleep_time_formatted = self.format_time(self.sleep_time)
+            self.controller.display.display_two_lines(
+                f"Time: {current_time_formatted}",
+                f"Sleep: {sleep_time_formatted}"
+            )
+    
+    def status_snapshot(self):
+        """Get the state shown on the dashboard
+        Returns:
+            dict: mode, night_mode, time, sleep_time, temperature, humidity,
+                  light, phone, coffee_count
+        """
+        time_of_day = self.get_current_time_seconds()
+        if self.night_mode:
+            mode = "night"
+        elif self.schedule.is_active("pre_sleep", time_of_day):
+            mode = "wind_down"
+        else:
+            mode = "day"
+        temp, humidity = self.controller.sensors.read_climate()
+        return {
+            "mode": mode,
+            "night_mode": self.night_mode,
+            "time": self.format_time(time_of_day),
+            "sleep_time": self.format_time(self.sleep_time),
+            "temperature": temp,
+            "humidity": humidity,
+            "light": self.controller.actuators.light_level,
+            "phone": len(self.controller.rfid.presence.present_uids()) > 0,
+            "coffee_count": self.coffee_tracker.coffee_count,
+        }
+    
+    def print_simulation_help(self):
+        """Print simulation controls"""
+        print("\nSIMULATION MODE ACTIVE")
+        print(f"Time acceleration factor: {self.time_factor}x")
+        print("Use Both Buttons: Cycle through key time points:")
+        print("  1. 20:30 - Pre-sleep time (light dimming begins)")
+        print("  2. 22:00 - Sleep time (night mode begins)")
+        print("  3. 04:30 - Pre-wake time (wake-up sequence begins)")
+        print("  4. 06:00 - Wake time (night mode ends)")
+        print("Use Button 2 (right): Cycle speed (1x → 2x → 10x → 60x → 1x)")
+        print("Hold Button 2 for 3s: Toggle the stats page")
+        print("Initial simulated time:", self.format_time(self.get_current_time_seconds()))
+    
     def run(self):
-        """Main run loop for the Smart Sleep Assistant"""
-        print("Smart Sleep Assistant running...")
+        """Polling run loop for the Smart Sleep Assistant
         
-        # Add default authorized RFID cards (phones)
-        # self.controller.rfid.add_authorized_card(668, "James")
-        # self.controller.rfid.add_authorized_card(383, "Eric")
+        Handlers run one after another; step sequences are advanced by the
+        effect engine between iterations. Prefer run_async(), where every
+        handler is an independent task.
+        """
+        print("Smart Sleep Assistant running...")
         
         # If simulation is enabled, print simulation controls
         if self.use_simulated_time:
-            print("\nSIMULATION MODE ACTIVE")
-            print(f"Time acceleration factor: {self.time_factor}x")
-            print("Use Both Buttons: Cycle through key time points:")
-            print("  1. 20:30 - Pre-sleep time (light dimming begins)")
-            print("  2. 22:00 - Sleep time (night mode begins)")
-            print("  3. 04:30 - Pre-wake time (wake-up sequence begins)")
-            print("  4. 06:00 - Wake time (night mode ends)")
-            print("Use Button 2 (right): Cycle speed (1x → 2x → 10x → 60x → 1x)")
-            print("Initial simulated time:", self.format_time(self.get_current_time_seconds()))
+            self.print_simulation_help()
+        self.status_server.start()
         
         try:
             while True:
-                # Get current time
-                current_time = self.get_current_time_seconds()
-                current_time_formatted = self.format_time(current_time)
-                
-                # Simulation controls (when enabled)
-                if self.use_simulated_time:
-                    # Button 2 (right): Cycle time acceleration: 1x → 2x → 10x → 60x → 1x
-                    if self.controller.sensors.is_button2_pressed() and not self.controller.sensors.is_button1_pressed():
-                        if self.time_factor == 1:
-                            self.set_time_factor(2)
-                        elif self.time_factor == 2:
-                            self.set_time_factor(10)
-                        elif self.time_factor == 10:
-                            self.set_time_factor(60)
-                        else:
-                            self.set_time_factor(1)
-                        time.sleep(0.5)  # Debounce
-                        
-                    # In simulation mode, use both buttons to advance to next transition
-                    if self.controller.sensors.is_button1_pressed() and self.controller.sensors.is_button2_pressed():
-                        self.advance_to_next_transition()
-                        time.sleep(0.5)  # Debounce
-                        # Wait for both buttons to be released
-                        while self.controller.sensors.is_button1_pressed() or self.controller.sensors.is_button2_pressed():
-                            time.sleep(0.01)
-                
-                # Check for coffee requests - Button 1 is now exclusively for coffee when not in combination
-                self.check_coffee_request()
-                
-                # Handle phone presence check and night mode activation
-                self.check_phone_presence()
+                next_effect_ms = self.run_handlers_once()
                 
-                # Handle sleep time reminders
-                self.handle_sleep_time_reminder()
-                
-                # Handle morning wake-up routine
-                self.handle_morning_wake_up()
-                
-                # In night mode, check for disturbances and optimize environment
-                # if self.night_mode:
-                    #self.handle_night_disturbance()
-                    
-                    # Periodically optimize sleep environment (every 5 minutes)
-                    # if int(time.time()) % 300 < 1:
-                    #     self.optimize_sleep_environment()
-                
-                # Display current system status if no other message is showing
-                if not self.coffee_warning_active and not self.coffee_tracker.brewing:
-                    if self.night_mode:
-                        # Include SIM indicator if using simulated time
-                        time_label = f"{current_time_formatted}" if self.use_simulated_time else current_time_formatted
-                        wake_time_formatted = self.format_time(self.wake_time)
-                        self.controller.display.display_two_lines(
-                            f"Night Mode {time_label}",
-                            f"Wake: {wake_time_formatted}"
-                        )
-                    else:
-                        sleep_time_formatted = self.format_time(self.sleep_time)
-                        # Include SIM indicator if using simulated time
-                        time_label = f"{current_time_formatted}" if self.use_simulated_time else current_time_formatted
-                        self.controller.display.display_two_lines(
-                            f"Time: {time_label}",
-                            f"Sleep: {sleep_time_formatted}"
-                        )
-                
-                # Short delay to prevent tight loop
-                time.sleep(0.1)
+                # Sleep until the next loop or effect step
+                if next_effect_ms is None or next_effect_ms >= 100:
+                    clock.sleep(0.1)
+                else:
+                    clock.sleep(next_effect_ms / 1000)
                 
         except KeyboardInterrupt:
             print("Smart Sleep Assistant stopped")
-            # Cleanup
-            #self.light.lights_on(100)
-            #self.controller.actuators.window_close()
-            #self.controller.actuators.door_close()
-            #self.controller.actuators.rgb_off()
-            #self.controller.actuators.buzzer_off()
+        finally:
+            self.status_server.stop()
+    
+    def run_handlers_once(self):
+        """Run every handler once (one iteration of the run loop)
+        Returns:
+            int: Milliseconds until the next effect step, or None if idle
+        """
+        stats = self.stats
+        start = clock.ticks_us()
+        
+        # Button events: coffee requests, simulation controls and the debug page
+        stats.run("input", self.handle_input_events)
+        
+        # Check for coffee requests - Button 1 is now exclusively for coffee when not in combination
+        stats.run("coffee", self.check_coffee_request)
+        
+        # Handle phone presence check and night mode activation
+        stats.run("phone", self.check_phone_presence)
+        
+        # Fire schedule transitions (reminders, wake time)
+        stats.run("schedule", self.handle_schedule)
+        
+        # Handle sleep time reminders
+        stats.run("remind", self.handle_sleep_time_reminder)
+        
+        # Handle morning wake-up routine
+        stats.run("wake", self.handle_morning_wake_up)
+        
+        # In night mode, check for disturbances and optimize environment
+        # if self.night_mode:
+            #self.handle_night_disturbance()
+            
+            # Periodically optimize sleep environment (every 5 minutes)
+            # if int(clock.time()) % 300 < 1:
+            #     self.optimize_sleep_environment()
+        
+        stats.run("display", self.refresh_status_display)
+        
+        # Upload queued telemetry when a batch is due
+        stats.run("telemetry", self.controller.web.poll_telemetry)
+        
+        # Answer dashboard requests (does nothing until the server is started)
+        stats.run("http", self.status_server.poll)
+        
+        # Advance running effects
+        next_effect_ms = stats.run("effects", self.effects.tick)
+        stats.add("loop", clock.ticks_diff(clock.ticks_us(), start))
+        self.report_stats()
+        return next_effect_ms
+    
+    def next_deadline(self):
+        """Get the next instant at which a handler has something new to do
+        
+        Covers the schedule transitions (pre-sleep, sleep, pre-wake, wake,
+        coffee cutoffs), the 10-minute pre-sleep reminders, the 30-second
+        sleep alarm, the coffee confirmation timeout, message holds,
+        pending effect steps, telemetry uploads, input debouncing or long
+        presses and the phone presence polls before bedtime and at night.
+        
+        Returns:
+            float: Clock time in seconds, or None
+        """
+        now = clock.time()
+        now_ticks = ticks_ms()
+        time_of_day = self.get_time_of_day()
+        
+        # Next schedule transition, converted from simulated to clock seconds
+        transition = self.schedule.next_transition(time_of_day)
+        wait = transition[0] if transition is not None else 86400
+        if self.use_simulated_time:
+            wait = wait / self.time_factor
+        candidates = [now + wait + 0.001]  # Land just past the transition
+        
+        if ticks_diff(self.display_hold_until, now_ticks) > 0:
+            candidates.append(now + ticks_diff(self.display_hold_until, now_ticks) / 1000)
+        night = self.schedule.is_active("night", time_of_day)
+        if self.last_sleep_alarm is not None and not self.night_mode and night:
+            candidates.append(now + (30000 - ticks_diff(now_ticks, self.last_sleep_alarm)) / 1000)
+        if self.coffee_warning_active:
+            candidates.append(self.coffee_warning_time + self.coffee_double_confirm_timeout)
+        next_effect_ms = self.effects.next_due_ms()
+        if next_effect_ms is not None:
+            candidates.append(now + next_effect_ms / 1000)
+        next_telemetry_ms = self.controller.web.telemetry.next_due_ms()
+        if next_telemetry_ms is not None:
+            candidates.append(now + (next_telemetry_ms + 1) / 1000)
+        next_input_ms = self.controller.sensors.next_event_deadline_ms()
+        if next_input_ms is not None:
+            candidates.append(now + (next_input_ms + 1) / 1000)
+        if night or self.schedule.is_active("pre_sleep", time_of_day):
+            presence = self.controller.rfid.presence
+            poll_ms = presence.next_poll_ms()
+            if presence.last_poll is not None and presence.interval_ms >= PRESENCE_ABSENT_MS:
+                # No card is arriving or departing: poll less often than the
+                # board does, a phone placed meanwhile is seen a bit later
+                poll_ms = max(poll_ms, DISCRETE_POLL_MS - ticks_diff(now_ticks, presence.last_poll))
+            candidates.append(now + (poll_ms + 1) / 1000)
+        
+        future = [when for when in candidates if when > now]
+        return min(future) if future else None
+    
+    def run_discrete(self, duration):
+        """Run the handlers on a VirtualClock in discrete-event mode
+        
+        Instead of polling every 100ms, the clock jumps straight to the next
+        deadline (see next_deadline() and the clock's own timers) and runs
+        every handler once there. Slow presence polls only get a deadline
+        every DISCRETE_POLL_MS, so a phone placed on an empty reader may be
+        seen up to that much later than on the board.
+        
+        A simulated day from noon with the phone placed at bedtime takes
+        about 1,300 steps (under a second on a desktop); a night without
+        the phone about 8,000, as the 30-second sleep alarm and the phone
+        alerts keep playing.
+        
+        Args:
+            duration: Clock seconds to run for
+        Returns:
+            int: Number of steps taken
+        """
+        virtual = clock.get_clock()
+        if not isinstance(virtual, clock.VirtualClock):
+            raise ValueError("run_discrete needs a VirtualClock installed")
+        
+        steps_before = virtual.steps
+        virtual.add_deadline_source(self.next_deadline)
+        try:
+            virtual.run_until(clock.time() + duration, self.run_handlers_once)
+        finally:
+            virtual.remove_deadline_source(self.next_deadline)
+        return virtual.steps - steps_before
+    
+    async def run_async(self):
+        """Cooperative run loop for the Smart Sleep Assistant
+        
+        Every handler is an independent uasyncio task with its own period, and
+        the effect engine playing the step sequences (beeps, brewing, night
+        mode) is ticked by its own task, so a long sequence no longer delays
+        the other handlers. Per-task start latency is recorded in
+        self.scheduler and reported periodically.
+        """
+        print("Smart Sleep Assistant running (async)...")
+        if self.use_simulated_time:
+            self.print_simulation_help()
+        
+        self.scheduler = TaskScheduler()
+        timed = self.stats.timed
+        self.scheduler.add("input_events", timed("input", self.handle_input_events), INPUT_EVENTS_PERIOD_MS)
+        self.scheduler.add("coffee_request", timed("coffee", self.check_coffee_request), COFFEE_REQUEST_PERIOD_MS)
+        self.scheduler.add("phone_presence", timed("phone", self.check_phone_presence), PHONE_PRESENCE_PERIOD_MS)
+        self.scheduler.add("schedule", timed("schedule", self.handle_schedule), SCHEDULE_PERIOD_MS)
+        self.scheduler.add("sleep_reminder", timed("remind", self.handle_sleep_time_reminder), SLEEP_REMINDER_PERIOD_MS)
+        self.scheduler.add("morning_wake_up", timed("wake", self.handle_morning_wake_up), MORNING_WAKE_UP_PERIOD_MS)
+        self.scheduler.add("status_display", timed("display", self.refresh_status_display), STATUS_DISPLAY_PERIOD_MS)
+        self.scheduler.add("telemetry", timed("telemetry", self.controller.web.poll_telemetry), TELEMETRY_PERIOD_MS)
+        self.scheduler.add("status_server", timed("http", self.status_server.poll), STATUS_SERVER_PERIOD_MS)
+        self.scheduler.add("effects", timed("effects", self.effects.tick), EFFECTS_PERIOD_MS)
+        self.scheduler.add("latency_report", self.scheduler.report, LATENCY_REPORT_PERIOD_MS)
+        self.scheduler.add("stats_report", self.stats.report, STATS_REPORT_PERIOD_MS)
+        
+        self.status_server.start()
+        try:
+            await self.scheduler.run()
+        finally:
+            self.status_server.stop()
+            self.scheduler.report()
+            self.scheduler = None
 
 # Run the Smart Sleep Assistant if script is executed directly
 if __name__ == "__main__":
@@ -700,5 +1144,8 @@ if __name__ == "__main__":
     # Set initial simulated time (24-hour format)
     ssa.set_simulated_time(hour=20, minute=30)  # Set to 21:28 PM
     
-    # Run the assistant
-    ssa.run()
\ No newline at end of file
+    # Run the assistant with every handler as its own task
+    try:
+        asyncio.run(ssa.run_async())
+    except KeyboardInterrupt:
+        print("Smart Sleep Assistant stopped")
\ No newline at end of file
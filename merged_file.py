@@ -702,14 +702,111 @@ class mfrc522Config(Uid):
 
 from machine import Pin
 import time
+from array import array
 from mfrc522_config import mfrc522Config
 from soft_iic import softIIC
 
-class mfrc522(mfrc522Config,softIIC):
+# CRC_A (ISO/IEC 14443-3): CRC-16/CCITT processed LSB first, so the
+# reflected polynomial 0x8408, preset 0x6363, no final XOR. Sent low byte first.
+CRC_A_PRESET = 0x6363
+
+def _crc_a_table():
+    table = array('H', [0] * 256)
+    for n in range(256):
+        crc = n
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8408 if crc & 1 else crc >> 1
+        table[n] = crc
+    return table
+
+CRC_A_TABLE = _crc_a_table()   # CRC of every byte value, one lookup per byte
+
+# A register transfer the reader does not ACK is tried again BUS_RETRIES
+# times, waiting BUS_BACKOFF_MS, then twice as long each time (1+2+4ms).
+# Once retries ran out the reader is degraded: transfers fail on the first
+# NACK, without waiting, until the owner clears degraded after setting the
+# reader up again.
+BUS_RETRIES = 3
+BUS_BACKOFF_MS = 1
+RESET_WAIT_MS = 50     # Oscillator start-up after a soft reset, polled up to 3 times
+
+def crc_a(data, length, crc=CRC_A_PRESET):
+    """Calculate a CRC_A in software
+    Args:
+        data: Bytes (list, bytes or bytearray)
+        length: Number of bytes from the start of data
+        crc: Preset, or the result for the bytes before to continue it
+    Returns:
+        int: 16-bit CRC, low byte is sent first
+    """
+    table = CRC_A_TABLE
+    for i in range(length):
+        crc = (crc >> 8) ^ table[(crc ^ data[i]) & 0xFF]
+    return crc
+
+class mfrc522(mfrc522Config):
    
-    def __init__(self, scl_, sda_, addr_):
-        # Invoke the parent class's constructor
-        softIIC.__init__(self, scl_, sda_, addr_)
+    def __init__(self, scl_, sda_, addr_, transport=None, software_crc=True):
+        # Register access goes through a transport with read_reg/write_reg/
+        # read_regs/write_regs: the bit-banged softIIC by default, or
+        # mfrc522_transport.I2CTransport on a machine.I2C bus
+        self.addr = addr_
+        if transport is None:
+            transport = softIIC(scl_, sda_, addr_)
+        self.transport = transport
+
+        # Register shadow cache: the last value written to registers that
+        # only the driver changes, so reading them and rewriting the same
+        # value skip the bus. Volatile registers (FIFO, IRQ, status, CRC,
+        # timer counter) are never cached.
+        self.shadow = {}
+        self.shadow_regs = {self.BitFramingReg, self.ModeReg, self.TxModeReg,
+                            self.RxModeReg, self.TxControlReg, self.TxASKReg,
+                            self.TxSelReg, self.RxSelReg, self.RxThresholdReg,
+                            self.DemodReg, self.MfTxReg, self.MfRxReg,
+                            self.ModWidthReg, self.RFCfgReg, self.GsNReg,
+                            self.CWGsPReg, self.ModGsPReg, self.TModeReg,
+                            self.TPrescalerReg, self.TReloadRegH, self.TReloadRegL}
+        # Registers where the bit masks touch a single writable bit next to
+        # read-only status bits: set/clear writes the bit without reading
+        self.single_bit_regs = {self.FIFOLevelReg: 0x80,   # FlushBuffer
+                                self.CollReg: 0x80}        # ValuesAfterColl
+        self.reads_saved = 0     # Bus reads answered from the shadow
+        self.writes_saved = 0    # Writes skipped as the value was already set
+
+        # Bus faults (see BUS_RETRIES)
+        self.degraded = False
+        self.bus_errors = 0      # Transfers that failed
+        self.bus_recovered = 0   # Transfers that went through on a retry
+
+        # CRC_A from the table in crc_a() instead of the chip's coprocessor,
+        # which costs a FIFO load, a poll and two result reads per frame
+        self.software_crc = software_crc
+
+    # Register transfers made so far
+    @property
+    def transactions(self):
+        return self.transport.transactions
+
+
+    # Repeats a register transfer that raised OSError (the reader did not ACK).
+    # Raises the last OSError if it never goes through.
+    def _bus_retry(self, transfer, *args):
+        self.bus_errors += 1
+        delay = BUS_BACKOFF_MS
+        for attempt in range(0 if self.degraded else BUS_RETRIES):
+            time.sleep_ms(delay)
+            delay *= 2
+            try:
+                value = transfer(*args)
+            except OSError:
+                self.bus_errors += 1
+                continue
+            self.bus_recovered += 1
+            self.degraded = False
+            return value
+        self.degraded = True
+        raise OSError(19)   # ENODEV, as machine.I2C reports a missing target
 
 
     # Writes a byte to the specified register in the MFRC522 chip.
@@ -718,7 +815,17 @@ class mfrc522(mfrc522Config,softIIC):
                           _reg,  #The register to write to. One of the PCD_Register enums.
                           _dat   #The value to write.
                           ):
-        self.Write(self.addr, _reg, _dat)
+        if _reg in self.shadow_regs:
+            if self.shadow.get(_reg) == _dat:
+                self.writes_saved += 1
+                return
+            self.shadow.pop(_reg, None)     # Unknown if the write fails
+        try:
+            self.transport.write_reg(_reg, _dat)
+        except OSError:
+            self._bus_retry(self.transport.write_reg, _reg, _dat)
+        if _reg in self.shadow_regs:
+            self.shadow[_reg] = _dat
 
     # Writes a number of bytes to the specified register in the MFRC522 chip.
     # The interface is described in the datasheet section 8.1.2.
@@ -727,23 +834,26 @@ class mfrc522(mfrc522Config,softIIC):
                            count,  #The number of bytes to write to the register
                            lst     #The values to write. Byte array.
                            ):
-        self.IIC_start()
-        self.IIC_write_byte(self.addr<<1)
-        self.IIC_slave_ack()
-        
-        self.IIC_write_byte(reg)
-        self.IIC_slave_ack()
-        
-        for i in range(count):
-            self.IIC_write_byte(lst[i])
-            self.IIC_slave_ack()
-        self.IIC_stop()
+        try:
+            self.transport.write_regs(reg, count, lst)
+        except OSError:
+            self._bus_retry(self.transport.write_regs, reg, count, lst)
  
 
     # Reads a byte from the specified register in the MFRC522 chip.
     # The interface is described in the datasheet section 8.1.2.
     def PCD_ReadRegister(self, _reg):     # The register to read from. One of the PCD_Register enums.
-        return self.Read(self.addr,_reg)
+        value = self.shadow.get(_reg)
+        if value is not None:
+            self.reads_saved += 1
+            return value
+        try:
+            value = self.transport.read_reg(_reg)
+        except OSError:
+            value = self._bus_retry(self.transport.read_reg, _reg)
+        if _reg in self.shadow_regs:
+            self.shadow[_reg] = value
+        return value
         # End PCD_ReadRegister()
 
 
@@ -758,38 +868,16 @@ class mfrc522(mfrc522Config,softIIC):
                           ):
         if count == 0:
             return
-        self.IIC_start()
-        self.IIC_write_byte(self.addr<<1)
-        self.IIC_slave_ack()
-        #print("--------------1")
-        self.IIC_write_byte(reg)
-        self.IIC_slave_ack()
-        self.IIC_stop()
-        #print("--------------2")
-        self.IIC_start()
-        self.IIC_write_byte((self.addr<<1)|1)
-        self.IIC_slave_ack()
-        #print("--------------3")
-        
-        for i in range(count):
-            if i == 0 and rxAlign != 0:         # Only update bit positions rxAlign..7 in values[0]
-                # Create bit mask for bit positions rxAlign..7
-                mask = 0
-                for i in range(rxAlign, 8):
-                    mask |= (1<<i)
-                # Read value and tell that we want to read the same address again.
-                value = self.IIC_read_byte()
-                # Apply mask to both current value of values[0] and the new data in value.
-                values[0] = (values[i] & ~mask) | (value & mask)
-            else:   # Normal case
-                values[i] = self.IIC_read_byte()
-            
-            if i < count - 1:
-                self.IIC_master_ack()
-            else:
-                self.IIC_master_notack()
-                self.IIC_stop()
-        #print(values)     
+        first = values[0]
+        try:
+            self.transport.read_regs(reg, count, values)
+        except OSError:
+            self._bus_retry(self.transport.read_regs, reg, count, values)
+        if rxAlign != 0:         # Only update bit positions rxAlign..7 in values[0]
+            # Create bit mask for bit positions rxAlign..7
+            mask = (0xFF << rxAlign) & 0xFF
+            # Apply mask to both the previous value of values[0] and the new data.
+            values[0] = (first & ~mask) | (values[0] & mask)
         # End PCD_ReadRegister()
         
         
@@ -814,10 +902,14 @@ class mfrc522(mfrc522Config,softIIC):
     def PCD_Reset(self):
         # Issue the SoftReset command.
         self.PCD_WriteRegister(self.CommandReg, self.PCD_SoftReset)
-        time.sleep(1)
-        
-        if self.PCD_ReadRegister(self.CommandReg) & (1<<4):
-            print("Reset error!")
+        self.shadow = {}    # Every register is back to its reset value
+        # The datasheet does not give the oscillator start-up time; poll the
+        # PowerDown bit, giving up after 3 waits.
+        for _ in range(3):
+            time.sleep_ms(RESET_WAIT_MS)
+            if not self.PCD_ReadRegister(self.CommandReg) & (1<<4):
+                return
+        print("Reset error!")
 
 
     # Turns the antenna on by enabling pins TX1 and TX2.
@@ -840,6 +932,10 @@ class mfrc522(mfrc522Config,softIIC):
                                reg,              # The register to update. One of the PCD_Register enums.
                                mask              # The bits to set.
                                ):
+        if reg in self.single_bit_regs:
+            self.reads_saved += 1
+            self.PCD_WriteRegister(reg, mask & self.single_bit_regs[reg])
+            return
         tmp = self.PCD_ReadRegister(reg)
         self.PCD_WriteRegister(reg, tmp | mask)  # set bit mask
         # End PCD_SetRegisterBitMask()
@@ -850,12 +946,17 @@ class mfrc522(mfrc522Config,softIIC):
                                  reg,   # The register to update. One of the PCD_Register enums.
                                  mask   # The bits to clear.
                                  ):
+        if reg in self.single_bit_regs:
+            self.reads_saved += 1
+            self.PCD_WriteRegister(reg, self.single_bit_regs[reg] & ~mask)
+            return
         tmp = self.PCD_ReadRegister(reg)
         self.PCD_WriteRegister(reg, tmp & (~mask))  #clear bit mask
         #  End PCD_ClearRegisterBitMask()
         
         
-    # Use the CRC coprocessor in the MFRC522 to calculate a CRC_A.  
+    # Calculate a CRC_A, in software (see crc_a()) when software_crc is set,
+    # otherwise with the CRC coprocessor in the MFRC522.
     #
     # @return STATUS_OK on success, STATUS_??? otherwise.
     def PCD_CalculateCRC(self,
@@ -863,17 +964,24 @@ class mfrc522(mfrc522Config,softIIC):
                          length, #In: The number of bytes to transfer.
                          result  #Out: Pointer to result buffer. Result is written to result[0..1], low byte first.
                          ):
+        if self.software_crc:
+            crc = crc_a(data, length)
+            result[0] = crc & 0xFF
+            result[1] = crc >> 8
+            return self.STATUS_OK
         self.PCD_WriteRegister(self.CommandReg, self.PCD_Idle)      # Stop any active command.
         self.PCD_WriteRegister(self.DivIrqReg, 0x04)                # Clear the CRCIRq interrupt request bit
         self.PCD_SetRegisterBitMask(self.FIFOLevelReg, 0x80)        # FlushBuffer = 1, FIFO initialization
         self.PCD_WriteRegister_(self.FIFODataReg, length, data)      # Write data to the FIFO
         self.PCD_WriteRegister(self.CommandReg, self.PCD_CalcCRC)   # Start the calculation
         # Wait for the CRC calculation to complete. Each iteration of the while-loop takes 17.73�s.
+        i = 5000
         while True:
             n = self.PCD_ReadRegister(self.DivIrqReg)    # DivIrqReg[7..0] bits are: Set2 reserved reserved MfinActIRq reserved CRCIRq reserved reserved
             if (n & 0x04):                               # CRCIRq bit set - calculation done
                 break
-            if (--i == 0):                               # The emergency break. We will eventually terminate on this one after 89ms. Communication with the MFRC522 might be down.
+            i -= 1
+            if i == 0:                                   # The emergency break. We will eventually terminate on this one after 89ms. Communication with the MFRC522 might be down.
                 return self.STATUS_TIMEOUT
         self.PCD_WriteRegister(self.CommandReg, self.PCD_Idle)     # Stop calculating CRC for new content in the FIFO. 
         
@@ -940,7 +1048,8 @@ class mfrc522(mfrc522Config,softIIC):
                 break
             if n & 0x01:
                 return self.STATUS_TIMEOUT
-            if --i == 0:
+            i -= 1
+            if i == 0:
                 return self.STATUS_TIMEOUT
         
         # Stop now if any errors except collisions were detected.
@@ -969,14 +1078,14 @@ class mfrc522(mfrc522Config,softIIC):
         # Perform CRC_A validation if requested.
         if backData != None and  backLen != None  and checkCRC != 0:
             # In this case a MIFARE Classic NAK is not OK.
-            if backLen[0] == 1 and _validBits[0] == 4:
+            if backLen[0] == 1 and _validBits == 4:
                 return self.STATUS_MIFARE_NACK
             # We need at least the CRC_A value and all 8 bits of the last byte must be received.
             if backLen[0] < 2 or _validBits != 0:
                 return self.STATUS_CRC_WRONG
             # Verify CRC_A - do our own calculation and store the control in controlBuffer.
             controlBuffer = [0, 0]
-            n = self.PCD_CalculateCRC(backData[0], backLen[0] - 2, controlBuffer[0])
+            n = self.PCD_CalculateCRC(backData, backLen[0] - 2, controlBuffer)
             if n != self.STATUS_OK:
                 return n
             if (backData[backLen[0] - 2] != controlBuffer[0]) or (backData[backLen[0] - 1] != controlBuffer[1]):
@@ -997,6 +1106,45 @@ class mfrc522(mfrc522Config,softIIC):
         return self.PICC_REQA_or_WUPA(cmd, bufferATQA, bufferSize)
         # End PICC_RequestA()
         
+        
+    # Transmits a Wake-UP command, Type A. Invites PICCs in state IDLE and HALT to go to READY(*) and prepare for anticollision or selection. 7 bit frame.
+    # Beware: When two PICCs are in the field at the same time I often get STATUS_TIMEOUT - probably due do bad antenna design.
+    # 
+    # @return STATUS_OK on success, STATUS_??? otherwise.
+    def PICC_WakeupA(self,
+                     bufferATQA,  # The buffer to store the ATQA (Answer to request) in
+                     bufferSize   # Buffer size, at least two bytes. Also number of bytes returned if STATUS_OK.
+                     ):
+        cmd    = [self.PICC_CMD_WUPA]
+        return self.PICC_REQA_or_WUPA(cmd, bufferATQA, bufferSize)
+        # End PICC_WakeupA()
+        
+        
+    # Instructs a PICC in state ACTIVE(*) to go to state HALT.
+    #
+    # @return STATUS_OK on success, STATUS_??? otherwise.
+    def PICC_HaltA(self):
+        buffer = [self.PICC_CMD_HLTA, 0, 0, 0]
+        crc = [0, 0]
+        # Calculate CRC_A
+        result = self.PCD_CalculateCRC(buffer, 2, crc)
+        if result != self.STATUS_OK:
+            return result
+        buffer[2] = crc[0]
+        buffer[3] = crc[1]
+        # Send the command.
+        # The standard says:
+        #       If the PICC responds with any modulation during a period of 1 ms after the end of the frame containing the
+        #       HLTA command, this response shall be interpreted as 'not acknowledge'.
+        # We interpret that this way: Only STATUS_TIMEOUT is a success.
+        result = self.PCD_TransceiveData(buffer, 4, None, None, None, 0, 0)
+        if result == self.STATUS_TIMEOUT:
+            return self.STATUS_OK
+        if result == self.STATUS_OK:    # That is ironically NOT ok in this case ;-)
+            return self.STATUS_ERROR
+        return result
+        # End PICC_HaltA()
+        
  
     # Transmits REQA or WUPA commands.
     # Beware: When two PICCs are in the field at the same time I often get STATUS_TIMEOUT - probably due do bad antenna design.
@@ -1111,8 +1259,8 @@ class mfrc522(mfrc522Config,softIIC):
             index = 2  # destination index in buffer[]
             #print(useCascadeTag);
             if useCascadeTag:
-                index = index+1
                 buffer[index] = self.PICC_CMD_CT
+                index = index+1
             # The number of bytes needed to represent the known bits for this level.
             bytesToCopy = 1 if currentLevelKnownBits % 8 > 0 else 0 # (currentLevelKnownBits % 8 ? 1 : 0) 
             bytesToCopy = currentLevelKnownBits // 8 + bytesToCopy
@@ -1121,8 +1269,8 @@ class mfrc522(mfrc522Config,softIIC):
                 if bytesToCopy > maxBytes:
                     bytesToCopy = maxBytes
                 for i in range(bytesToCopy):
-                    index = index+1
                     buffer[index] = uid.uidByte[uidIndex + i]
+                    index = index+1
             # Now that the data has been copied we need to include the 8 bits in CT in currentLevelKnownBits
             if useCascadeTag:
                 currentLevelKnownBits = currentLevelKnownBits + 8
@@ -1181,19 +1329,21 @@ class mfrc522(mfrc522Config,softIIC):
                     buffer[i] = responseBuffer[i-bufferFlag]
 
                 if result == self.STATUS_COLLISION:    # More than one PICC in the field => collision.
-                    result = self.PCD_ReadRegister(CollReg) # CollReg[7..0] bits are: ValuesAfterColl reserved CollPosNotValid CollPos[4:0]
+                    result = self.PCD_ReadRegister(self.CollReg) # CollReg[7..0] bits are: ValuesAfterColl reserved CollPosNotValid CollPos[4:0]
                     if result & 0x20:
                         return self.STATUS_COLLISION   # Without a valid collision position we cannot continue
                     collisionPos = result & 0x1F       # Values 0-31, 0 means bit 32.
                     if collisionPos == 0:
                         collisionPos = 32
-                    if collisionPos <= currentLevelKnownBits:  # No progress - should not happen
+                    # CollPos counts from the first received byte, which holds the partly known byte of the UID
+                    collisionPos = collisionPos + 8 * (currentLevelKnownBits // 8)
+                    if collisionPos <= currentLevelKnownBits or collisionPos > 32:  # No progress - should not happen
                         return self.STATUS_INTERNAL_ERROR
                     # Choose the PICC with the bit set.
                     currentLevelKnownBits = collisionPos
                     count = (currentLevelKnownBits - 1) % 8    # The bit to modify
-                    index = 1 if count else 0
-                    index = 1 + (currentLevelKnownBits / 8) + index  # First byte is index 0.
+                    index = 1 if currentLevelKnownBits % 8 else 0
+                    index = 1 + (currentLevelKnownBits // 8) + index  # First byte is index 0.
                     buffer[index] = buffer[index] | (1 << count)
                 elif result != self.STATUS_OK:
                     return result
@@ -1267,6 +1417,152 @@ class mfrc522(mfrc522Config,softIIC):
         # End PICC_ReadCardSerial()
         
         
+    # Executes the MFRC522 MFAuthent command.
+    # This command manages MIFARE authentication to enable a secure communication to any MIFARE Mini, MIFARE 1K and MIFARE 4K card.
+    # The authentication is described in the MFRC522 datasheet section 10.3.1.9 and http://www.nxp.com/documents/data_sheet/MF1S503x.pdf section 10.1.
+    # For use with MIFARE Classic PICCs.
+    # The PICC must be selected - ie in state ACTIVE(*) - before calling this function.
+    # Remember to call PCD_StopCrypto1() after communicating with the authenticated PICC - otherwise no new communications can start.
+    # 
+    # All keys are set to FFFFFFFFFFFFh at chip delivery.
+    # 
+    # @return STATUS_OK on success, STATUS_??? otherwise. Probably STATUS_TIMEOUT if you supply the wrong key.
+    def PCD_Authenticate(self,
+                         command,    # PICC_CMD_MF_AUTH_KEY_A or PICC_CMD_MF_AUTH_KEY_B
+                         blockAddr,  # The block number. See numbering in the comments in the .h file.
+                         key,        # Pointer to the Crypteo1 key to use (6 bytes)
+                         uid         # Pointer to Uid struct. The first 4 bytes of the UID is used.
+                         ):
+        waitIRq = 0x10      # IdleIRq
+        # Build command buffer
+        sendData = [command, blockAddr]
+        for i in range(self.MF_KEY_SIZE):   # 6 key bytes
+            sendData.append(key[i])
+        # Use the last uid bytes as specified in http://cache.nxp.com/documents/application_note/AN10927.pdf
+        # section 3.2.5 "MIFARE Classic Authentication".
+        # The only missed case is the MF1Sxxxx shortcut activation,
+        # but it requires cascade tag (CT) byte, that is not part of uid.
+        for i in range(4):                  # The last 4 bytes of the UID
+            sendData.append(uid.uidByte[i + uid.size - 4])
+        # Start the authentication.
+        return self.PCD_CommunicateWithPICC(self.PCD_MFAuthent, waitIRq, sendData, len(sendData), None, None, None, 0, 0)
+        # End PCD_Authenticate()
+
+
+    # Used to exit the PCD from its authenticated state.
+    # Remember to call this function after communicating with an authenticated PICC - otherwise no new communications can start.
+    def PCD_StopCrypto1(self):
+        # Clear MFCrypto1On bit
+        self.PCD_ClearRegisterBitMask(self.Status2Reg, 0x08)  # Status2Reg[7..0] bits are: TempSensClear I2CForceHS reserved reserved MFCrypto1On ModemState[2:0]
+        # End PCD_StopCrypto1()
+
+
+    # Reads 16 bytes (+ 2 bytes CRC_A) from the active PICC.
+    # 
+    # For MIFARE Classic the sector containing the block must be authenticated before calling this function.
+    # 
+    # For MIFARE Ultralight only addresses 00h to 0Fh are decoded.
+    # The MF0ICU1 returns a NAK for higher addresses.
+    # The MF0ICU1 responds to the READ command by sending 16 bytes starting from the page address defined by the command argument.
+    # For example; if blockAddr is 03h then pages 03h, 04h, 05h, 06h are returned.
+    # A roll-back is implemented: If blockAddr is 0Eh, then the contents of pages 0Eh, 0Fh, 00h and 01h are returned.
+    # 
+    # The buffer must be at least 18 bytes because a CRC_A is also returned.
+    # Checks the CRC_A before returning STATUS_OK.
+    # 
+    # @return STATUS_OK on success, STATUS_??? otherwise.
+    def MIFARE_Read(self,
+                    blockAddr,   # MIFARE Classic: The block (0-0xff) number. MIFARE Ultralight: The first page to return data from.
+                    buffer,      # The buffer to store the data in
+                    bufferSize   # Buffer size, at least 18 bytes. Also number of bytes returned if STATUS_OK.
+                    ):
+        # Sanity check
+        if buffer == None or bufferSize[0] < 18:
+            return self.STATUS_NO_ROOM
+        # Build command buffer
+        buffer[0] = self.PICC_CMD_MF_READ
+        buffer[1] = blockAddr
+        # Calculate CRC_A
+        crc = [0, 0]
+        result = self.PCD_CalculateCRC(buffer, 2, crc)
+        if result != self.STATUS_OK:
+            return result
+        buffer[2] = crc[0]
+        buffer[3] = crc[1]
+        # Transmit the buffer and receive the response, validate CRC_A.
+        return self.PCD_TransceiveData(buffer, 4, buffer, bufferSize, None, 0, 1)
+        # End MIFARE_Read()
+
+
+    # Writes 16 bytes to the active PICC.
+    # 
+    # For MIFARE Classic the sector containing the block must be authenticated before calling this function.
+    # 
+    # For MIFARE Ultralight the operation is called "COMPATIBILITY WRITE".
+    # Even though 16 bytes are transferred to the Ultralight PICC, only the least significant 4 bytes (bytes 0 to 3)
+    # are written to the specified address. It is recommended to set the remaining bytes 04h to 0Fh to all logic 0.
+    # 
+    # @return STATUS_OK on success, STATUS_??? otherwise.
+    def MIFARE_Write(self,
+                     blockAddr,  # MIFARE Classic: The block (0-0xff) number. MIFARE Ultralight: The page (2-15) to write to.
+                     buffer,     # The 16 bytes to write to the PICC
+                     bufferSize  # Buffer size, must be at least 16 bytes. Exactly 16 bytes are written.
+                     ):
+        # Sanity check
+        if buffer == None or bufferSize < 16:
+            return self.STATUS_INVALID
+        # Mifare Classic protocol requires two communications to perform a write.
+        # Step 1: Tell the PICC we want to write to block blockAddr.
+        cmdBuffer = [self.PICC_CMD_MF_WRITE, blockAddr]
+        result = self.PCD_MIFARE_Transceive(cmdBuffer, 2, False)   # Adds CRC_A and checks that the response is MF_ACK.
+        if result != self.STATUS_OK:
+            return result
+        # Step 2: Transfer the data
+        return self.PCD_MIFARE_Transceive(buffer, 16, False)      # Adds CRC_A and checks that the response is MF_ACK.
+        # End MIFARE_Write()
+
+
+    # Wrapper for MIFARE protocol communication.
+    # Adds CRC_A, executes the Transceive command and checks that the response is MF_ACK or a timeout.
+    # 
+    # @return STATUS_OK on success, STATUS_??? otherwise.
+    def PCD_MIFARE_Transceive(self,
+                              sendData,       # Pointer to the data to transfer to the FIFO. Do NOT include the CRC_A.
+                              sendLen,        # Number of bytes in sendData.
+                              acceptTimeout   # True => A timeout is also success
+                              ):
+        # Sanity check
+        if sendData == None or sendLen > 16:
+            return self.STATUS_INVALID
+        # Copy sendData[] to cmdBuffer[] and add CRC_A
+        cmdBuffer = [0] * 18    # We need room for 16 bytes data and 2 bytes CRC_A.
+        for i in range(sendLen):
+            cmdBuffer[i] = sendData[i]
+        crc = [0, 0]
+        result = self.PCD_CalculateCRC(cmdBuffer, sendLen, crc)
+        if result != self.STATUS_OK:
+            return result
+        cmdBuffer[sendLen] = crc[0]
+        cmdBuffer[sendLen + 1] = crc[1]
+        sendLen += 2
+        # Transceive the data, store the reply in cmdBuffer[]
+        waitIRq = 0x30      # RxIRq and IdleIRq
+        cmdBufferSize = [len(cmdBuffer)]
+        validBits = [0]
+        result = self.PCD_CommunicateWithPICC(self.PCD_Transceive, waitIRq, cmdBuffer, sendLen, cmdBuffer, cmdBufferSize, validBits, 0, 0)
+        if acceptTimeout and result == self.STATUS_TIMEOUT:
+            return self.STATUS_OK
+        if result != self.STATUS_OK:
+            return result
+        # The PICC must reply with a 4 bit ACK
+        if cmdBufferSize[0] != 1 or validBits[0] != 4:
+            return self.STATUS_ERROR
+        if (cmdBuffer[0] & 0x0F) != self.MF_ACK:
+            return self.STATUS_MIFARE_NACK
+        return self.STATUS_OK
+        # End PCD_MIFARE_Transceive()
+        
+        
     # Show details of PCD - MFRC522 Card Reader details.
     def ShowReaderDetails(self):
         v = self.PCD_ReadRegister(self.VersionReg)
@@ -1326,12 +1622,16 @@ while True:
 from machine import Pin
 import time
 
+ENODEV = 19          # OSError raised on a NACK, as machine.I2C does for a missing target
+ACK_POLLS = 20       # Polls of SDA (about 1us each) before the slave counts as not ACKing
+
 class softIIC:
 
     def __init__(self, scl_, sda_, addr_):
         self.addr = addr_
         self.scl  = scl_
         self.sda  = sda_
+        self.transactions = 0   # Register reads/writes since start
         
         
     def IIC_start(self):
@@ -1382,6 +1682,7 @@ class softIIC:
         Pin_scl.value(0)
 
 
+    # Returns True if the slave ACKed, False on a NACK (or no slave at all)
     def IIC_slave_ack(self):
         i=0
         Pin_scl = Pin(self.scl, Pin.OUT, value=0)    # create output pin
@@ -1391,11 +1692,15 @@ class softIIC:
         while Pin_sda.value() == 1:
             time.sleep_us(1)
             i = i+1
-            if i>20:
-                while 1 :
-                    print("IIC slave device not ack")
-                    time.sleep(1)
-                #return
+            if i>ACK_POLLS:
+                return False
+        return True
+
+
+    # Ends a transfer the slave did not ACK: STOP, then OSError(ENODEV)
+    def IIC_nack(self):
+        self.IIC_stop()
+        raise OSError(ENODEV)
                     
 
     def IIC_read_byte(self):
@@ -1435,17 +1740,21 @@ class softIIC:
  
  
     def Read(self, _adr, _reg):
+        self.transactions += 1
         self.IIC_start()
         self.IIC_write_byte(_adr<<1)
-        self.IIC_slave_ack()
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
         #print("--------------1")
         self.IIC_write_byte(_reg)
-        self.IIC_slave_ack()
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
         self.IIC_stop()
         #print("--------------2")
         self.IIC_start()
         self.IIC_write_byte((_adr<<1)|1)
-        self.IIC_slave_ack()
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
         #print("--------------3")
         dat = self.IIC_read_byte()
         self.IIC_master_notack()
@@ -1454,18 +1763,348 @@ class softIIC:
 
 
     def Write(self, _adr, _reg, _dat):
+        self.transactions += 1
         self.IIC_start()
         self.IIC_write_byte(_adr<<1)
-        self.IIC_slave_ack()
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
         
         self.IIC_write_byte(_reg)
-        self.IIC_slave_ack()
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
  
         self.IIC_write_byte(_dat)
-        self.IIC_slave_ack()
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
+        self.IIC_stop()
+
+
+    # Transport interface used by mfrc522 (see rc_transport):
+    # one register, or a run of bytes to/from the same register (the FIFO)
+    def read_reg(self, reg):
+        return self.Read(self.addr, reg)
+
+
+    def write_reg(self, reg, value):
+        self.Write(self.addr, reg, value)
+
+
+    def read_regs(self, reg, count, values):
+        self.transactions += 1
+        self.IIC_start()
+        self.IIC_write_byte(self.addr<<1)
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
+        self.IIC_write_byte(reg)
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
+        self.IIC_stop()
+        self.IIC_start()
+        self.IIC_write_byte((self.addr<<1)|1)
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
+        for i in range(count):
+            values[i] = self.IIC_read_byte()
+            if i < count - 1:
+                self.IIC_master_ack()
+            else:
+                self.IIC_master_notack()
+                self.IIC_stop()
+
+
+    def write_regs(self, reg, count, lst):
+        self.transactions += 1
+        self.IIC_start()
+        self.IIC_write_byte(self.addr<<1)
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
+        self.IIC_write_byte(reg)
+        if not self.IIC_slave_ack():
+            self.IIC_nack()
+        for i in range(count):
+            self.IIC_write_byte(lst[i])
+            if not self.IIC_slave_ack():
+                self.IIC_nack()
         self.IIC_stop()
         
         
+# file rc_transport
+
+from machine import I2C
+
+FIFO_SIZE = 64   # Longest run of bytes through one register (the MFRC522 FIFO)
+
+class I2CTransport:
+    """MFRC522 register access through a machine.I2C (or SoftI2C) bus
+    
+    Every access is a single readfrom_mem/writeto_mem call handled by the
+    bus driver in C, using buffers allocated once. Same interface as
+    softIIC: read_reg, write_reg, read_regs, write_regs, transactions.
+    """
+    def __init__(self, i2c, addr_):
+        self.i2c = i2c
+        self.addr = addr_
+        self.transactions = 0   # Register reads/writes since start
+        self.one = bytearray(1)
+        self.buf = bytearray(FIFO_SIZE)
+        self.view = memoryview(self.buf)
+
+    def read_reg(self, reg):
+        self.transactions += 1
+        self.i2c.readfrom_mem_into(self.addr, reg, self.one)
+        return self.one[0]
+
+    def write_reg(self, reg, value):
+        self.transactions += 1
+        self.one[0] = value
+        self.i2c.writeto_mem(self.addr, reg, self.one)
+
+    def read_regs(self, reg, count, values):
+        self.transactions += 1
+        data = self.view[:count]
+        self.i2c.readfrom_mem_into(self.addr, reg, data)
+        for i in range(count):
+            values[i] = data[i]
+
+    def write_regs(self, reg, count, lst):
+        self.transactions += 1
+        buf = self.buf
+        for i in range(count):
+            buf[i] = lst[i]
+        self.i2c.writeto_mem(self.addr, reg, self.view[:count])
+
+
+# file rc_trace
+
+from time import ticks_us, ticks_diff
+from mfrc522_config import mfrc522Config
+
+TRACE_SIZE = 256   # Register accesses kept, oldest overwritten first
+READ = 0
+WRITE = 1
+
+# Driver calls aggregated by default; nested calls count in every open one
+TRACED_OPS = ("PCD_Init", "PCD_AntennaOn", "PCD_AntennaOff", "PCD_CalculateCRC",
+              "PICC_RequestA", "PICC_WakeupA", "PICC_Select", "PICC_HaltA",
+              "PICC_IsNewCardPresent", "PICC_ReadCardSerial")
+
+def register_names():
+    """Returns a dict of register address -> name (e.g. 0x04 -> "ComIrqReg")"""
+    names = {}
+    for name in dir(mfrc522Config):
+        value = getattr(mfrc522Config, name)
+        if name.endswith("Reg") and isinstance(value, int):
+            names[value] = name
+    return names
+
+class OpStats:
+    """Totals of one traced driver call"""
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index    # Position in RegisterTracer.op_names
+        self.count = 0
+        self.us = 0           # Time inside the call
+        self.bus_us = 0       # Part of it spent in register transfers
+        self.transfers = 0
+        self.timeouts = 0     # STATUS_TIMEOUT results of PICC exchanges inside it
+        self.collisions = 0   # STATUS_COLLISION results (anticollision rounds)
+
+class TracingTransport:
+    """Register transport reporting every access to a RegisterTracer
+    
+    Wraps the transport an mfrc522 was created with (softIIC or
+    I2CTransport) and keeps its interface.
+    """
+    def __init__(self, inner, tracer):
+        self.inner = inner
+        self.tracer = tracer
+
+    @property
+    def transactions(self):
+        return self.inner.transactions
+
+    def read_reg(self, reg):
+        start = ticks_us()
+        value = self.inner.read_reg(reg)
+        self.tracer.record(READ, reg, value, 1, ticks_diff(ticks_us(), start))
+        return value
+
+    def write_reg(self, reg, value):
+        start = ticks_us()
+        self.inner.write_reg(reg, value)
+        self.tracer.record(WRITE, reg, value, 1, ticks_diff(ticks_us(), start))
+
+    def read_regs(self, reg, count, values):
+        start = ticks_us()
+        self.inner.read_regs(reg, count, values)
+        self.tracer.record(READ, reg, values[0] if count else 0, count, ticks_diff(ticks_us(), start))
+
+    def write_regs(self, reg, count, lst):
+        start = ticks_us()
+        self.inner.write_regs(reg, count, lst)
+        self.tracer.record(WRITE, reg, lst[0] if count else 0, count, ticks_diff(ticks_us(), start))
+
+class RegisterTracer:
+    """Opt-in bus tracer and profiler for an mfrc522
+    
+    attach() puts a TracingTransport in front of the driver's transport
+    and wraps the driver calls in TRACED_OPS. Every register access goes
+    into a preallocated ring (time, innermost call, read/write, register,
+    first value, byte count, duration); per call the tracer adds up the
+    calls, time, bus time, transfers and the STATUS_TIMEOUT and
+    STATUS_COLLISION results of the PICC exchanges made inside it.
+    Nothing of this runs until attach(), and detach() removes it again.
+    """
+    def __init__(self, size=TRACE_SIZE):
+        self.size = size
+        self.ticks = [0] * size
+        self.ops = [0] * size
+        self.kinds = [0] * size
+        self.regs = [0] * size
+        self.values = [0] * size
+        self.counts = [0] * size
+        self.durations = [0] * size
+        self.head = 0          # Next slot to write
+        self.recorded = 0      # Accesses recorded since the last reset
+        self.op_names = [""]   # Call names by index; 0 = outside any traced call
+        self.stats = {}        # Call name -> OpStats
+        self.stack = []        # OpStats of the calls in progress, outermost first
+        self.current = 0       # Index of the innermost call in progress
+        self.names = register_names()
+        self.rc522 = None
+        self.wrapped = []      # (object, attribute) replaced by wrappers
+
+    def attach(self, rc522, ops=TRACED_OPS):
+        """Start tracing a driver
+        Args:
+            rc522: mfrc522 instance
+            ops: Names of the driver methods to aggregate
+        """
+        if self.rc522 is not None:
+            self.detach()
+        self.rc522 = rc522
+        rc522.transport = TracingTransport(rc522.transport, self)
+        for name in ops:
+            if hasattr(rc522, name):
+                self.wrap(rc522, name)
+        communicate = rc522.PCD_CommunicateWithPICC
+        timeout = rc522.STATUS_TIMEOUT
+        collision = rc522.STATUS_COLLISION
+        stack = self.stack
+
+        def traced_communicate(*args):
+            status = communicate(*args)
+            if status == timeout:
+                for stats in stack:
+                    stats.timeouts += 1
+            elif status == collision:
+                for stats in stack:
+                    stats.collisions += 1
+            return status
+        rc522.PCD_CommunicateWithPICC = traced_communicate
+        self.wrapped.append((rc522, "PCD_CommunicateWithPICC"))
+
+    def wrap(self, obj, name, op=None):
+        """Aggregate the calls of a method of obj (e.g. RFIDManager.inventory) under op"""
+        method = getattr(obj, name)
+        op = op or name
+        stats = self.stats.get(op)
+        if stats is None:
+            stats = OpStats(op, len(self.op_names))
+            self.stats[op] = stats
+            self.op_names.append(op)
+        stack = self.stack
+        tracer = self
+
+        def traced(*args, **kwargs):
+            stats.count += 1
+            stack.append(stats)
+            tracer.current = stats.index
+            start = ticks_us()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.us += ticks_diff(ticks_us(), start)
+                stack.pop()
+                tracer.current = stack[-1].index if stack else 0
+        setattr(obj, name, traced)
+        self.wrapped.append((obj, name))
+
+    def detach(self):
+        """Stop tracing and restore the driver"""
+        for obj, name in self.wrapped:
+            try:
+                delattr(obj, name)   # Uncovers the class method again
+            except AttributeError:
+                pass
+        self.wrapped = []
+        if self.rc522 is not None and isinstance(self.rc522.transport, TracingTransport):
+            self.rc522.transport = self.rc522.transport.inner
+        self.rc522 = None
+
+    def record(self, kind, reg, value, count, us):
+        head = self.head
+        self.ticks[head] = ticks_us()
+        self.ops[head] = self.current
+        self.kinds[head] = kind
+        self.regs[head] = reg
+        self.values[head] = value
+        self.counts[head] = count
+        self.durations[head] = us
+        self.head = (head + 1) % self.size
+        self.recorded += 1
+        for stats in self.stack:
+            stats.bus_us += us
+            stats.transfers += 1
+
+    def reset(self):
+        """Clear the trace and the totals"""
+        self.head = 0
+        self.recorded = 0
+        for stats in self.stats.values():
+            stats.count = stats.us = stats.bus_us = stats.transfers = 0
+            stats.timeouts = stats.collisions = 0
+
+    def entries(self):
+        """Returns the kept accesses, oldest first, as tuples of
+        (ticks_us, call, "R"/"W", register name, value, bytes, us)"""
+        kept = min(self.recorded, self.size)
+        start = (self.head - kept) % self.size
+        rows = []
+        for n in range(kept):
+            i = (start + n) % self.size
+            reg = self.regs[i]
+            rows.append((self.ticks[i], self.op_names[self.ops[i]], "W" if self.kinds[i] else "R",
+                         self.names.get(reg, hex(reg)), self.values[i], self.counts[i],
+                         self.durations[i]))
+        return rows
+
+    def write_csv(self, stream):
+        """Write the kept accesses as CSV (header line first) to a file or stream"""
+        stream.write("ticks_us,call,dir,register,value,bytes,us\n")
+        for row in self.entries():
+            stream.write(",".join(str(field) for field in row) + "\n")
+
+    def summary_lines(self):
+        """Returns a text summary: one line per traced call that was made"""
+        lines = ["RFID calls: n us/call bus_us/call transfers/call timeouts collisions"]
+        for name in self.op_names[1:]:
+            stats = self.stats[name]
+            if stats.count == 0:
+                continue
+            lines.append(f"  {name}: {stats.count} {stats.us // stats.count} "
+                         f"{stats.bus_us // stats.count} {stats.transfers / stats.count:.1f} "
+                         f"{stats.timeouts} {stats.collisions}")
+        dropped = self.recorded - min(self.recorded, self.size)
+        lines.append(f"  accesses: {self.recorded} ({dropped} no longer in the trace)")
+        return lines
+
+    def report(self):
+        """Print the summary"""
+        for line in self.summary_lines():
+            print(line)
+
+
 #file i2c_lcd
 """Implements a HD44780 character LCD connected via PCF8574 on I2C. 
    This was tested with: https://www.wemos.cc/product/d1-mini.html""" 
@@ -1480,11 +2119,22 @@ MASK_RW = 0x02
 MASK_E = 0x04 
 SHIFT_BACKLIGHT = 3 
 SHIFT_DATA = 4 
+# Every byte sent to the LCD is 4 PCF8574 frames (high nibble with E set, 
+# E cleared, then the low nibble the same way). Frames are collected in one 
+# preallocated buffer and written in a single transaction. 
+FRAMES_PER_BYTE = 4 
+BULK_BUFFER_SIZE = 40 * FRAMES_PER_BYTE  # A full 2x16 redraw plus cursor moves 
 class I2cLcd(LcdApi): 
     """Implements a HD44780 character LCD connected via PCF8574 on I2C.""" 
     def __init__(self, i2c, i2c_addr, num_lines, num_columns): 
         self.i2c = i2c 
         self.i2c_addr = i2c_addr 
+        self.buf = bytearray(BULK_BUFFER_SIZE) 
+        self.buf_view = memoryview(self.buf) 
+        self.buf_len = 0 
+        self.bulk = 0            # Nesting depth of begin_bulk() 
+        self.transactions = 0    # writeto() calls made for commands and data 
+        self.bytes_sent = 0      # Frame bytes in those calls 
         self.i2c.writeto(self.i2c_addr, bytearray([0])) 
         sleep_ms(20)   # Allow LCD time to powerup 
         # Send reset 3 times 
@@ -1515,27 +2165,62 @@ class I2cLcd(LcdApi):
     def hal_backlight_off(self): 
         """Allows the hal layer to turn the backlight off.""" 
         self.i2c.writeto(self.i2c_addr, bytearray([0])) 
-    def hal_write_command(self, cmd): 
-        """Writes a command to the LCD. 
+    def hal_encode(self, value, rs): 
+        """Appends the 4 nibble frames of one byte to the transfer buffer. 
         Data is latched on the falling edge of E. 
         """ 
-        byte = ((self.backlight << SHIFT_BACKLIGHT) | (((cmd >> 4) & 0x0f) << SHIFT_DATA)) 
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E])) 
-        self.i2c.writeto(self.i2c_addr, bytearray([byte])) 
-        byte = ((self.backlight << SHIFT_BACKLIGHT) | ((cmd & 0x0f) << SHIFT_DATA)) 
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E])) 
-        self.i2c.writeto(self.i2c_addr, bytearray([byte])) 
+        if self.buf_len + FRAMES_PER_BYTE > BULK_BUFFER_SIZE: 
+            self.hal_flush() 
+        buf = self.buf 
+        i = self.buf_len 
+        byte = rs | (self.backlight << SHIFT_BACKLIGHT) | (((value >> 4) & 0x0f) << SHIFT_DATA) 
+        buf[i] = byte | MASK_E 
+        buf[i + 1] = byte 
+        byte = rs | (self.backlight << SHIFT_BACKLIGHT) | ((value & 0x0f) << SHIFT_DATA) 
+        buf[i + 2] = byte | MASK_E 
+        buf[i + 3] = byte 
+        self.buf_len = i + FRAMES_PER_BYTE 
+    def hal_flush(self): 
+        """Sends the buffered frames in a single I2C transaction.""" 
+        if self.buf_len: 
+            self.i2c.writeto(self.i2c_addr, self.buf_view[:self.buf_len]) 
+            self.transactions += 1 
+            self.bytes_sent += self.buf_len 
+            self.buf_len = 0 
+    def begin_bulk(self): 
+        """Collects the following commands and data instead of sending 
+        them one byte at a time, until the matching end_bulk(). 
+        """ 
+        self.bulk += 1 
+    def end_bulk(self): 
+        """Sends everything collected since begin_bulk().""" 
+        if self.bulk: 
+            self.bulk -= 1 
+        if not self.bulk: 
+            self.hal_flush() 
+    def hal_write_command(self, cmd): 
+        """Writes a command to the LCD.""" 
+        self.hal_encode(cmd, 0) 
         if cmd <= 3: 
             # The home and clear commands require a worst case delay of 4.1 msec 
+            self.hal_flush() 
             sleep_ms(5) 
+        elif not self.bulk: 
+            self.hal_flush() 
     def hal_write_data(self, data): 
         """Write data to the LCD.""" 
-        byte = (MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | (((data >> 4) & 0x0f) << SHIFT_DATA)) 
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E])) 
-        self.i2c.writeto(self.i2c_addr, bytearray([byte])) 
-        byte = (MASK_RS | (self.backlight << SHIFT_BACKLIGHT) | ((data & 0x0f) << SHIFT_DATA)) 
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E])) 
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        self.hal_encode(data, MASK_RS) 
+        if not self.bulk: 
+            self.hal_flush() 
+    def putstr(self, string): 
+        """Writes a string in one transaction (or a few, for long strings), 
+        relying on the LCD's auto-increment between characters. 
+        """ 
+        self.begin_bulk() 
+        try: 
+            LcdApi.putstr(self, string) 
+        finally: 
+            self.end_bulk()
 
 # file lcd_api
 
@@ -1665,9 +2350,11 @@ class LcdApi:
             self.cursor_x = 0 
             self.cursor_y += 1 
             self.implied_newline = (char != '\n') 
-        if self.cursor_y >= self.num_lines: 
-            self.cursor_y = 0 
-        self.move_to(self.cursor_x, self.cursor_y) 
+            if self.cursor_y >= self.num_lines: 
+                self.cursor_y = 0 
+            # The LCD advances the cursor by itself within a line, so it only 
+            # needs to be moved when wrapping to the next one 
+            self.move_to(self.cursor_x, self.cursor_y) 
     def putstr(self, string): 
         """Write the indicated string to the LCD at the current cursor 
         position and advances the cursor position appropriately. 
@@ -1769,4 +2456,179 @@ lcd.putstr('keyestudio')
 # 13. To print a custom character:
 #happy_face = bytearray([0x00, 0x0A, 0x00, 0x04, 0x00, 0x11, 0x0E, 0x00])
 #lcd.custom_char(0, happy_face)
-#lcd.putchar(chr(0))
\ No newline at end of file
+#lcd.putchar(chr(0))
+
+# file lcd_bench
+
+from time import ticks_us, ticks_diff 
+from machine import SoftI2C, Pin 
+from lcd_api import LcdApi 
+from i2c_lcd import I2cLcd 
+
+DEFAULT_I2C_ADDR = 0x27
+LINE = "12:34 Night 21C"  # 16 characters once padded
+
+class CountingI2C:
+    """Passes writes through to the bus while counting transactions and bytes"""
+    def __init__(self, i2c):
+        self.i2c = i2c
+        self.transactions = 0
+        self.bytes = 0      # Bytes on the wire, address byte included
+    def writeto(self, addr, buf):
+        self.transactions += 1
+        self.bytes += len(buf) + 1
+        return self.i2c.writeto(addr, buf)
+    def scan(self):
+        return self.i2c.scan()
+
+class UnbatchedLcd(I2cLcd):
+    """The previous transfer pattern: one writeto per nibble frame and a
+    cursor move after every character"""
+    def hal_flush(self):
+        for i in range(self.buf_len):
+            self.i2c.writeto(self.i2c_addr, bytearray([self.buf[i]]))
+        self.buf_len = 0
+    def putstr(self, string):
+        for char in string:
+            LcdApi.putchar(self, char)
+            self.move_to(self.cursor_x, self.cursor_y)
+
+def measure(lcd, bus, text, rounds=10):
+    """Returns (transactions, bytes, microseconds) per line"""
+    bus.transactions = 0
+    bus.bytes = 0
+    start = ticks_us()
+    for _ in range(rounds):
+        lcd.begin_bulk()
+        lcd.move_to(0, 0)
+        lcd.putstr(text)
+        lcd.end_bulk()
+    elapsed = ticks_diff(ticks_us(), start)
+    return (bus.transactions // rounds, bus.bytes // rounds, elapsed // rounds)
+
+bus = CountingI2C(SoftI2C(scl=Pin(22), sda=Pin(21), freq=100000))
+text = (LINE + " " * 16)[:16]
+results = []
+for name, cls in (("before", UnbatchedLcd), ("after", I2cLcd)):
+    lcd = cls(bus, DEFAULT_I2C_ADDR, 2, 16)
+    results.append((name, measure(lcd, bus, text)))
+
+print("16-character line: transactions bytes us")
+for name, (transactions, nbytes, us) in results:
+    print(f"  {name}: {transactions} {nbytes} {us}")
+
+# file rc_bench
+
+from time import ticks_us, ticks_diff 
+from machine import I2C, Pin 
+from mfrc522_i2c import mfrc522 
+from mfrc522_transport import I2CTransport 
+from mfrc522_trace import RegisterTracer 
+
+addr = 0x28
+scl = 22
+sda = 21
+REG_OPS = 200       # Register reads and writes timed per transport
+PRESENCE_ROUNDS = 10
+
+def register_ops_per_second(rc522):
+    """Returns (reads/s, writes/s) on registers the shadow cache never holds
+    (VersionReg, and WaterLevelReg written back unchanged)"""
+    start = ticks_us()
+    for _ in range(REG_OPS):
+        rc522.PCD_ReadRegister(rc522.VersionReg)
+    reads = ticks_diff(ticks_us(), start)
+    value = rc522.PCD_ReadRegister(rc522.WaterLevelReg)
+    start = ticks_us()
+    for _ in range(REG_OPS):
+        rc522.PCD_WriteRegister(rc522.WaterLevelReg, value)
+    writes = ticks_diff(ticks_us(), start)
+    return (REG_OPS * 1000000 // max(1, reads), REG_OPS * 1000000 // max(1, writes))
+
+def presence_us(rc522):
+    """Returns (average us per PICC_IsNewCardPresent, cards seen)"""
+    seen = 0
+    start = ticks_us()
+    for _ in range(PRESENCE_ROUNDS):
+        if rc522.PICC_IsNewCardPresent():
+            seen += 1
+            rc522.PICC_ReadCardSerial()  # Leave the card ACTIVE, as check_card does
+    return (ticks_diff(ticks_us(), start) // PRESENCE_ROUNDS, seen)
+
+results = []
+for name in ("soft_iic", "i2c"):
+    if name == "i2c":
+        transport = I2CTransport(I2C(0, scl=Pin(scl), sda=Pin(sda), freq=100000), addr)
+    else:
+        transport = None     # The bit-banged default
+    rc522 = mfrc522(scl, sda, addr, transport)
+    rc522.PCD_Init()
+    reads, writes = register_ops_per_second(rc522)
+    us, seen = presence_us(rc522)
+    results.append((name, reads, writes, us, seen))
+
+print("MFRC522 transport: reads/s writes/s IsNewCardPresent(us) cards")
+for name, reads, writes, us, seen in results:
+    print(f"  {name}: {reads} {writes} {us} {seen}/{PRESENCE_ROUNDS}")
+
+# Where the time of a presence check goes, on the last transport
+tracer = RegisterTracer()
+tracer.attach(rc522)
+presence_us(rc522)
+tracer.detach()
+tracer.report()
+
+
+# file rc_crc_bench
+
+from time import ticks_us, ticks_diff 
+from mfrc522_i2c import mfrc522, crc_a 
+
+addr = 0x28
+scl = 22
+sda = 21
+CRC_ROUNDS = 50     # CRC_A calculations timed per path
+
+# (frame, CRC_A low byte, high byte): ISO/IEC 14443-3 annex B examples and
+# the fixed frames the driver sends
+CRC_A_VECTORS = (
+    ([0x00, 0x00], 0xA0, 0x1E),
+    ([0x12, 0x34], 0x26, 0xCF),
+    ([0x50, 0x00], 0x57, 0xCD),                              # HLTA
+    ([0x30, 0x00], 0x02, 0xA8),                              # MIFARE READ block 0
+    ([0x93, 0x70, 0x9C, 0x40, 0x7A, 0x8E, 0x28], 0x3A, 0xCE),  # SELECT cascade level 1
+)
+
+def check_vectors(rc522):
+    """Returns the number of vectors where software or chip CRC_A is wrong"""
+    failed = 0
+    result = [0, 0]
+    for frame, low, high in CRC_A_VECTORS:
+        crc = crc_a(frame, len(frame))
+        rc522.software_crc = False
+        status = rc522.PCD_CalculateCRC(frame, len(frame), result)
+        if crc != low | (high << 8) or status != rc522.STATUS_OK or result != [low, high]:
+            print(f"  CRC_A mismatch for {frame}: {crc:04X} {result}")
+            failed += 1
+    return failed
+
+def crc_us(rc522, software):
+    """Returns (us for CRC_ROUNDS, bus transfers per CRC) on a 7-byte SELECT frame"""
+    rc522.software_crc = software
+    frame = CRC_A_VECTORS[-1][0]
+    result = [0, 0]
+    transactions = rc522.transactions
+    start = ticks_us()
+    for _ in range(CRC_ROUNDS):
+        rc522.PCD_CalculateCRC(frame, len(frame), result)
+    us = ticks_diff(ticks_us(), start)
+    return (us, (rc522.transactions - transactions) // CRC_ROUNDS)
+
+rc522 = mfrc522(scl, sda, addr)
+rc522.PCD_Init()
+failed = check_vectors(rc522)
+print(f"CRC_A vectors: {len(CRC_A_VECTORS) - failed}/{len(CRC_A_VECTORS)} ok")
+print(f"CRC_A of a SELECT frame: us per {CRC_ROUNDS}, transfers per CRC")
+for name, software in (("chip", False), ("table", True)):
+    us, transfers = crc_us(rc522, software)
+    print(f"  {name}: {us} {transfers}")
@@ -0,0 +1,371 @@
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+from clock import ticks_ms, ticks_diff, ticks_add
+
+MQTT_PORT = 1883
+KEEPALIVE_S = 60
+TIMEOUT_S = 2                # Connecting and writing; reads never wait
+QUEUE_SIZE = 64              # QoS 1 messages kept until the broker acknowledges them...
+QUEUE_BYTES = 8192           # ...within this many bytes
+RETRY_MIN_MS = 2000          # Wait after a failed connection, doubling...
+RETRY_MAX_MS = 60000         # ...up to this
+RECV_SIZE = 512
+
+# Packet types (high nibble of the first byte)
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+SUBSCRIBE = 0x82
+SUBACK = 0x90
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+DUP = 0x08
+EAGAIN = 11
+
+
+def _string(value):
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return len(value).to_bytes(2, "big") + value
+
+
+def _packet(first, body):
+    # Fixed header with the remaining length as a base-128 varint
+    header = bytearray([first])
+    length = len(body)
+    while True:
+        byte = length & 0x7F
+        length >>= 7
+        header.append(byte | 0x80 if length else byte)
+        if not length:
+            break
+    return header + body
+
+
+def topic_matches(pattern, topic):
+    """Check a topic against a subscription pattern with + and # wildcards"""
+    if pattern == topic:
+        return True
+    pattern = pattern.split("/")
+    topic = topic.split("/")
+    for i, level in enumerate(pattern):
+        if level == "#":
+            return True
+        if i >= len(topic) or (level != "+" and level != topic[i]):
+            return False
+    return len(pattern) == len(topic)
+
+
+class MqttClient:
+    """Minimal MQTT 3.1.1 client with an offline queue
+
+    publish() with qos=1 keeps the encoded message in a bounded queue
+    until the broker acknowledges it. While the connection is down the
+    queue keeps filling (the oldest message goes when it is full), and on
+    reconnecting everything not acknowledged is sent again, flagged DUP
+    when it may have gone out before. The session is persistent
+    (clean session off), so the broker keeps the subscriptions and the
+    QoS 1 messages for this client while it is away.
+
+    Nothing blocks for long: poll(), called from the run loop, reads only
+    what has arrived, answers and dispatches it, sends PINGREQ when the
+    link has been quiet for half the keep-alive and drops a connection
+    whose PINGRESP does not come back. Connecting is the one blocking
+    step (TIMEOUT_S at most), retried with a delay doubling from
+    RETRY_MIN_MS to RETRY_MAX_MS.
+    """
+
+    def __init__(self, client_id, host, port=MQTT_PORT, keepalive=KEEPALIVE_S,
+                 queue_size=QUEUE_SIZE, queue_bytes=QUEUE_BYTES):
+        self.client_id = client_id
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.queue_size = queue_size
+        self.queue_bytes = queue_bytes
+        self.will = None           # (topic, payload) published by the broker if we vanish
+        self.addr = None
+        self.sock = None
+        self.rbuf = b""
+        self.subscriptions = []    # (pattern, callback)
+        self.on_connect = None     # Called after every successful connect
+        self.queue = []            # [packet id, encoded PUBLISH] until PUBACK, oldest first
+        self.queued_bytes = 0
+        self.next_id = 0
+        self.last_sent_ms = 0
+        self.ping_sent_ms = None
+        self.retry_ms = RETRY_MIN_MS
+        self.retry_at = None
+
+        # Counters
+        self.published = 0
+        self.acked = 0
+        self.received = 0
+        self.dropped = 0
+        self.connects = 0
+        self.failures = 0
+
+    def stats(self):
+        """Get the counters
+        Returns:
+            dict: queued, queued_bytes, published, acked, received, dropped,
+                  connects, failures
+        """
+        return {"queued": len(self.queue), "queued_bytes": self.queued_bytes,
+                "published": self.published, "acked": self.acked,
+                "received": self.received, "dropped": self.dropped,
+                "connects": self.connects, "failures": self.failures}
+
+    def is_connected(self):
+        return self.sock is not None
+
+    def set_last_will(self, topic, payload):
+        """Retained message the broker publishes when the connection is lost"""
+        self.will = (topic, payload)
+
+    # ---- Publishing and subscribing ----
+
+    def publish(self, topic, payload, retain=False, qos=0):
+        """Publish a message
+        Args:
+            topic: Topic name
+            payload: bytes or str
+            retain: Ask the broker to keep it as the topic's last value
+            qos: 0 (sent now or never) or 1 (queued until acknowledged)
+        Returns:
+            bool: True if sent or queued
+        """
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        first = PUBLISH | (qos << 1) | (1 if retain else 0)
+        if qos == 0:
+            if self.sock is None:
+                self.dropped += 1
+                return False
+            try:
+                self._send(_packet(first, _string(topic) + payload))
+                self.published += 1
+            except OSError:
+                self._lost()
+                self.dropped += 1
+                return False
+            return True
+        self.next_id = self.next_id % 0xFFFF + 1
+        packet = _packet(first, _string(topic) + self.next_id.to_bytes(2, "big") + payload)
+        while self.queue and (len(self.queue) >= self.queue_size or
+                              self.queued_bytes + len(packet) > self.queue_bytes):
+            self.queued_bytes -= len(self.queue.pop(0)[1])
+            self.dropped += 1
+        self.queue.append([self.next_id, packet])
+        self.queued_bytes += len(packet)
+        if self.sock is not None:
+            try:
+                self._send_queued(packet)
+            except OSError:
+                self._lost()           # Stays queued for the next connection
+        return True
+
+    def subscribe(self, pattern, callback):
+        """Call callback(topic, payload) for every message matching a pattern
+        The subscription is (re)made on every connect.
+        """
+        self.subscriptions.append((pattern, callback))
+        if self.sock is not None:
+            try:
+                self._subscribe(pattern)
+            except OSError:
+                self._lost()
+
+    # ---- Connection ----
+
+    def connect(self):
+        """Connect to the broker, then resend what is queued
+        Returns:
+            bool: True if connected
+        """
+        if self.sock is not None:
+            return True
+        try:
+            if self.addr is None:
+                self.addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+            sock = socket.socket()
+            self.sock = sock
+            sock.settimeout(TIMEOUT_S)
+            sock.connect(self.addr)
+            flags = 0x00           # Clean session off: the broker keeps our state
+            payload = _string(self.client_id)
+            if self.will is not None:
+                flags |= 0x04 | 0x20       # Will flag, will retain, will QoS 0
+                payload += _string(self.will[0]) + _string(self.will[1])
+            body = _string("MQTT") + bytes([4, flags]) + self.keepalive.to_bytes(2, "big")
+            sock.sendall(_packet(CONNECT, body + payload))
+            ack = b""
+            while len(ack) < 4:
+                data = sock.recv(4 - len(ack))
+                if not data:
+                    raise OSError("Connection closed")
+                ack += data
+            if ack[0] != CONNACK or ack[3] != 0:
+                raise OSError(f"Refused ({ack[3]})")
+        except OSError as e:
+            print("MQTT connect error:", e)
+            self._lost()
+            self.addr = None
+            return False
+        self.rbuf = b""
+        self.connects += 1
+        self.retry_ms = RETRY_MIN_MS
+        self.retry_at = None
+        self.last_sent_ms = ticks_ms()
+        self.ping_sent_ms = None
+        try:
+            for pattern, callback in self.subscriptions:
+                self._subscribe(pattern)
+            for entry in self.queue:
+                self._send_queued(entry[1])
+            if self.on_connect is not None:
+                self.on_connect()
+        except OSError:
+            self._lost()
+            return False
+        return self.sock is not None
+
+    def disconnect(self):
+        """Leave cleanly (the broker does not publish the will)"""
+        if self.sock is None:
+            return
+        try:
+            self.sock.sendall(_packet(DISCONNECT, b""))
+        except OSError:
+            pass
+        self.sock.close()
+        self.sock = None
+
+    def _lost(self):
+        # Connection failed: close it and retry later
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+        self.failures += 1
+        self.retry_at = ticks_add(ticks_ms(), self.retry_ms)
+        self.retry_ms = min(self.retry_ms * 2, RETRY_MAX_MS)
+
+    # ---- Run loop ----
+
+    def poll(self):
+        """Keep the connection up and handle incoming packets (call from the run loop)
+        Returns:
+            int: Packets handled
+        """
+        if self.sock is None:
+            if self.retry_at is not None and ticks_diff(ticks_ms(), self.retry_at) < 0:
+                return 0
+            if not self.connect():
+                return 0
+        try:
+            handled = self._read()
+            now = ticks_ms()
+            if self.ping_sent_ms is not None:
+                if ticks_diff(now, self.ping_sent_ms) > self.keepalive * 1000:
+                    raise OSError("No PINGRESP")
+            elif ticks_diff(now, self.last_sent_ms) >= self.keepalive * 500:
+                self._send(_packet(PINGREQ, b""))
+                self.ping_sent_ms = now
+        except OSError as e:
+            print("MQTT connection lost:", e)
+            self._lost()
+            return 0
+        return handled
+
+    def _read(self):
+        # Take what has arrived without waiting, then handle complete packets
+        self.sock.settimeout(0)
+        try:
+            while True:
+                data = self.sock.recv(RECV_SIZE)
+                if not data:
+                    raise OSError("Connection closed")
+                self.rbuf += data
+                if len(data) < RECV_SIZE:
+                    break
+        except OSError as e:
+            if not e.args or e.args[0] != EAGAIN:
+                raise
+        finally:
+            if self.sock is not None:
+                self.sock.settimeout(TIMEOUT_S)
+        handled = 0
+        while True:
+            packet = self._next_packet()
+            if packet is None:
+                return handled
+            self._handle(*packet)
+            handled += 1
+
+    def _next_packet(self):
+        # (first byte, body) of the next complete packet in rbuf, or None
+        buf = self.rbuf
+        length = 0
+        shift = 0
+        i = 1
+        while True:
+            if i >= len(buf):
+                return None
+            byte = buf[i]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            i += 1
+            if not byte & 0x80:
+                break
+        if len(buf) < i + length:
+            return None
+        self.rbuf = buf[i + length:]
+        return buf[0], buf[i:i + length]
+
+    def _handle(self, first, body):
+        kind = first & 0xF0
+        if kind == PUBACK:
+            packet_id = int.from_bytes(body[:2], "big")
+            for i, entry in enumerate(self.queue):
+                if entry[0] == packet_id:
+                    self.queued_bytes -= len(entry[1])
+                    del self.queue[i]
+                    self.acked += 1
+                    break
+        elif kind == PUBLISH:
+            length = int.from_bytes(body[:2], "big")
+            topic = body[2:2 + length].decode("utf-8")
+            payload = body[2 + length:]
+            if first & 0x06:
+                packet_id = body[2 + length:4 + length]
+                payload = body[4 + length:]
+                self._send(_packet(PUBACK, packet_id))
+            self.received += 1
+            for pattern, callback in self.subscriptions:
+                if topic_matches(pattern, topic):
+                    try:
+                        callback(topic, payload)
+                    except Exception as e:
+                        print("MQTT callback error:", e)
+        elif kind == PINGRESP:
+            self.ping_sent_ms = None
+
+    def _subscribe(self, pattern):
+        self.next_id = self.next_id % 0xFFFF + 1
+        self._send(_packet(SUBSCRIBE, self.next_id.to_bytes(2, "big") + _string(pattern) + b"\x01"))
+
+    def _send_queued(self, packet):
+        self._send(packet)
+        self.published += 1
+        packet[0] |= DUP           # Any later send is a possible duplicate
+
+    def _send(self, packet):
+        self.sock.sendall(packet)
+        self.last_sent_ms = ticks_ms()
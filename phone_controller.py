@@ -1,21 +1,41 @@
 from display_manager import DisplayManager
 from actuator_manager import ActuatorManager
 from rfid_manager import RFIDManager
-import time
+from schedule import get_schedule
+from card_index import format_uid
+import clock
 
-CONFIGURED_SLEEP_TIME = 11 * 3600
-CARD_ID_DICT = {668: "James", 383: "Eric"}
+# Phone tags by card ID ("84-12-125-63", as printed by RFIDManager on a
+# read); enrolled on the first boot only, later changes are kept in the
+# RFID manager's card store
+PHONE_CARDS = {}
+
+# Owners of the phones enrolled on the assistant (long press of button 1
+# with the phones on the reader), in order; a tag profile's name wins
+PHONE_OWNERS = ("James", "Eric")
 
 class PhoneController:
-    def __init__(self):
+    def __init__(self, rfid=None):
+        """
+        Args:
+            rfid: RFIDManager to share (one reader, one card store), or
+                None to open one on the LCD's bus
+        """
         self.display = DisplayManager()
         self.actuators = ActuatorManager()
         self.controlled = False
-        self.rfid = RFIDManager()
+        # Share the LCD's bus on the same pins
+        self.rfid = RFIDManager(self.display.i2c) if rfid is None else rfid
+        if len(self.rfid.authorized_cards) == 0:
+            for card_id, name in PHONE_CARDS.items():
+                self.rfid.add_authorized_card(card_id, name)
+        if len(self.rfid.authorized_cards) == 0:
+            print("No phone enrolled: set PHONE_CARDS, or hold button 1 of the assistant "
+                  "with the phones on the reader")
 
     def get_current_time_seconds(self):
         """Get current time of day in seconds"""
-        t = time.localtime()
+        t = clock.localtime()
         return t[3] * 3600 + t[4] * 60 + t[5]
 
     def display_message(self):
@@ -26,7 +46,7 @@ class PhoneController:
                     break
             while not self.controlled:
                 current_time = self.get_current_time_seconds()
-                if current_time > CONFIGURED_SLEEP_TIME and not self.controlled:
+                if get_schedule().is_active("night", current_time) and not self.controlled:
                     self.display.display_two_lines("Time to sleep", "Put your phone here")
                 self.actuators.rgb_red()
                 self.actuators.buzzer_beep(220, 0.5)
@@ -37,23 +57,26 @@ class PhoneController:
                 #     self.controlled = False
                 #     self.actuators.rgb_red()
                 
-                time.sleep(10)
+                clock.sleep(10)
     
     def check_phone(self):
-        if self.rfid.check_card():
-            card_id = self.rfid.get_card_uid_sum()
-            self.display.display_text(f"Phone Detected: {card_id}")
+        # One inventory reads every phone on the reader
+        uids = self.rfid.inventory()
+        if uids:
+            self.display.display_text(f"Phones Detected: {len(uids)}")
+            names = [self.rfid.get_authorized_card_name(uid) for uid in uids]
+            unknown = [format_uid(uid) for uid, name in zip(uids, names) if name is None]
             
-            # Check if this is an authorized card
-            if card_id in CARD_ID_DICT.keys():
-                name = CARD_ID_DICT[card_id]
-                self.display.display_two_lines(f"Good night {name if name else ''}", "See you tomorrow")
+            # Check if these are all authorized cards
+            if not unknown:
+                names = " & ".join(names)
+                self.display.display_two_lines(f"Good night {names}", "See you tomorrow")
                 
                 # Visual and audio feedback
                 self.actuators.rgb_green()
                 self.actuators.buzzer_beep(880, 0.1)
 
-                print(f"Done for card: {card_id}")
+                print(f"Done for phones: {names}")
                 self.controlled = True
                 self.actuators.buzzer_off()
                 self.actuators.rgb_off()
@@ -67,7 +90,7 @@ class PhoneController:
                 for _ in range(2):  # Two quick error beeps
                     self.actuators.buzzer_beep(220, 0.2)
                 
-                print(f"Denied for card: {card_id}")
+                print(f"Denied for cards: {unknown}")
                 self.actuators.rgb_off()
         else:
             self.controlled = False
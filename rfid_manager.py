@@ -1,35 +1,162 @@
 from machine import UART, Pin, I2C
-import time
+import clock
+from clock import ticks_ms, ticks_diff, ticks_add
 from mfrc522_i2c import mfrc522  # Make sure this library is available
+from mfrc522_transport import I2CTransport
+from card_index import parse_uid, format_uid
+from card_store import CardStore
+from tag_profile import TagProfile, PROFILE_BLOCK, PROFILE_BLOCKS, PROFILE_KEY, BLOCK_SIZE
+from schedule import SLEEP_TIME, WAKE_TIME
 
 # Constants for I2C communication with MFRC522
 I2C_ADDR = 0x28     # Default I2C address for MFRC522
 PIN_SCL = 22        # SCL pin for I2C
 PIN_SDA = 21        # SDA pin for I2C
+I2C_ID = 0          # Hardware I2C peripheral used when no bus is shared
+I2C_FREQ = 100000   # Bus speed (the LCD on the same bus is limited to 100kHz)
+
+# Presence tracking: reads needed to change state, and poll intervals (ms)
+PRESENCE_ARRIVE_READS = 2     # Consecutive reads before a card counts as present
+PRESENCE_DEPART_MISSES = 3    # Consecutive misses before a present card counts as gone
+PRESENCE_STABLE_MS = 5000     # Poll interval while the card is stably present
+PRESENCE_ABSENT_MS = 1000     # Poll interval while no card is present
+PRESENCE_FAST_MS = 200        # Poll interval while arriving or departing
+PRESENCE_MAX_MS = 30000       # Longest poll interval the stable interval backs off to
+PRESENCE_STALE_MS = 60000     # Start over if not updated for this long
+PRESENCE_VERIFY_EVERY = 4     # Full inventory every this many polls of a stable card
+PROFILE_FAILED_MAX = 16       # Cards remembered as holding no readable profile
+
+# Select acknowledges of MIFARE Classic 1K and 4K, the tags a profile is read from
+MIFARE_CLASSIC_SAKS = (0x08, 0x18)
+
+# Inventory: one poll cycle reads every card in the field
+INVENTORY_BUDGET_MS = 150     # Time limit of one inventory
+INVENTORY_MAX_CARDS = 4       # Cards read per inventory at most
+INVENTORY_RETRIES = 2         # Failed selects tolerated per inventory
+RF_RESET_MS = 5               # Field off time that resets halted cards to IDLE
+RF_SETTLE_MS = 5              # Time for the cards to power up after the field is back
+# Response timeout (reader timer reload, 25us ticks as set up by PCD_Init)
+INVENTORY_TIMER_RELOAD = 40   # 1ms: REQA, anticollision and select answer well within it
+DEFAULT_TIMER_RELOAD = 1000   # 25ms, PCD_Init's value for the memory commands
+
+# Reader lost on the bus (see mfrc522 BUS_RETRIES): set it up again after
+# a delay doubling from RECONNECT_MIN_MS up to RECONNECT_MAX_MS
+RECONNECT_MIN_MS = 1000
+RECONNECT_MAX_MS = 60000
+
+# Presence states
+ABSENT = 0
+ARRIVING = 1
+PRESENT = 2
+DEPARTING = 3
 
 class RFIDManager:
     """RFID Manager for MFRC522 module using I2C interface"""
     
-    def __init__(self):
-        """Initialize RFID reader with I2C interface"""
+    def __init__(self, i2c=None, store_path=None):
+        """Initialize RFID reader with I2C interface
+        
+        Args:
+            i2c: machine.I2C/SoftI2C bus shared with the other devices on
+                the pins, or None to open the hardware I2C peripheral
+                (falling back to the bit-banged driver)
+            store_path: Flash file of the enrolled cards (default: card_store.STORE_PATH)
+        """
+        self.authorized_cards = CardStore(store_path)  # Enrolled cards, loaded on first use
+        self.card_saks = {}     # UID tuple -> select acknowledge, from the last inventory
+        self.tracer = None   # RegisterTracer while enable_trace() is on
+        
+        # Store state
+        self.last_scan_time = 0
+        self.last_card_id = None
+        self.card_uid_bytes = None
+        self.last_card_uid_sum = None
+        
+        # Field state: PCD_Init leaves the antenna on
+        self.low_power = False          # Antenna off between reads
+        self.field_on = True
+        self.field_on_since = ticks_ms()
+        self.field_on_total_ms = 0
+        
+        # Reconnection after the reader stopped answering
+        self.reconnect_ms = RECONNECT_MIN_MS
+        self.reconnect_at = None        # Tick of the next attempt, None while connected
+        self.reconnects = 0
+        
+        self.rc522 = None
         try:
             # Initialize MFRC522 with I2C
-            self.rc522 = mfrc522(PIN_SCL, PIN_SDA, I2C_ADDR)
+            self.rc522 = mfrc522(PIN_SCL, PIN_SDA, I2C_ADDR, self._open_transport(i2c))
             self.rc522.PCD_Init()
             self.rc522.ShowReaderDetails()
-            
-            # Store state
-            self.last_scan_time = 0
-            self.last_card_id = None
-            self.card_uid_bytes = None
-            self.authorized_cards = {}  # Dictionary to store authorized card IDs
-            
             print("RFID manager initialized successfully")
-            self.is_connected = True
-            
         except Exception as e:
             print(f"Error initializing RFID manager: {e}")
-            self.is_connected = False
+            if self.rc522 is not None:
+                self.rc522.degraded = True
+                self._schedule_reconnect()
+        
+        self.presence = PresenceTracker(self)
+    
+    @property
+    def is_connected(self):
+        """True while the reader answers on the bus
+        
+        A reader that stopped answering (a loose cable) is set up again
+        once the reconnect delay has passed, so this turns True again by
+        itself when the bus is back.
+        """
+        rc522 = self.rc522
+        if rc522 is None:
+            return False
+        if not rc522.degraded:
+            return True
+        return self._reconnect()
+    
+    def _reconnect(self):
+        if self.reconnect_at is None:
+            # Noticed just now
+            print("RFID reader not answering")
+            self._schedule_reconnect()
+            return False
+        if ticks_diff(ticks_ms(), self.reconnect_at) < 0:
+            return False
+        rc522 = self.rc522
+        rc522.degraded = False
+        try:
+            rc522.PCD_Init()
+        except OSError:
+            rc522.degraded = True
+            self.reconnect_ms = min(self.reconnect_ms * 2, RECONNECT_MAX_MS)
+            self._schedule_reconnect()
+            return False
+        # PCD_Init turned the antenna on
+        if not self.field_on:
+            self.field_on = True
+            self.field_on_since = ticks_ms()
+        self.reconnect_ms = RECONNECT_MIN_MS
+        self.reconnect_at = None
+        self.reconnects += 1
+        print("RFID reader reconnected")
+        self._field_down()
+        return True
+    
+    def _schedule_reconnect(self):
+        self.reconnect_at = ticks_add(ticks_ms(), self.reconnect_ms)
+    
+    def _open_transport(self, i2c):
+        """Get the register transport for the reader
+        
+        Returns:
+            I2CTransport, or None for the driver's bit-banged default
+        """
+        if i2c is None:
+            try:
+                i2c = I2C(I2C_ID, scl=Pin(PIN_SCL), sda=Pin(PIN_SDA), freq=I2C_FREQ)
+            except Exception as e:
+                print(f"Hardware I2C unavailable ({e}), using bit-banged I2C")
+                return None
+        return I2CTransport(i2c, I2C_ADDR)
     
     def check_card(self):
         """Check if a new card is present
@@ -41,6 +168,7 @@ class RFIDManager:
             return False
             
         try:
+            self._field_up()
             # First check if a new card is present
             # if not self.rc522.PICC_IsNewCardPresent():
             #     return False
@@ -52,7 +180,7 @@ class RFIDManager:
             # If we got here, we successfully detected a card
             # self.rc522.PICC_IsNewCardPresent()
             # self.rc522.PICC_ReadCardSerial()
-            # self.last_scan_time = time.time()
+            # self.last_scan_time = clock.time()
             
             # # Get card UID
             # self._process_card_data()
@@ -65,24 +193,338 @@ class RFIDManager:
             if self.rc522.PICC_IsNewCardPresent():
                 #print("Is new card present!")
                 if self.rc522.PICC_ReadCardSerial() == True:
-                    print("Card UID:")
-                    #print(rc522.uid.uidByte[0 : rc522.uid.size])
-                    for i in self.rc522.uid.uidByte[0 : self.rc522.uid.size]:
-                        data = data + i
-                print(data)
-                if(data != 0):
-                    self.last_scan_time = time.time()
-                    data = 0
-                    return True
-                
-                #self.last_scan_time = time.time()
-                data = 0
+                    self._process_card_data()
+                    if self.last_card_uid_sum != 0:
+                        self.last_scan_time = clock.time()
+                        return True
                 return False
               
             return False
         except Exception as e:
             print(f"Error checking RFID card: {e}")
             return False
+        finally:
+            self._field_down()
+    
+    def probe_card(self):
+        """Read the UID of the card in the field, halted cards included
+        
+        Wakes the card with WUPA, selects it and halts it again. A card
+        left ACTIVE ignores the next REQA and falls back to IDLE, so plain
+        check_card() calls only see a resting card every other time; a
+        halted card answers every WUPA.
+        
+        Returns:
+            tuple: UID bytes, or None if no card answered
+        """
+        if not self.is_connected:
+            return None
+        try:
+            rc522 = self.rc522
+            self._field_up()
+            atqa = [0, 0]
+            result = rc522.PICC_WakeupA(atqa, [len(atqa)])
+            if result != rc522.STATUS_OK and result != rc522.STATUS_COLLISION:
+                return None
+            if not rc522.PICC_ReadCardSerial():
+                return None
+            uid = tuple(rc522.uid.uidByte[0 : rc522.uid.size])
+            rc522.PICC_HaltA()
+            if sum(uid) == 0:
+                return None
+            self.card_uid_bytes = list(uid)
+            self.last_card_id = format_uid(uid)
+            self.last_card_uid_sum = sum(uid)
+            self.last_scan_time = clock.time()
+            return uid
+        except Exception as e:
+            print(f"Error probing RFID card: {e}")
+            return None
+        finally:
+            self._field_down()
+    
+    def wake_probe(self):
+        """Check that a card still answers, without reading its UID
+        
+        One WUPA (a 7-bit frame) with the short response timeout: enough
+        to confirm a card already identified is still on the reader. In
+        low-power mode the field only comes up for the probe, which also
+        resets the card, so it answers whatever state it was left in.
+        
+        Returns:
+            bool: True if any card answered
+        """
+        if not self.is_connected:
+            return False
+        rc522 = self.rc522
+        try:
+            self._field_up()
+            self._set_timer_reload(INVENTORY_TIMER_RELOAD)
+            atqa = [0, 0]
+            result = rc522.PICC_WakeupA(atqa, [len(atqa)])
+            rc522.PICC_HaltA()   # Sends the READY card back to IDLE/HALT, ready for the next WUPA
+            return result == rc522.STATUS_OK or result == rc522.STATUS_COLLISION
+        except Exception as e:
+            print(f"Error probing RFID card: {e}")
+            return False
+        finally:
+            self._set_timer_reload(DEFAULT_TIMER_RELOAD)
+            self._field_down()
+    
+    def inventory(self, budget_ms=INVENTORY_BUDGET_MS, max_cards=INVENTORY_MAX_CARDS):
+        """Read the UIDs of every card in the field
+        
+        Resets the field (or powers it up in low-power mode) so cards
+        halted by the previous inventory are IDLE again, then repeats
+        REQA, select and HLTA. A
+        halted card no longer answers REQA, so each round selects a card
+        not read yet, until none answers. The response timeout is cut to
+        1ms meanwhile, so the final unanswered REQA is cheap.
+        
+        Args:
+            budget_ms: Stop after this long even if cards are left
+            max_cards: Stop after this many cards
+        
+        Returns:
+            list: UID tuples in the order the cards were selected
+        """
+        uids = []
+        self.card_saks = {}
+        if not self.is_connected:
+            return uids
+        rc522 = self.rc522
+        try:
+            self._field_up(reset=True)
+            self._set_timer_reload(INVENTORY_TIMER_RELOAD)
+            start = ticks_ms()
+            failures = 0
+            atqa = [0, 0]
+            while len(uids) < max_cards and ticks_diff(ticks_ms(), start) < budget_ms:
+                result = rc522.PICC_RequestA(atqa, [len(atqa)])
+                if result != rc522.STATUS_OK and result != rc522.STATUS_COLLISION:
+                    break   # No card left in IDLE
+                if not rc522.PICC_ReadCardSerial():
+                    # The cards fell back to IDLE and answer the next REQA
+                    failures += 1
+                    if failures > INVENTORY_RETRIES:
+                        break
+                    continue
+                uid = tuple(rc522.uid.uidByte[0 : rc522.uid.size])
+                rc522.PICC_HaltA()
+                if sum(uid) != 0 and uid not in uids:
+                    uids.append(uid)
+                    self.card_saks[uid] = rc522.uid.sak
+        except Exception as e:
+            print(f"Error reading RFID inventory: {e}")
+        finally:
+            self._set_timer_reload(DEFAULT_TIMER_RELOAD)
+            self._field_down()
+        if uids:
+            self.card_uid_bytes = list(uids[0])
+            self.last_card_id = format_uid(uids[0])
+            self.last_card_uid_sum = sum(uids[0])
+            self.last_scan_time = clock.time()
+        return uids
+    
+    def is_mifare_classic(self, uid):
+        """Check if the last inventory selected a card as MIFARE Classic"""
+        return self.card_saks.get(tuple(uid)) in MIFARE_CLASSIC_SAKS
+    
+    def read_tag_profile(self, uid=None):
+        """Read the owner profile stored on a MIFARE Classic tag
+        
+        One session: wake the card, select it, authenticate its sector
+        once with PROFILE_KEY, read the profile's consecutive blocks and
+        halt it again.
+        
+        Args:
+            uid: UID bytes of the card to read (it may share the field
+                with others), or None for any card
+        
+        Returns:
+            TagProfile, or None if no card answered or it holds no profile
+        """
+        data = bytearray()
+        if not self._tag_session(uid, self._read_blocks, data):
+            return None
+        try:
+            return TagProfile.decode(data)
+        except (ValueError, UnicodeError) as e:
+            print(f"Tag profile unreadable: {e}")
+            return None
+    
+    def write_tag_profile(self, profile, uid=None):
+        """Store an owner profile on a MIFARE Classic tag
+        
+        Args:
+            profile: TagProfile to store
+            uid: UID bytes of the card to write, or None for any card
+        
+        Returns:
+            bool: True if every block was written
+        """
+        if not self._tag_session(uid, self._write_blocks, profile.encode()):
+            return False
+        if uid is not None:
+            self.presence.no_profile.discard(tuple(uid))   # Read it on its next arrival
+        return True
+    
+    def _read_blocks(self, data):
+        rc522 = self.rc522
+        buffer = [0] * (BLOCK_SIZE + 2)   # Block and CRC_A
+        for block in range(PROFILE_BLOCK, PROFILE_BLOCK + PROFILE_BLOCKS):
+            size = [len(buffer)]
+            result = rc522.MIFARE_Read(block, buffer, size)
+            if result != rc522.STATUS_OK:
+                print(f"Tag read of block {block} failed: {result}")
+                return False
+            data.extend(buffer[0:BLOCK_SIZE])
+        return True
+    
+    def _write_blocks(self, data):
+        rc522 = self.rc522
+        for i in range(PROFILE_BLOCKS):
+            block = list(data[i * BLOCK_SIZE : (i + 1) * BLOCK_SIZE])
+            result = rc522.MIFARE_Write(PROFILE_BLOCK + i, block, BLOCK_SIZE)
+            if result != rc522.STATUS_OK:
+                print(f"Tag write of block {PROFILE_BLOCK + i} failed: {result}")
+                return False
+        return True
+    
+    def _tag_session(self, uid, transfer, data):
+        # Select a card, authenticate the profile sector and run transfer(data)
+        if not self.is_connected:
+            return False
+        rc522 = self.rc522
+        selected = False
+        try:
+            self._field_up()
+            atqa = [0, 0]
+            result = rc522.PICC_WakeupA(atqa, [len(atqa)])
+            if result != rc522.STATUS_OK and result != rc522.STATUS_COLLISION:
+                return False
+            if uid is None:
+                result = rc522.PICC_Select(rc522.uid, 0)
+            else:
+                # Select the known UID directly, skipping anticollision
+                rc522.uid.size = len(uid)
+                rc522.uid.uidByte[0 : len(uid)] = list(uid)
+                result = rc522.PICC_Select(rc522.uid, 8 * len(uid))
+            if result != rc522.STATUS_OK:
+                return False
+            selected = True
+            result = rc522.PCD_Authenticate(rc522.PICC_CMD_MF_AUTH_KEY_A, PROFILE_BLOCK,
+                                            PROFILE_KEY, rc522.uid)
+            if result != rc522.STATUS_OK:
+                print(f"Tag authentication failed: {result}")
+                return False
+            return transfer(data)
+        except Exception as e:
+            print(f"Error accessing RFID tag: {e}")
+            return False
+        finally:
+            if selected and not rc522.degraded:
+                rc522.PICC_HaltA()
+                rc522.PCD_StopCrypto1()
+            self._field_down()
+    
+    def set_low_power(self, enabled):
+        """Switch the antenna off between reads (or keep it on)
+        
+        In low-power mode every read powers the field up, waits for the
+        cards to start and switches it off again, so the antenna only
+        radiates for the few milliseconds of each poll.
+        """
+        if not self.is_connected:
+            return
+        self.low_power = enabled
+        if enabled:
+            self._field_down()
+        else:
+            self._set_field(True)
+    
+    def antenna_on_ms(self):
+        """Get the total time the antenna has been on"""
+        if self.rc522 is None:
+            return 0
+        total = self.field_on_total_ms
+        if self.field_on:
+            total += ticks_diff(ticks_ms(), self.field_on_since)
+        return total
+    
+    def _set_field(self, on):
+        if on == self.field_on:
+            return
+        if on:
+            self.rc522.PCD_AntennaOn()
+            self.field_on_since = ticks_ms()
+        else:
+            self.rc522.PCD_AntennaOff()
+            self.field_on_total_ms += ticks_diff(ticks_ms(), self.field_on_since)
+        self.field_on = on
+    
+    def _field_up(self, reset=False):
+        # Power the field before a read; with reset, cycle it if it is on
+        # so halted cards restart in IDLE
+        if self.field_on:
+            if not reset:
+                return
+            self._set_field(False)
+            clock.sleep_ms(RF_RESET_MS)
+        self._set_field(True)
+        clock.sleep_ms(RF_SETTLE_MS)
+    
+    def _field_down(self):
+        # Skipped after a bus failure: the reader is set up again anyway
+        if self.low_power and not self.rc522.degraded:
+            self._set_field(False)
+    
+    def _set_timer_reload(self, reload):
+        # The register shadow skips these writes when the value is already set
+        if self.rc522.degraded:
+            return
+        self.rc522.PCD_WriteRegister(self.rc522.TReloadRegH, reload >> 8)
+        self.rc522.PCD_WriteRegister(self.rc522.TReloadRegL, reload & 0xFF)
+    
+    def enable_trace(self, size=None):
+        """Start tracing the reader's bus traffic (see mfrc522_trace)
+        
+        Args:
+            size: Register accesses kept in the trace (default TRACE_SIZE)
+        
+        Returns:
+            RegisterTracer: Call report(), write_csv() or entries() on it
+        """
+        from mfrc522_trace import RegisterTracer, TRACE_SIZE
+        self.disable_trace()
+        self.tracer = RegisterTracer(size or TRACE_SIZE)
+        self.tracer.attach(self.rc522)
+        for name in ("check_card", "probe_card", "wake_probe", "inventory", "read_tag_profile"):
+            self.tracer.wrap(self, name)
+        return self.tracer
+    
+    def disable_trace(self):
+        """Stop tracing; the last tracer keeps its data"""
+        if self.tracer is not None:
+            self.tracer.detach()
+    
+    def i2c_transactions(self):
+        """Get the number of I2C register transfers made to the reader so far"""
+        if self.rc522 is None:
+            return 0
+        return self.rc522.transactions
+    
+    def i2c_transactions_saved(self):
+        """Get the number of register transfers the driver's shadow cache avoided"""
+        if self.rc522 is None:
+            return 0
+        return self.rc522.reads_saved + self.rc522.writes_saved
+    
+    def bus_errors(self):
+        """Get the number of register transfers the reader did not ACK"""
+        if self.rc522 is None:
+            return 0
+        return self.rc522.bus_errors
     
     def _process_card_data(self):
         """Process RFID card data from the MFRC522 reader"""
@@ -138,75 +580,117 @@ class RFIDManager:
         """
         if self.last_scan_time == 0:
             return float('inf')
-        return time.time() - self.last_scan_time
+        return clock.time() - self.last_scan_time
     
-    def add_authorized_card(self, card_id, name):
-        """Add a card to the authorized cards list
+    def add_authorized_card(self, card_id, name, sleep_time=SLEEP_TIME, wake_time=WAKE_TIME):
+        """Enroll a card with its owner profile (kept on flash)
         
         Args:
-            card_id: Card ID to authorize (can be string ID or UID sum)
-            name: Name or description for this card
+            card_id: Card UID bytes, or the card ID string ("84-12-125-63")
+            name: Name of the card's owner
+            sleep_time: Owner's bedtime in seconds since midnight
+            wake_time: Owner's wake-up time in seconds since midnight
         """
-        self.authorized_cards[str(card_id)] = name
-        print(f"Added authorized card: {name} ({card_id})")
+        uid = parse_uid(card_id)
+        self.authorized_cards.enroll(uid, name, sleep_time, wake_time)
+        print(f"Added authorized card: {name} ({format_uid(uid)})")
     
     def remove_authorized_card(self, card_id):
-        """Remove a card from the authorized cards list
+        """Revoke a card (kept on flash)
         
         Args:
-            card_id: Card ID to remove
+            card_id: Card UID bytes or card ID string to remove
         
         Returns:
             bool: True if card was removed, False if not found
         """
-        card_id_str = str(card_id)
-        if card_id_str in self.authorized_cards:
-            name = self.authorized_cards.pop(card_id_str)
-            print(f"Removed authorized card: {name} ({card_id})")
-            return True
-        return False
+        if not self.authorized_cards.revoke(parse_uid(card_id)):
+            return False
+        print(f"Removed authorized card: {card_id}")
+        return True
+    
+    def _uid(self, card_id):
+        # UID bytes of a card ID, or of the last scanned card for None
+        if card_id is None:
+            return self.card_uid_bytes
+        if isinstance(card_id, str):
+            return parse_uid(card_id)
+        return card_id
     
     def is_card_authorized(self, card_id=None):
         """Check if a card is authorized
         
         Args:
-            card_id: Card ID to check, or None to use last scanned card
+            card_id: Card UID bytes or card ID string, or None to use the
+                last scanned card
         
         Returns:
             bool: True if authorized, False otherwise
         """
-        if card_id is None:
-            # Check both formats - string ID and UID sum
-            if self.last_card_id and str(self.last_card_id) in self.authorized_cards:
-                return True
-            if self.last_card_uid_sum and str(self.last_card_uid_sum) in self.authorized_cards:
-                return True
-            return False
-            
-        return str(card_id) in self.authorized_cards
+        uid = self._uid(card_id)
+        return bool(uid) and self.authorized_cards.is_enrolled(uid)
+    
+    def get_profile(self, card_id=None):
+        """Get the owner profile of an authorized card
+        
+        Args:
+            card_id: Card UID bytes or card ID string, or None to use the
+                last scanned card
+        
+        Returns:
+            card_store.Profile, or None if not authorized
+        """
+        uid = self._uid(card_id)
+        if not uid:
+            return None
+        return self.authorized_cards.get(uid)
+    
+    def enroll_present(self, owners=()):
+        """Enroll the cards on the reader that are not enrolled yet
+        
+        A card carrying a tag profile is enrolled under its name and times;
+        any other card takes the first name of owners that no enrolled
+        card has, or its card ID when there is none left.
+        
+        Args:
+            owners: Names to give cards without a profile, in order
+        
+        Returns:
+            list: (UID tuple, name, TagProfile or None) per card enrolled
+        """
+        enrolled = []
+        uids = [uid for uid in self.inventory() if not self.authorized_cards.is_enrolled(uid)]
+        if not uids:
+            return enrolled
+        taken = [profile.name for profile in self.authorized_cards.profiles()]
+        for uid in uids:
+            profile = self.read_tag_profile(uid) if self.is_mifare_classic(uid) else None
+            if profile is not None:
+                self.add_authorized_card(bytes(uid), profile.name, profile.sleep_time, profile.wake_time)
+                name = profile.name
+            else:
+                name = format_uid(uid)
+                for owner in owners:
+                    if owner not in taken:
+                        name = owner
+                        break
+                self.add_authorized_card(bytes(uid), name)
+            taken.append(name)
+            enrolled.append((uid, name, profile))
+        return enrolled
     
     def get_authorized_card_name(self, card_id=None):
         """Get the name associated with an authorized card
         
         Args:
-            card_id: Card ID to check, or None to use last scanned card
+            card_id: Card UID bytes or card ID string, or None to use the
+                last scanned card
         
         Returns:
             str: Card name or None if not authorized
         """
-        if card_id is None:
-            # Try string format first
-            if self.last_card_id and str(self.last_card_id) in self.authorized_cards:
-                return self.authorized_cards[str(self.last_card_id)]
-            # Then try UID sum format
-            if self.last_card_uid_sum and str(self.last_card_uid_sum) in self.authorized_cards:
-                return self.authorized_cards[str(self.last_card_uid_sum)]
-            return None
-            
-        card_id_str = str(card_id)
-        if card_id_str in self.authorized_cards:
-            return self.authorized_cards[card_id_str]
-        return None
+        profile = self.get_profile(card_id)
+        return profile.name if profile is not None else None
     
     def wait_for_card(self, timeout=None):
         """Wait for a card to be presented
@@ -219,39 +703,266 @@ class RFIDManager:
         """
         print("Waiting for RFID card...")
         
-        start_time = time.time()
+        start_time = clock.time()
         while True:
             if self.check_card():
                 return self.last_card_id
                 
             # Check for timeout
-            if timeout is not None and time.time() - start_time > timeout:
+            if timeout is not None and clock.time() - start_time > timeout:
                 print("Card scan timeout")
                 return None
                 
-            time.sleep(0.1)  # Short delay to prevent tight loop
+            clock.sleep(0.1)  # Short delay to prevent tight loop
     
     def is_card_present(self):
         """
         Check if a card is currently present in the field (used for presence monitoring).
 
+        Powers the field up in low-power mode and wakes halted cards too
+        (see probe_card).
+
         Returns:
             bool: True if a card is present, False otherwise
         """
-        if not self.is_connected:
-            return False
+        return self.probe_card() is not None
 
-        try:
-            return self.rc522.PICC_IsNewCardPresent() and self.rc522.PICC_ReadCardSerial()
-        except Exception as e:
-            print(f"Error detecting card presence: {e}")
+class CardPresence:
+    """Debounced presence of one card
+    
+    A state machine (ABSENT, ARRIVING, PRESENT, DEPARTING) with hysteresis:
+    the card must be read arrive_reads times in a row to become present
+    and missed depart_misses times in a row to be gone, so a single
+    failed read does not flip the state.
+    
+    Attributes:
+        uid: UID bytes
+        present: True while the card counts as present (PRESENT or DEPARTING)
+        since: clock.time() of the last change of present
+        profile: TagProfile read from the card when it arrived, or None
+    """
+    
+    def __init__(self, uid):
+        self.uid = uid
+        self.state = ABSENT
+        self.present = False
+        self.since = clock.time()
+        self.streak = 0           # Consecutive reads (arriving) or misses (departing)
+        self.profile = None
+    
+    def read(self, arrive_reads):
+        """Count a read
+        Returns:
+            bool: True if the card just became present
+        """
+        state = self.state
+        if state == ABSENT:
+            self.state = ARRIVING
+            self.streak = 1
+        elif state == ARRIVING:
+            self.streak += 1
+        else:
+            # PRESENT or DEPARTING: the card is (still) there
+            self.state = PRESENT
+            self.streak = 0
+        if self.state == ARRIVING and self.streak >= arrive_reads:
+            self.state = PRESENT
+            self.streak = 0
+            self.present = True
+            self.since = clock.time()
+            return True
+        return False
+    
+    def missed(self, depart_misses):
+        """Count a miss
+        Returns:
+            bool: True if the card just stopped being present
+        """
+        state = self.state
+        if state == PRESENT:
+            self.state = DEPARTING
+            self.streak = 1
+        elif state == DEPARTING:
+            self.streak += 1
+        else:
+            self.state = ABSENT
+            self.streak = 0
+        if self.state == DEPARTING and self.streak >= depart_misses:
+            self.state = ABSENT
+            self.streak = 0
+            self.present = False
+            self.since = clock.time()
+            return True
+        return False
+
+class PresenceTracker:
+    """Debounced presence of the cards resting on the reader
+    
+    A poll is one RFIDManager.inventory(), which reads all cards in the
+    field, and feeds a CardPresence per UID seen. The reader is only
+    polled when the current interval has passed: fast while any card is
+    arriving or departing, slowly while the reader is empty, and with an
+    interval doubling up to max_ms while every card stays present. More
+    cards cost one extra select each per poll, not an extra poll.
+    
+    While a single card rests on the reader, most polls are just a
+    wake_probe() (one WUPA); every verify_every-th poll, and any poll the
+    probe fails, is a full inventory that checks the UID again.
+    
+    With on_profile set, the profile stored on a card is read once when
+    it arrives and passed to on_profile(uid, profile).
+    
+    While the reader is off the bus the cards keep their state: polls
+    that could not reach it count as neither reads nor misses.
+    
+    Attributes:
+        present: True while any card counts as present
+        since: clock.time() of the last change of present
+        uid: UID bytes of the card present longest, or None
+        cards: UID -> CardPresence for every card seen and not yet gone
+    """
+    
+    def __init__(self, rfid, arrive_reads=PRESENCE_ARRIVE_READS,
+                 depart_misses=PRESENCE_DEPART_MISSES,
+                 stable_ms=PRESENCE_STABLE_MS, absent_ms=PRESENCE_ABSENT_MS,
+                 fast_ms=PRESENCE_FAST_MS, max_ms=PRESENCE_MAX_MS,
+                 verify_every=PRESENCE_VERIFY_EVERY):
+        self.rfid = rfid
+        self.arrive_reads = arrive_reads
+        self.depart_misses = depart_misses
+        self.stable_ms = stable_ms
+        self.absent_ms = absent_ms
+        self.fast_ms = fast_ms
+        self.max_ms = max_ms
+        self.verify_every = verify_every
+        self.cards = {}
+        self.present = False
+        self.since = clock.time()
+        self.uid = None
+        self.last_poll = None     # Tick of the last poll
+        self.interval_ms = 0
+        self.probes = 0           # Polls
+        self.wake_probes = 0      # Polls answered by a wake probe alone
+        self.unverified = 0       # Wake probes since the last inventory
+        self.on_profile = None    # Called with (uid, TagProfile) when a card with a profile arrives
+        self.no_profile = set()   # UIDs whose profile read failed, not read again
+    
+    def reset(self):
+        """Forget the cards and poll again right away"""
+        self.cards = {}
+        self._update_present()
+        self.last_poll = None
+        self.interval_ms = 0
+    
+    def present_uids(self):
+        """Get the UIDs of the present cards, present longest first"""
+        cards = [card for card in self.cards.values() if card.present]
+        cards.sort(key=lambda card: card.since)
+        return [card.uid for card in cards]
+    
+    def is_present(self, uid):
+        """Check if the card with a UID (tuple of bytes) counts as present"""
+        card = self.cards.get(tuple(uid))
+        return card is not None and card.present
+    
+    def next_poll_ms(self):
+        """Get the time until the next poll is due
+        Returns:
+            int: Milliseconds (0 if due now)
+        """
+        if self.last_poll is None:
+            return 0
+        return max(0, self.interval_ms - ticks_diff(ticks_ms(), self.last_poll))
+    
+    def update(self):
+        """Poll the reader if the poll interval has passed
+        Returns:
+            bool: Whether any card counts as present
+        """
+        now = ticks_ms()
+        if self.last_poll is not None:
+            elapsed = ticks_diff(now, self.last_poll)
+            if elapsed > PRESENCE_STALE_MS:
+                self.reset()
+            elif elapsed < self.interval_ms:
+                return self.present
+        self.last_poll = now
+        self.probes += 1
+        if self._may_wake_probe() and self.rfid.wake_probe():
+            # The card identified by the last inventory still answers
+            self.wake_probes += 1
+            self.unverified += 1
+            seen = list(self.cards)
+        else:
+            self.unverified = 0
+            seen = self.rfid.inventory()
+        if not self.rfid.is_connected:
+            # The reader is off the bus: a failed read says nothing about the cards
+            self.interval_ms = self.absent_ms
+            return self.present
+        for uid in seen:
+            if uid not in self.cards:
+                self.cards[uid] = CardPresence(uid)
+        changing = False
+        for uid, card in list(self.cards.items()):
+            if uid in seen:
+                if card.read(self.arrive_reads):
+                    print(f"Card arrived: {format_uid(uid)}")
+                    self._fetch_profile(card)
+            elif card.missed(self.depart_misses):
+                print(f"Card removed: {format_uid(uid)}")
+            if card.state == ABSENT:
+                del self.cards[uid]
+            elif card.state != PRESENT:
+                changing = True
+        self._update_present()
+        if changing:
+            self.interval_ms = self.fast_ms
+        elif self.cards:
+            # Every card stays put: back off
+            if self.interval_ms >= self.stable_ms:
+                self.interval_ms = min(self.interval_ms * 2, self.max_ms)
+            else:
+                self.interval_ms = self.stable_ms
+        else:
+            self.interval_ms = self.absent_ms
+        return self.present
+    
+    def _fetch_profile(self, card):
+        # Only enrolled MIFARE Classic tags are read: authenticating any
+        # other card costs a response timeout on every arrival
+        if self.on_profile is None or card.uid in self.no_profile:
+            return
+        if not self.rfid.is_mifare_classic(card.uid) or not self.rfid.is_card_authorized(card.uid):
+            return
+        card.profile = self.rfid.read_tag_profile(card.uid)
+        if card.profile is None:
+            if len(self.no_profile) >= PROFILE_FAILED_MAX:
+                self.no_profile.clear()
+            self.no_profile.add(card.uid)
+            return
+        print(f"Card profile: {card.profile}")
+        self.on_profile(card.uid, card.profile)
+    
+    def _may_wake_probe(self):
+        if len(self.cards) != 1 or self.unverified + 1 >= self.verify_every:
             return False
+        for card in self.cards.values():
+            return card.state == PRESENT
+    
+    def _update_present(self):
+        uids = self.present_uids()
+        self.uid = uids[0] if uids else None
+        present = bool(uids)
+        if present != self.present:
+            self.present = present
+            self.since = clock.time()
 
 # Simple demo to test the RFID manager with the MFRC522 I2C interface
 def rfid_demo():
     """Stand-alone demo for RFID reader"""
     from machine import Pin, PWM
-    import time
+    import clock
     
     # Create LED for visual feedback
     led = Pin(12, Pin.OUT)
@@ -263,17 +974,16 @@ def rfid_demo():
     # Initialize RFID manager
     rfid = RFIDManager()
     
-    # Add some test authorized cards - use the UID sum format from example
-    rfid.add_authorized_card(510, "Admin Card")  # This matches the example code's card
-    rfid.add_authorized_card(600, "Guest Card")  # Another example
+    # Add some test authorized cards (replace with the IDs printed on a read)
+    rfid.add_authorized_card("84-12-125-63", "Admin Card")
+    rfid.add_authorized_card("156-64-122-142", "Guest Card")
     
     print("RFID Demo: Present a card to the reader")
     
     try:
         while True:
             if rfid.check_card():
-                card_uid_sum = rfid.get_card_uid_sum()
-                print(f"Card detected with UID sum: {card_uid_sum}")
+                print(f"Card detected: {rfid.get_card_id()}")
                 
                 if rfid.is_card_authorized():
                     # Authorized card - open door
@@ -287,9 +997,9 @@ def rfid_demo():
                     print("Access denied")
                     for _ in range(5):
                         led.value(1)
-                        time.sleep(0.1)
+                        clock.sleep(0.1)
                         led.value(0)
-                        time.sleep(0.1)
+                        clock.sleep(0.1)
             
             # Check if button is pressed to close door
             button1 = Pin(16, Pin.IN, Pin.PULL_UP)
@@ -298,7 +1008,7 @@ def rfid_demo():
                 led.value(0)
                 print("Door closed")
             
-            time.sleep(0.1)  # Short delay between checks
+            clock.sleep(0.1)  # Short delay between checks
             
     except KeyboardInterrupt:
         print("Demo stopped")
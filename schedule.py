@@ -0,0 +1,275 @@
+DAY = 24 * 3600
+
+# Default daily routine (seconds since midnight)
+PRE_SLEEP_TIME = 20 * 3600 + 30 * 60  # 8:30 PM - light dimming and reminders start
+SLEEP_TIME = 22 * 3600                # 10 PM - night mode starts
+PRE_WAKE_TIME = 4 * 3600 + 30 * 60    # 4:30 AM - wake-up sequence starts
+WAKE_TIME = 6 * 3600                  # 6 AM - night mode ends
+WAKE_GRACE_S = 300                    # Night mode may still be ended this long after wake time
+COFFEE_CUTOFF_SOFT = 17 * 3600        # 5 PM - coffee needs a confirmation
+COFFEE_CUTOFF_HARD = 18 * 3600        # 6 PM - no coffee until wake time
+REMINDER_INTERVAL_S = 600             # Pre-sleep reminders every 10 minutes
+
+# Lead times kept when the sleep, wake and coffee times are moved
+PRE_SLEEP_LEAD_S = SLEEP_TIME - PRE_SLEEP_TIME
+PRE_WAKE_LEAD_S = WAKE_TIME - PRE_WAKE_TIME
+COFFEE_WARNING_LEAD_S = COFFEE_CUTOFF_HARD - COFFEE_CUTOFF_SOFT
+
+DAY_PHASE = "day"   # Phase when no window is active
+
+
+def _bisect_right(values, x):
+    # Index after the last value <= x in a sorted list
+    low = 0
+    high = len(values)
+    while low < high:
+        middle = (low + high) // 2
+        if x < values[middle]:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+class Schedule:
+    """Daily time-of-day windows compiled into a sorted transition table
+
+    Windows are named [start, end) ranges in seconds since midnight; a
+    window whose end is before its start runs past midnight. Marks are
+    named instants that only fire callbacks. compile() turns both into one
+    sorted list of transition times with the windows active after each,
+    so the current phase and the next transition are binary searches
+    instead of re-evaluating every comparison.
+
+    update() fires the on_enter/on_exit callbacks of every transition
+    passed since the previous update, across midnight too.
+    """
+
+    def __init__(self):
+        self.windows = []         # (name, start, end)
+        self.marks = []           # (name, time)
+        self.enter_callbacks = {}
+        self.exit_callbacks = {}
+        self.times = []           # Sorted transition times
+        self.transitions = []     # Per time: [(name, entering)], exits first
+        self.active = []          # Per time: active window names until the next time
+        self.phases = []          # Per time: most recently started active window
+        self.last = None          # Time of day of the last update()
+        self.compiled = False
+
+    def add_window(self, name, start, end):
+        """Add a daily window
+        Args:
+            name: Window name
+            start: Start in seconds since midnight
+            end: End in seconds since midnight (before start to run past midnight)
+        """
+        self.windows.append((name, start % DAY, end % DAY))
+        self.compiled = False
+
+    def window(self, name):
+        """Get the (start, end) of a window, or None if there is none by that name"""
+        for window in self.windows:
+            if window[0] == name:
+                return window[1:]
+        return None
+
+    def clear(self):
+        """Remove every window and mark, keeping the callbacks"""
+        self.windows = []
+        self.marks = []
+        self.compiled = False
+
+    def add_mark(self, name, time):
+        """Add a named instant that only fires on_enter callbacks"""
+        self.marks.append((name, time % DAY))
+        self.compiled = False
+
+    def on_enter(self, name, callback):
+        """Call callback(name, time_of_day) when a window starts or a mark passes"""
+        self.enter_callbacks.setdefault(name, []).append(callback)
+
+    def on_exit(self, name, callback):
+        """Call callback(name, time_of_day) when a window ends"""
+        self.exit_callbacks.setdefault(name, []).append(callback)
+
+    def compile(self):
+        """Build the transition table"""
+        table = {}
+        for name, start, end in self.windows:
+            if start == end:
+                continue
+            table.setdefault(start, []).append((name, True))
+            table.setdefault(end, []).append((name, False))
+        for name, time in self.marks:
+            table.setdefault(time, []).append((name, True))
+        self.times = sorted(table)
+        self.transitions = []
+        self.active = []
+        self.phases = []
+        for time in self.times:
+            # Exits before entries, so back-to-back windows hand over cleanly
+            self.transitions.append([t for t in table[time] if not t[1]] +
+                                    [t for t in table[time] if t[1]])
+            active = []
+            phase = DAY_PHASE
+            latest = DAY
+            for name, start, end in self.windows:
+                if self._contains(start, end, time):
+                    active.append(name)
+                    since = (time - start) % DAY
+                    if since < latest:
+                        latest = since
+                        phase = name
+            self.active.append(tuple(active))
+            self.phases.append(phase)
+        self.compiled = True
+
+    @staticmethod
+    def _contains(start, end, time):
+        if start < end:
+            return start <= time < end
+        return time >= start or time < end
+
+    def _index(self, time):
+        # Table index of the last transition at or before a time of day
+        if not self.compiled:
+            self.compile()
+        index = _bisect_right(self.times, time % DAY) - 1
+        if index < 0:
+            index = len(self.times) - 1   # Still in the last segment of the day before
+        return index
+
+    def active_windows(self, time):
+        """Get the names of the windows active at a time of day"""
+        index = self._index(time)
+        if index < 0:
+            return ()
+        return self.active[index]
+
+    def is_active(self, name, time):
+        return name in self.active_windows(time)
+
+    def phase(self, time):
+        """Get the current phase: the active window that started last
+        Returns:
+            str: Window name, or DAY_PHASE when none is active
+        """
+        index = self._index(time)
+        if index < 0:
+            return DAY_PHASE
+        return self.phases[index]
+
+    def next_transition(self, time):
+        """Get the next transition after a time of day
+        Returns:
+            tuple: (seconds until it, time of day, [(name, entering)]),
+                or None for an empty schedule
+        """
+        if not self.compiled:
+            self.compile()
+        if not self.times:
+            return None
+        time %= DAY
+        index = _bisect_right(self.times, time)
+        if index == len(self.times):
+            index = 0
+        at = self.times[index]
+        return ((at - time) % DAY or DAY, at, self.transitions[index])
+
+    def resync(self, time=None):
+        """Forget the last update (after a time jump), so no transitions fire"""
+        self.last = None if time is None else time % DAY
+
+    def update(self, time):
+        """Fire the callbacks of the transitions passed since the last update
+        Args:
+            time: Current time of day in seconds
+        Returns:
+            int: Number of transitions passed
+        """
+        time %= DAY
+        last = self.last
+        self.last = time
+        if last is None or not self.times:
+            return 0
+        elapsed = (time - last) % DAY
+        if elapsed == 0:
+            return 0
+        passed = 0
+        index = _bisect_right(self.times, last)
+        for _ in range(len(self.times)):
+            if index == len(self.times):
+                index = 0
+            at = self.times[index]
+            if (at - last) % DAY > elapsed or at == last:
+                break
+            for name, entering in self.transitions[index]:
+                callbacks = self.enter_callbacks if entering else self.exit_callbacks
+                for callback in callbacks.get(name, ()):
+                    callback(name, at)
+            passed += 1
+            index += 1
+        return passed
+
+
+def daily_schedule(pre_sleep=PRE_SLEEP_TIME, sleep=SLEEP_TIME, pre_wake=PRE_WAKE_TIME,
+                   wake=WAKE_TIME, coffee_soft=COFFEE_CUTOFF_SOFT,
+                   coffee_hard=COFFEE_CUTOFF_HARD):
+    """Build the Smart Sleep Assistant's daily schedule
+
+    Windows: pre_sleep, night, pre_wake, wake_grace, coffee_warning,
+    coffee_denied (until wake time). Marks: reminder (every
+    REMINDER_INTERVAL_S after pre_sleep until sleep time).
+
+    Returns:
+        Schedule: Compiled schedule
+    """
+    schedule = Schedule()
+    _add_daily(schedule, pre_sleep, sleep, pre_wake, wake, coffee_soft, coffee_hard)
+    schedule.compile()
+    return schedule
+
+
+def _add_daily(schedule, pre_sleep, sleep, pre_wake, wake, coffee_soft, coffee_hard):
+    schedule.add_window("pre_sleep", pre_sleep, sleep)
+    schedule.add_window("night", sleep, wake)
+    schedule.add_window("pre_wake", pre_wake, wake)
+    schedule.add_window("wake_grace", wake, wake + WAKE_GRACE_S)
+    schedule.add_window("coffee_warning", coffee_soft, coffee_hard)
+    schedule.add_window("coffee_denied", coffee_hard, wake)
+    mark = pre_sleep + REMINDER_INTERVAL_S
+    while (mark - pre_sleep) % DAY < (sleep - pre_sleep) % DAY:
+        schedule.add_mark("reminder", mark)
+        mark += REMINDER_INTERVAL_S
+
+
+def set_daily_times(schedule, sleep, wake, coffee_cutoff):
+    """Move the daily routine of a schedule built by daily_schedule()
+
+    Pre-sleep, pre-wake and the coffee warning keep their lead times.
+    Callbacks stay registered, and transitions the change skips over
+    (e.g. a pre-sleep start moved before the current time) do not fire.
+
+    Args:
+        schedule: Schedule to change
+        sleep: Bedtime in seconds since midnight
+        wake: Wake-up time in seconds since midnight
+        coffee_cutoff: Hard coffee cutoff in seconds since midnight
+    """
+    schedule.clear()
+    _add_daily(schedule, sleep - PRE_SLEEP_LEAD_S, sleep, wake - PRE_WAKE_LEAD_S, wake,
+               coffee_cutoff - COFFEE_WARNING_LEAD_S, coffee_cutoff)
+    schedule.compile()
+    schedule.resync(schedule.last)
+
+
+_schedule = None
+
+
+def get_schedule():
+    """Get the shared daily schedule, built from the defaults on first use"""
+    global _schedule
+    if _schedule is None:
+        _schedule = daily_schedule()
+    return _schedule
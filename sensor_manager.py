@@ -1,6 +1,7 @@
 from machine import Pin, ADC, I2C
 import dht
-import time
+import clock
+from input_events import InputEvents, PRESS
 
 # Pin definitions
 PIN_DHT = 17        # DHT11 temperature/humidity sensor
@@ -10,7 +11,22 @@ PIN_BTN2 = 27       # Button 2 (with pull-up)
 PIN_GAS = 23        # Gas sensor (from example pj8_2)
 PIN_SOUND = 34      # Sound sensor (microphone)
 
+# Input events
+BUTTON_LONG_PRESS_MS = 3000
+PIR_DEBOUNCE_MS = 0     # The PIR module already holds its output steady
+
+# The DHT11 takes a new reading at most once per second
+CLIMATE_MAX_AGE_MS = 10000
+
 class SensorManager:
+    """Sensor access for the KS5009 kit
+
+    The buttons and the PIR sensor are interrupt driven: their edges are
+    debounced into events (see input_events.InputEvents) named "button1",
+    "button2", "pir" and, for both buttons together, "buttons". Take them
+    with get_event() or drain_events() instead of polling the pins.
+    """
+
     def __init__(self):
         # Initialize all sensors
         self.dht_sensor = dht.DHT11(Pin(PIN_DHT))
@@ -27,6 +43,16 @@ class SensorManager:
         self.last_motion_time = 0
         self.last_btn1_press = 0
         self.last_btn2_press = 0
+        self.climate = None            # Last (temperature, humidity) read
+        self.climate_ms = 0
+        
+        # Debounced button and motion events from pin IRQs
+        self.events = InputEvents()
+        self.events.add_input("button1", self.button1, long_ms=BUTTON_LONG_PRESS_MS)
+        self.events.add_input("button2", self.button2, long_ms=BUTTON_LONG_PRESS_MS)
+        self.events.add_input("pir", self.pir_sensor, active_low=False,
+                              debounce_ms=PIR_DEBOUNCE_MS, long_ms=None)
+        self.events.add_chord("buttons", "button1", "button2")
         
         print("Sensor manager initialized")
     
@@ -38,40 +64,88 @@ class SensorManager:
             self.dht_sensor.measure()
             temp = self.dht_sensor.temperature()
             humidity = self.dht_sensor.humidity()
+            self.climate = (temp, humidity)
+            self.climate_ms = clock.ticks_ms()
             return (temp, humidity)
         except Exception as e:
             print("DHT sensor error:", e)
             return (0, 0)  # Return defaults on error
     
+    def read_climate(self, max_age_ms=CLIMATE_MAX_AGE_MS):
+        """Get temperature and humidity, measuring only when the last reading is stale
+        Args:
+            max_age_ms: Age up to which the last reading is reused
+        Returns: (temperature, humidity) in °C and %, (0, 0) on error
+        """
+        if self.climate is not None and \
+                clock.ticks_diff(clock.ticks_ms(), self.climate_ms) < max_age_ms:
+            return self.climate
+        return self.read_temperature_humidity()
+    
     def is_motion_detected(self):
         """Check if motion is detected by PIR sensor
         Returns: True if motion detected, False otherwise
         """
-        motion = self.pir_sensor.value()
+        motion = self.events.is_active("pir")
         if motion:
-            self.last_motion_time = time.time()
-        return bool(motion)
+            self.last_motion_time = clock.time()
+        return motion
     
     def is_button1_pressed(self):
         """Check if button 1 is pressed (active low)
         Returns: True if pressed, False otherwise
         """
-        # Button is active low (0 when pressed)
-        pressed = not self.button1.value()
+        # Debounced state (the button is active low)
+        pressed = self.events.is_active("button1")
         if pressed:
-            self.last_btn1_press = time.time()
+            self.last_btn1_press = clock.time()
         return pressed
     
     def is_button2_pressed(self):
         """Check if button 2 is pressed (active low)
         Returns: True if pressed, False otherwise
         """
-        # Button is active low (0 when pressed)
-        pressed = not self.button2.value()
+        # Debounced state (the button is active low)
+        pressed = self.events.is_active("button2")
         if pressed:
-            self.last_btn2_press = time.time()
+            self.last_btn2_press = clock.time()
         return pressed
     
+    def get_event(self):
+        """Take the oldest input event
+        Returns: InputEvent, or None if there is none
+        """
+        event = self.events.get_event()
+        if event is not None:
+            self._note_event(event)
+        return event
+    
+    def drain_events(self):
+        """Take every pending input event
+        Returns: List of InputEvents, oldest first
+        """
+        events = self.events.drain()
+        for event in events:
+            self._note_event(event)
+        return events
+    
+    def _note_event(self, event):
+        # Keep the time_since_* bookkeeping in step with the events
+        if event.kind != PRESS:
+            return
+        if event.source == "pir":
+            self.last_motion_time = clock.time()
+        elif event.source == "button1":
+            self.last_btn1_press = clock.time()
+        elif event.source == "button2":
+            self.last_btn2_press = clock.time()
+    
+    def next_event_deadline_ms(self):
+        """Get the time until a pending debounce or long press resolves
+        Returns: Milliseconds, or None if no input is changing
+        """
+        return self.events.next_deadline_ms()
+    
     def is_gas_detected(self):
         """Check if gas is detected
         Returns: True if gas detected, False if safe
@@ -97,7 +171,7 @@ class SensorManager:
         """
         if self.last_motion_time == 0:
             return 0
-        return time.time() - self.last_motion_time
+        return clock.time() - self.last_motion_time
     
     def time_since_button1_press(self):
         """Get time since button 1 was last pressed
@@ -105,7 +179,7 @@ class SensorManager:
         """
         if self.last_btn1_press == 0:
             return 0
-        return time.time() - self.last_btn1_press
+        return clock.time() - self.last_btn1_press
     
     def time_since_button2_press(self):
         """Get time since button 2 was last pressed
@@ -113,4 +187,4 @@ class SensorManager:
         """
         if self.last_btn2_press == 0:
             return 0
-        return time.time() - self.last_btn2_press
\ No newline at end of file
+        return clock.time() - self.last_btn2_press
\ No newline at end of file
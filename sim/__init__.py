@@ -0,0 +1,66 @@
+"""Host-side simulation of the KS5009 board
+
+sim.install() registers fakes for the MicroPython modules the managers
+import (machine, neopixel, dht, network, urequests, usocket, utime) and
+loads the real LCD and MFRC522 drivers from merged_file.py on top of
+simulated devices, so SmartSleepAssistant, SmartHomeController and
+PhoneController run unmodified on Linux:
+
+    import sim
+    board = sim.install(virtual=True)
+    from main_logic import SmartSleepAssistant
+
+Files the firmware keeps on flash (the card store, the telemetry spill
+file) go to a fresh temporary directory on every install(), so runs
+leave nothing behind in the working directory.
+
+The returned Board drives the outside world (buttons, cards, climate,
+bus faults) and records every pin, PWM and bus operation. python -m
+sim.bus_fault checks that the assistant rides out an RFID reader that
+drops off the bus; python -m sim.http_bench compares kept-open HTTP
+connections with one connection per request; python -m sim.status_load
+measures the run loop while browsers watch the dashboard; python -m
+sim.mqtt_bench runs the MQTT transport against a broker stand-in;
+python -m sim.enrollment enrolls phones and follows their tag profiles.
+"""
+import sys
+import tempfile
+import time as _time
+
+import clock
+from sim import board as _board_module
+
+FAKE_MODULES = ("machine", "neopixel", "dht", "network", "urequests", "usocket", "utime")
+
+
+def install(virtual=False, start=None):
+    """Install the simulated hardware
+    Args:
+        virtual: Run on a VirtualClock instead of the wall clock
+        start: VirtualClock start time in seconds since the epoch
+               (default: now)
+    Returns:
+        Board: The fresh simulated board
+    """
+    if virtual:
+        clock.install(clock.VirtualClock(int(_time.time()) if start is None else start))
+    board = _board_module.new_board()
+    for name in FAKE_MODULES:
+        module = __import__("sim." + name, None, None, [name])
+        sys.modules[name] = module
+    from sim.drivers import load_drivers
+    load_drivers()
+    _use_flash(tempfile.mkdtemp(prefix="ssa-flash-"))
+    return board
+
+
+def _use_flash(path):
+    # Point the flash files at a directory
+    import card_store
+    import telemetry
+    card_store.STORE_PATH = path + "/cards.db"
+    telemetry.SPILL_PATH = path + "/telemetry.log"
+
+
+def get_board():
+    return _board_module.get_board()
@@ -0,0 +1,48 @@
+# python -m sim [--virtual] [--for SECONDS] [--report] MODULE
+# Runs a firmware module (e.g. main_logic) as __main__ on the simulated board.
+import os
+import runpy
+import sys
+import threading
+import _thread
+
+import sim
+
+
+def main(argv):
+    virtual = False
+    duration = None
+    report = False
+    while argv and argv[0].startswith("--"):
+        option = argv.pop(0)
+        if option == "--virtual":
+            virtual = True
+        elif option == "--for":
+            duration = float(argv.pop(0))
+        elif option == "--report":
+            report = True
+        else:
+            print("Unknown option:", option)
+            return 2
+    if not argv:
+        print("usage: python -m sim [--virtual] [--for SECONDS] [--report] MODULE")
+        return 2
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    board = sim.install(virtual=virtual)
+    if duration is not None:
+        # Stops the firmware's endless loop the same way Ctrl-C does
+        timer = threading.Timer(duration, _thread.interrupt_main)
+        timer.daemon = True
+        timer.start()
+    try:
+        runpy.run_module(argv[0], run_name="__main__", alter_sys=True)
+    except KeyboardInterrupt:
+        pass
+    if report:
+        board.report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
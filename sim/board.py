@@ -0,0 +1,267 @@
+import clock
+
+# Pin modes and pulls, with the ESP32 port's values
+MODE_IN = 1
+MODE_OUT = 3
+MODE_OPEN_DRAIN = 7
+PULL_UP = 2
+PULL_DOWN = 1
+IRQ_RISING = 1
+IRQ_FALLING = 2
+
+# KS5009 kit wiring used by the managers
+PIN_SCL = 22
+PIN_SDA = 21
+LCD_ADDR = 0x27
+RFID_ADDR = 0x28
+SERVO_PINS = (13, 5)
+PULL_UP_INPUTS = (16, 27, 23)   # Buttons and the active-low gas sensor
+
+TRACE_LIMIT = 200000
+
+
+class PinState:
+    """Electrical state of one GPIO, shared by every Pin object on that id"""
+
+    def __init__(self, id):
+        self.id = id
+        self.mode = None
+        self.pull = None
+        self.out = 0
+        self.external = None   # Level forced from outside (button, sensor), or None
+        self.sinks = 0         # Devices pulling an open-drain line low
+        self.level = 0
+        self.listeners = []    # Callables(state, level) run on every level change
+        self.irq_handler = None
+        self.irq_trigger = 0
+        self.irq_pin = None
+
+    def compute_level(self):
+        # Wired-AND: anything pulling the line low wins
+        if self.sinks:
+            return 0
+        if self.mode == MODE_OUT:
+            return self.out
+        if self.mode == MODE_OPEN_DRAIN and self.out == 0:
+            return 0
+        if self.external is not None:
+            return self.external
+        return 1 if self.pull == PULL_UP else 0
+
+
+class Board:
+    """Simulated KS5009 board: pins, buses, devices and an operation trace
+
+    Every fake module (machine, neopixel, dht, network, urequests,
+    usocket) talks to
+    the one Board created by sim.install(). Tests and scenarios drive the
+    outside world through it (press buttons, place RFID cards, change the
+    climate) and read back what the firmware did from the trace.
+    """
+
+    def __init__(self):
+        from sim.lcd import Hd44780
+        from sim.rc522 import Mfrc522
+
+        self.pins = {}
+        self.trace = []        # (ticks_us, source, op, value)
+        self.counts = {}       # (source, op) -> count
+        self.dropped = 0
+        self.trace_limit = TRACE_LIMIT
+
+        # Outside world
+        self.analog = {}                 # Pin -> raw 12-bit ADC reading
+        self.climate = (22.0, 45.0)      # (°C, %) seen by the DHT sensors, None = no sensor
+        self.wifi_networks = {}          # SSID -> password; empty accepts any network
+        self.wifi_connect_s = 2.5
+        self.http_latency_s = 0.08       # Round trip of one request (or one pipelined burst)
+        self.http_handler = None         # Callable(method, url, body, headers) -> (status, body)
+        self.dns_latency_s = 0.03
+        self.tcp_connect_s = 0.04
+        self.tcp_generation = 0          # Bumped by tcp_reset(); older sockets are dead
+        self.server_down = False         # Connects time out, as to a server that is off
+
+        # Devices
+        self.buses = {}
+        self.servos = {}
+        self.pwms = {}
+        self.neopixels = {}
+        self.wlan = None
+        bus = self.get_bus(PIN_SCL, PIN_SDA)
+        self.lcd = Hd44780(self)
+        self.rfid = Mfrc522(self)
+        bus.attach(LCD_ADDR, self.lcd)
+        bus.attach(RFID_ADDR, self.rfid)
+        for pin in SERVO_PINS:
+            self.servos[pin] = Servo(self, pin)
+        for pin in PULL_UP_INPUTS:
+            state = self.pin_state(pin)
+            state.external = 1
+            state.level = 1
+
+    # ---- Trace ----
+
+    def record(self, source, op, value=None):
+        """Log one hardware operation"""
+        key = (source, op)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if len(self.trace) < self.trace_limit:
+            self.trace.append((clock.ticks_us(), source, op, value))
+        else:
+            self.dropped += 1
+
+    def count(self, source, op=None):
+        """Get how many operations were recorded
+        Args:
+            source: Source name (e.g. "pin21", "i2c", "pwm25")
+            op: Operation name, or None for all operations of the source
+        """
+        if op is not None:
+            return self.counts.get((source, op), 0)
+        return sum(n for (s, o), n in self.counts.items() if s == source)
+
+    def reset_trace(self):
+        self.trace = []
+        self.counts = {}
+        self.dropped = 0
+
+    def report(self):
+        """Print the operation counts"""
+        print("Hardware operations:")
+        for (source, op), n in sorted(self.counts.items()):
+            print(f"  {source} {op}: {n}")
+        if self.dropped:
+            print(f"  ({self.dropped} trace entries dropped)")
+
+    # ---- Pins ----
+
+    def pin_state(self, id):
+        state = self.pins.get(id)
+        if state is None:
+            state = PinState(id)
+            state.level = state.compute_level()
+            self.pins[id] = state
+        return state
+
+    def update(self, state):
+        """Recompute a line level and notify listeners and IRQs if it changed"""
+        level = state.compute_level()
+        if level == state.level:
+            return
+        state.level = level
+        for listener in state.listeners:
+            listener(state, level)
+        if state.irq_handler is not None:
+            trigger = IRQ_RISING if level else IRQ_FALLING
+            if state.irq_trigger & trigger:
+                state.irq_handler(state.irq_pin)
+
+    def set_input(self, pin, level):
+        """Drive an input from outside (None releases it to its pull)"""
+        state = self.pin_state(pin)
+        state.external = level
+        self.update(state)
+
+    def press(self, pin):
+        """Press an active-low button"""
+        self.set_input(pin, 0)
+
+    def release(self, pin):
+        self.set_input(pin, 1)
+
+    def level(self, pin):
+        return self.pin_state(pin).level
+
+    # ---- Buses and devices ----
+
+    def get_bus(self, scl, sda):
+        """Get the I2C bus wired to a pair of pins"""
+        from sim.i2c import I2CBus
+        key = (scl, sda)
+        bus = self.buses.get(key)
+        if bus is None:
+            bus = I2CBus(self, self.pin_state(scl), self.pin_state(sda))
+            self.buses[key] = bus
+        return bus
+
+    def place_card(self, card):
+        """Put an RFID card (sim.rc522.Card) on the reader"""
+        self.rfid.place(card)
+
+    def remove_card(self, card=None):
+        self.rfid.remove(card)
+
+    def rfid_fault(self, transfers=None):
+        """Make the RFID reader stop answering on the bus
+        Args:
+            transfers: Number of transfers it NACKs, or None until rfid_fault(0)
+        """
+        bus = self.get_bus(PIN_SCL, PIN_SDA)
+        if transfers == 0:
+            bus.clear_fault(RFID_ADDR)
+        else:
+            bus.fault(RFID_ADDR, transfers)
+        self.record("rfid", "fault", transfers)
+
+    def tcp_reset(self):
+        """Drop every open TCP connection, as a server restart would"""
+        self.tcp_generation += 1
+        self.record("tcp", "reset")
+
+    def lcd_lines(self):
+        return self.lcd.lines()
+
+
+class Servo:
+    """Hobby servo: follows the PWM pulse width at a limited travel speed"""
+
+    SECONDS_PER_60_DEG = 0.12
+
+    def __init__(self, board, pin):
+        self.board = board
+        self.pin = pin
+        self.angle_from = 0.0
+        self.target = 0.0
+        self.start_us = 0
+
+    def angle(self):
+        """Get the current shaft angle in degrees"""
+        elapsed = clock.ticks_diff(clock.ticks_us(), self.start_us) / 1000000
+        travel = elapsed * 60 / self.SECONDS_PER_60_DEG
+        if self.target >= self.angle_from:
+            return min(self.target, self.angle_from + travel)
+        return max(self.target, self.angle_from - travel)
+
+    def drive(self, freq, duty):
+        """New PWM setting on the servo pin (10-bit duty)"""
+        if freq < 20 or freq > 400 or duty == 0:
+            return  # No usable pulses - the servo holds its position
+        pulse_ms = duty / 1023 * 1000 / freq
+        target = (pulse_ms - 0.5) / 2.0 * 180
+        target = max(0.0, min(180.0, target))
+        self.angle_from = self.angle()
+        self.target = target
+        self.start_us = clock.ticks_us()
+        self.board.record(f"servo{self.pin}", "target", round(target))
+
+    def settle_seconds(self):
+        """Get the time until the servo reaches its target"""
+        return abs(self.target - self.angle()) * self.SECONDS_PER_60_DEG / 60
+
+
+_board = None
+
+
+def get_board():
+    """Get the active Board, creating one if needed"""
+    global _board
+    if _board is None:
+        _board = Board()
+    return _board
+
+
+def new_board():
+    """Replace the active Board with a fresh one"""
+    global _board
+    _board = None
+    return get_board()
@@ -0,0 +1,77 @@
+# python -m sim.bus_fault
+# Pulls the RFID reader off the I2C bus in the middle of the night and
+# checks that the run loop keeps going: the phone stays counted as
+# present, no loop iteration takes longer than LOOP_LIMIT_MS, and the
+# reader is back in use after the bus recovers.
+import io
+import os
+import sys
+
+import sim
+from sim.rc522 import Card
+
+FAULT_S = 120          # Clock seconds the reader is off the bus
+GLITCHES = 5           # Single NACKed transfers before the long fault
+LOOP_LIMIT_MS = 50     # Worst case allowed for one loop iteration
+TIME_FACTOR = 60
+
+
+def run():
+    """Run the scenario
+    Returns:
+        bool: True if every check passed
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    board = sim.install(virtual=True, start=1700000000)
+    out = sys.stdout
+    sys.stdout = io.StringIO()   # The firmware prints every poll
+    try:
+        from main_logic import SmartSleepAssistant
+        ssa = SmartSleepAssistant(use_simulated_time=True, time_factor=TIME_FACTOR)
+        rfid = ssa.controller.rfid
+        ssa.set_simulated_time(22, 30)
+        board.place_card(Card([0x9C, 0x40, 0x7A, 0x8E]))
+        ssa.run_discrete(60)
+        settled = ssa.night_mode and rfid.presence.present
+
+        for _ in range(GLITCHES):
+            errors = rfid.bus_errors()
+            board.rfid_fault(1)
+            for _ in range(10):
+                ssa.run_discrete(10)    # Until a presence poll hits the NACK
+                if rfid.bus_errors() != errors:
+                    break
+        glitch_recovered = rfid.rc522.bus_recovered
+
+        ssa.stats.reset()
+        board.rfid_fault()
+        ssa.run_discrete(FAULT_S)
+        loop = ssa.stats.histogram("loop")
+        worst_ms = loop.max_us // 1000
+        held = ssa.night_mode and rfid.presence.present
+        lost = not rfid.is_connected
+
+        board.rfid_fault(0)
+        ssa.run_discrete(120)
+        recovered = rfid.is_connected and rfid.reconnects > 0 and rfid.presence.present
+    finally:
+        sys.stdout = out
+
+    checks = (
+        ("night mode with the phone before the fault", settled),
+        (f"{GLITCHES} single NACKs absorbed by retries ({glitch_recovered})",
+         glitch_recovered >= GLITCHES),
+        ("reader reported lost during the fault", lost),
+        ("phone still present during the fault", held),
+        (f"worst loop iteration {worst_ms}ms < {LOOP_LIMIT_MS}ms ({loop.count} iterations)",
+         worst_ms < LOOP_LIMIT_MS),
+        (f"reader back after the fault ({rfid.reconnects} reconnects, "
+         f"{rfid.bus_errors()} failed transfers)", recovered),
+    )
+    for name, ok in checks:
+        print(("PASS " if ok else "FAIL ") + name)
+    return all(ok for name, ok in checks)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
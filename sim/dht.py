@@ -0,0 +1,44 @@
+import clock
+from sim.board import get_board
+
+ETIMEDOUT = 116
+MEASURE_MS = 24          # Start signal (18 ms) plus the 40-bit reply
+MIN_INTERVAL_MS = 1000   # DHT11 repeats its last reading if polled faster
+
+
+class DHTBase:
+    def __init__(self, pin):
+        self.pin = pin
+        self.board = get_board()
+        self.buf = None
+        self.last_ms = None
+
+    def measure(self):
+        clock.sleep_ms(MEASURE_MS)
+        self.board.record(f"dht{self.pin.id}", "measure")
+        climate = self.board.climate
+        if climate is None:
+            raise OSError(ETIMEDOUT)
+        now = clock.ticks_ms()
+        if self.buf is not None and clock.ticks_diff(now, self.last_ms) < MIN_INTERVAL_MS:
+            return
+        self.last_ms = now
+        self.buf = climate
+
+
+class DHT11(DHTBase):
+    """DHT11: whole degrees and percent"""
+
+    def humidity(self):
+        return int(round(self.buf[1]))
+
+    def temperature(self):
+        return int(round(self.buf[0]))
+
+
+class DHT22(DHTBase):
+    def humidity(self):
+        return round(self.buf[1], 1)
+
+    def temperature(self):
+        return round(self.buf[0], 1)
@@ -0,0 +1,70 @@
+import os
+import re
+import sys
+import types
+
+# The device drivers live in merged_file.py, one "# file <name>" section per
+# file copied to the board. Sections are loaded as modules under the name
+# the firmware imports them by.
+MERGED_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "merged_file.py")
+DRIVER_MODULES = (
+    ("lcd_api", "lcd_api"),
+    ("i2c_lcd", "i2c_lcd"),
+    ("rc_config", "mfrc522_config"),
+    ("soft_iic", "soft_iic"),
+    ("rc_transport", "mfrc522_transport"),
+    ("rc_i2c", "mfrc522_i2c"),
+    ("rc_trace", "mfrc522_trace"),
+)
+
+_HEADER = re.compile(r"^#\s*file\s+(.+?)\s*$", re.M)
+
+
+def read_sections(path=MERGED_FILE):
+    """Split merged_file.py into its sections
+    Returns:
+        dict: Section name -> (first line number, source)
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    sections = {}
+    headers = list(_HEADER.finditer(text))
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        line = text.count("\n", 0, header.end()) + 1
+        sections[header.group(1)] = (line, text[header.end():end])
+    return sections
+
+
+def load_section(name, module_name=None, sections=None):
+    """Run one section as a module with the simulated time module
+    Args:
+        name: Section name in merged_file.py
+        module_name: Name to register in sys.modules (default: don't register)
+    Returns:
+        module: The loaded module
+    """
+    if sections is None:
+        sections = read_sections()
+    line, source = sections[name]
+    module = types.ModuleType(module_name or name)
+    module.__file__ = MERGED_FILE
+    if module_name:
+        sys.modules[module_name] = module
+    # Pad so tracebacks point at the right line of merged_file.py
+    code = compile("\n" * (line - 1) + source, MERGED_FILE, "exec")
+    real_time = sys.modules["time"]
+    sys.modules["time"] = sys.modules["utime"]
+    try:
+        exec(code, module.__dict__)
+    finally:
+        sys.modules["time"] = real_time
+    return module
+
+
+def load_drivers():
+    """Register the LCD and MFRC522 drivers from merged_file.py"""
+    sections = read_sections()
+    for section, module_name in DRIVER_MODULES:
+        load_section(section, module_name, sections)
@@ -0,0 +1,90 @@
+# python -m sim.enrollment
+# Enrolls phones on the assistant the way a user does (hold button 1 with
+# the phones on the reader) and checks that tag profiles reach the
+# schedule: not before enrollment, right away when enrolling, and on every
+# later arrival of the tag. Cards that are not enrolled are never
+# authenticated, and cards whose UID bytes add up to an old phone ID are
+# not let in.
+import io
+import os
+import sys
+
+import sim
+from sim.rc522 import Card, MifareClassic
+
+PHONE = [0x9C, 0x40, 0x7A, 0x8E]
+TAG = [0x04, 0x52, 0x19, 0xA1]
+LOOKALIKE = [0xC8, 0xC8, 0xC8, 0x44]     # UID sum 668, an old phone ID
+HOLD_S = 4                               # Longer than the button's long press
+SETTLE_S = 70                            # Slow polls are 30s apart in run_discrete
+
+
+def write_profile(card, profile):
+    data = profile.encode()
+    card.blocks[4][:] = data[:16]
+    card.blocks[5][:] = data[16:32]
+
+
+def run():
+    """Run the scenario
+    Returns:
+        bool: True if every check passed
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    board = sim.install(virtual=True, start=1700000000)
+    out = sys.stdout
+    sys.stdout = log = io.StringIO()   # The firmware prints every poll
+    try:
+        from main_logic import SmartSleepAssistant
+        from sensor_manager import PIN_BTN1
+        from tag_profile import TagProfile
+        ssa = SmartSleepAssistant(use_simulated_time=True, time_factor=1)
+        rfid = ssa.controller.rfid
+        ssa.set_simulated_time(21, 5)      # Pre-sleep: the reader is polled
+        tag = MifareClassic(bytes(TAG))
+        write_profile(tag, TagProfile("Ann", 22 * 3600 + 15 * 60, 7 * 3600))
+        board.place_card(Card(PHONE, sak=0x20))     # Phones emulate ISO 14443-4 tags
+        board.place_card(tag)
+        ssa.run_discrete(10)
+        before = (len(rfid.authorized_cards), ssa.sleep_time, tag.auths)
+
+        board.press(PIN_BTN1)
+        ssa.run_discrete(HOLD_S)
+        board.release(PIN_BTN1)
+        ssa.run_discrete(1)
+        names = sorted(profile.name for profile in rfid.authorized_cards.profiles())
+        enrolled_sleep = ssa.sleep_time
+
+        write_profile(tag, TagProfile("Ann", 22 * 3600 + 30 * 60, 7 * 3600))
+        board.remove_card(tag)
+        ssa.run_discrete(SETTLE_S)
+        board.place_card(tag)
+        ssa.run_discrete(SETTLE_S)
+        arrival_sleep = ssa.sleep_time
+
+        board.place_card(Card(LOOKALIKE))
+        ssa.run_discrete(SETTLE_S)
+        lookalike = rfid.is_card_authorized(bytes(LOOKALIKE))
+    finally:
+        sys.stdout = out
+
+    checks = (
+        (f"nothing enrolled or read before the long press ({before[0]} cards, {before[2]} auths)",
+         before[0] == 0 and before[1] == 22 * 3600 and before[2] == 0),
+        (f"long press enrolled {names}", names == ["Ann", "James"]),
+        (f"schedule from the tag when enrolling: sleep {ssa.format_time(enrolled_sleep)}",
+         enrolled_sleep == 22 * 3600 + 15 * 60),
+        (f"schedule from the tag on its next arrival: sleep {ssa.format_time(arrival_sleep)}",
+         arrival_sleep == 22 * 3600 + 30 * 60),
+        ("card with an old phone's UID sum not let in", not lookalike),
+        ("one reader and card store for both controllers",
+         ssa.phone_controller.rfid is rfid),
+        ("no failed tag authentication", "authentication failed" not in log.getvalue()),
+    )
+    for name, ok in checks:
+        print(("PASS " if ok else "FAIL ") + name)
+    return all(ok for name, ok in checks)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,192 @@
+# python -m sim.http_bench [REQUESTS]
+# Compares one connection per request (what urequests does) with
+# HttpClient's kept-open and pipelined connection: first against a
+# stand-in server on localhost over real sockets, then on the simulated
+# board, whose WiFi costs board.dns_latency_s, board.tcp_connect_s and
+# board.http_latency_s. Also checks that a server dropping the connection
+# is invisible to the caller, and that a server that is down costs one
+# short connect timeout, not one per request.
+import io
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REQUESTS = 500
+BODY = b'{"samples": [{"t": 1700000000, "type": "env", "temperature": 21.5, "humidity": 40}]}'
+SIM_REQUESTS = 50
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers every request with {"ok": true}, keeping the connection open"""
+
+    protocol_version = "HTTP/1.1"
+    wbufsize = 4096            # Status, headers and body in one segment
+    disable_nagle_algorithm = True
+    close_after = None         # Requests per connection before the server closes it
+
+    def do_GET(self):
+        self.answer()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.answer()
+
+    def answer(self):
+        self.served = getattr(self, "served", 0) + 1
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_after is not None and self.served >= self.close_after:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(close_after=None):
+    handler = type("Handler", (StandInHandler,), {"close_after": close_after})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(run, count):
+    # Returns (requests/s, mean latency us, worst latency us) of count calls
+    import clock
+    latencies = []
+    start = clock.ticks_us()
+    for _ in range(count):
+        t = clock.ticks_us()
+        run()
+        latencies.append(clock.ticks_diff(clock.ticks_us(), t))
+    total = clock.ticks_diff(clock.ticks_us(), start)
+    return count * 1000000 / total, total // count, max(latencies)
+
+
+def bench_localhost(count):
+    from http_client import HttpClient
+    server = start_server()
+    port = server.server_address[1]
+    print(f"Stand-in server on localhost, {count} POSTs of {len(BODY)} bytes:")
+
+    per_request = HttpClient("localhost", port, keep_alive=False)
+
+    def fresh():
+        per_request.addr = None    # urequests resolves the name every time
+        assert per_request.request("POST", "/api/data/telemetry", BODY).status_code == 200
+
+    kept = HttpClient("localhost", port)
+
+    def reused():
+        assert kept.request("POST", "/api/data/telemetry", BODY).status_code == 200
+
+    for name, client, run in (("connection per request", per_request, fresh),
+                              ("kept-open connection", kept, reused)):
+        rate, mean_us, worst_us = timed(run, count)
+        stats = client.stats()
+        print(f"  {name}: {rate:.0f} req/s, {mean_us}us mean, {worst_us}us worst "
+              f"({stats['lookups']} lookups, {stats['connects']} connects)")
+
+    pipelined = HttpClient("localhost", port)
+    import clock
+    start = clock.ticks_us()
+    for _ in range(count):
+        pipelined.queue("POST", "/api/data/telemetry", BODY)
+    responses = pipelined.flush()
+    total = clock.ticks_diff(clock.ticks_us(), start)
+    assert all(response.status_code == 200 for response in responses)
+    print(f"  pipelined: {count * 1000000 / total:.0f} req/s, {total // count}us per request "
+          f"({pipelined.stats()['connects']} connects)")
+    server.shutdown()
+
+    # Server closes every connection after 7 requests: the client must
+    # reconnect on its own, also in the middle of a pipelined burst
+    server = start_server(close_after=7)
+    client = HttpClient("127.0.0.1", server.server_address[1])
+    ok = 0
+    for _ in range(count // 10):
+        ok += client.request("GET", "/api/data").status_code == 200
+    for _ in range(count // 10):
+        client.queue("POST", "/api/data/telemetry", BODY)
+    ok += sum(response.status_code == 200 for response in client.flush())
+    server.shutdown()
+    stats = client.stats()
+    print(f"  server closing every 7 requests: {ok}/{2 * (count // 10)} answered, "
+          f"{stats['connects']} connects, {stats['reconnects']} failed exchanges retried")
+    return ok == 2 * (count // 10)
+
+
+def bench_board(count):
+    import sim
+    import clock
+    board = sim.install(virtual=True, start=1700000000)
+    out = sys.stdout
+    sys.stdout = io.StringIO()     # WebManager prints every request
+    try:
+        for name in ("http_client", "web_manager"):
+            sys.modules.pop(name, None)    # Bound to the host socket module above
+        import urequests
+        from web_manager import WebManager
+        from http_client import CONNECT_TIMEOUT_S, RETRY_MIN_MS
+        web = WebManager()
+        web.connect()
+        url = web.server_url + "/telemetry"
+        results = []
+        for name, run in (
+                ("urequests", lambda: urequests.post(url, data=BODY).close()),
+                ("WebManager", lambda: web.send_data({"t": 1700000000}, "telemetry"))):
+            start = clock.ticks_ms()
+            for _ in range(count):
+                run()
+            results.append((name, clock.ticks_diff(clock.ticks_ms(), start) / count))
+        board.tcp_reset()
+        after_reset = web.send_data({"t": 1700000000}, "telemetry")
+        batches = [[{"t": 1700000000 + i, "type": "env"}] for i in range(8)]
+        start = clock.ticks_ms()
+        accepted = web.post_batches(batches, "telemetry")
+        pipelined_ms = clock.ticks_diff(clock.ticks_ms(), start) / len(batches)
+
+        board.server_down = True       # Off, with the kept-open connection gone
+        board.tcp_reset()
+        stalls = []
+        for _ in range(3):
+            start = clock.ticks_ms()
+            web.send_data({"t": 1700000000}, "telemetry")
+            stalls.append(clock.ticks_diff(clock.ticks_ms(), start))
+        board.server_down = False
+        clock.sleep(RETRY_MIN_MS / 1000)
+        after_down = web.send_data({"t": 1700000000}, "telemetry")
+    finally:
+        sys.stdout = out
+    print(f"Simulated board (DNS {board.dns_latency_s * 1000:.0f}ms, connect "
+          f"{board.tcp_connect_s * 1000:.0f}ms, round trip {board.http_latency_s * 1000:.0f}ms), "
+          f"{count} requests:")
+    for name, ms in results:
+        print(f"  {name}: {ms:.0f}ms per request")
+    print(f"  8 pipelined batches: {pipelined_ms:.0f}ms per batch ({accepted} accepted)")
+    print(f"  request after a server reset: {'sent' if after_reset else 'FAILED'} "
+          f"({web.http_stats()})")
+    print(f"  server down: requests stalled {stalls} ms, then "
+          f"{'sent' if after_down else 'FAILED'} once it is back")
+    stalled_once = stalls[0] <= CONNECT_TIMEOUT_S * 1000 + 100 and max(stalls[1:]) < 100
+    return after_reset and accepted == len(batches) and stalled_once and after_down
+
+
+def run(count=REQUESTS):
+    """Run both benchmarks
+    Returns:
+        bool: True if every request was answered
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ok = bench_localhost(count)
+    return bench_board(SIM_REQUESTS) and ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run(*[int(arg) for arg in sys.argv[1:]]) else 1)
@@ -0,0 +1,247 @@
+import clock
+
+ENODEV = 19
+
+
+class I2CDevice:
+    """Byte-level I2C target. Subclasses override the hooks they need."""
+
+    def i2c_start(self, read):
+        """Called when the device's address was matched
+        Args:
+            read: True for a read transfer, False for a write
+        """
+        pass
+
+    def i2c_write(self, byte):
+        """Receive one byte from the controller
+        Returns:
+            bool: True to ACK, False to NACK
+        """
+        return True
+
+    def i2c_read(self):
+        """Get the next byte to send to the controller"""
+        return 0xFF
+
+    def i2c_stop(self):
+        pass
+
+
+class I2CBus:
+    """One I2C bus with its attached devices
+
+    Reached in two ways: at byte level by the machine.SoftI2C/I2C fakes,
+    and at bit level by a decoder watching the SCL/SDA pins, so the
+    bit-banged softIIC driver talks to the same devices.
+    """
+
+    def __init__(self, board, scl, sda):
+        self.board = board
+        self.scl = scl
+        self.sda = sda
+        self.devices = {}
+        self.faults = {}       # Address -> transfers left that are NACKed (None: all)
+        self.decoder = BitDecoder(self)
+        scl.listeners.append(self.decoder.on_scl)
+        sda.listeners.append(self.decoder.on_sda)
+
+    def attach(self, addr, device):
+        self.devices[addr] = device
+
+    def detach(self, addr):
+        self.devices.pop(addr, None)
+
+    def scan(self):
+        return sorted(addr for addr in self.devices if addr not in self.faults)
+
+    def fault(self, addr, transfers=None):
+        """Make a device stop ACKing its address, as with a loose cable
+        Args:
+            addr: Device address
+            transfers: Number of transfers NACKed, or None until clear_fault()
+        """
+        self.faults[addr] = transfers
+
+    def clear_fault(self, addr):
+        self.faults.pop(addr, None)
+
+    def target(self, addr):
+        """Get the device that ACKs an address at the start of a transfer
+        Returns:
+            I2CDevice, or None if nothing answers
+        """
+        if addr in self.faults:
+            left = self.faults[addr]
+            if left is None:
+                return None
+            if left > 0:
+                if left == 1:
+                    del self.faults[addr]
+                else:
+                    self.faults[addr] = left - 1
+                return None
+        return self.devices.get(addr)
+
+    def wait_bits(self, bits, freq):
+        """Spend the bus time of a number of bit clocks"""
+        if freq:
+            clock.sleep_us(bits * 1000000 // freq)
+
+    def write(self, addr, data, freq, stop=True):
+        """Byte-level write transfer
+        Returns:
+            int: Number of bytes ACKed
+        """
+        device = self.target(addr)
+        self.wait_bits(9, freq)  # START + address
+        self.board.record("i2c", "write", (addr, len(data)))
+        if device is None:
+            raise OSError(ENODEV)
+        device.i2c_start(False)
+        acked = 0
+        for byte in data:
+            self.wait_bits(9, freq)
+            if not device.i2c_write(byte):
+                break
+            acked += 1
+        if stop:
+            device.i2c_stop()
+        return acked
+
+    def read(self, addr, count, freq, stop=True):
+        """Byte-level read transfer
+        Returns:
+            bytes: The data read
+        """
+        device = self.target(addr)
+        self.wait_bits(9, freq)
+        self.board.record("i2c", "read", (addr, count))
+        if device is None:
+            raise OSError(ENODEV)
+        device.i2c_start(True)
+        data = bytearray(count)
+        for i in range(count):
+            self.wait_bits(9, freq)
+            data[i] = device.i2c_read()
+        if stop:
+            device.i2c_stop()
+        return bytes(data)
+
+
+class BitDecoder:
+    """I2C target state machine driven by SCL/SDA level changes
+
+    Samples SDA on rising SCL edges, drives ACK and read data bits on
+    falling edges (by sinking SDA), and detects START/STOP as SDA edges
+    while SCL is high.
+    """
+
+    IDLE = 0
+    ADDRESS = 1
+    WRITE = 2
+    READ = 3
+    IGNORE = 4   # Address not ours - wait for STOP
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.state = self.IDLE
+        self.device = None
+        self.byte = 0
+        self.bits = 0
+        self.in_ack = False     # Inside the 9th clock of a byte
+        self.nacked = False
+        self.out_byte = 0
+        self.out_bit = -1
+        self.sinking = False
+
+    def _sink(self, low):
+        if low == self.sinking:
+            return
+        self.sinking = low
+        self.bus.sda.sinks += 1 if low else -1
+        self.bus.board.update(self.bus.sda)
+
+    def on_sda(self, state, level):
+        if self.bus.scl.level != 1:
+            return
+        if level == 0:
+            # START (or repeated START)
+            if self.state != self.IDLE and self.device is not None:
+                self.device.i2c_stop()
+            self.state = self.ADDRESS
+            self.device = None
+            self.byte = 0
+            self.bits = 0
+            self.in_ack = False
+            self.bus.board.record("i2c", "start")
+        elif self.state != self.IDLE:
+            # STOP
+            if self.device is not None:
+                self.device.i2c_stop()
+            self.state = self.IDLE
+            self.device = None
+            self.in_ack = False
+            self._sink(False)
+            self.bus.board.record("i2c", "stop")
+
+    def on_scl(self, state, level):
+        if self.state in (self.IDLE, self.IGNORE):
+            return
+        if level == 1:
+            self._rising()
+        else:
+            self._falling()
+
+    def _rising(self):
+        sda = self.bus.sda.level
+        if self.in_ack:
+            if self.state == self.READ:
+                self.nacked = sda == 1  # Controller's ACK/NACK after our byte
+            return
+        if self.state in (self.ADDRESS, self.WRITE):
+            self.byte = (self.byte << 1) | sda
+            self.bits += 1
+
+    def _falling(self):
+        if self.in_ack:
+            # End of the 9th clock
+            self.in_ack = False
+            self._sink(False)
+            if self.state == self.READ and not self.nacked:
+                self.out_byte = self.device.i2c_read()
+                self.out_bit = 7
+                self._sink(not (self.out_byte >> 7) & 1)
+            return
+
+        if self.state == self.READ:
+            self.out_bit -= 1
+            if self.out_bit >= 0:
+                self._sink(not (self.out_byte >> self.out_bit) & 1)
+            else:
+                self._sink(False)
+                self.in_ack = True
+            return
+
+        if self.bits < 8:
+            return
+        byte = self.byte
+        self.byte = 0
+        self.bits = 0
+        if self.state == self.ADDRESS:
+            self.device = self.bus.target(byte >> 1)
+            if self.device is None:
+                self.state = self.IGNORE
+                return
+            read = bool(byte & 1)
+            self.bus.board.record("i2c", "address", byte)
+            self.device.i2c_start(read)
+            self.state = self.READ if read else self.WRITE
+            self.nacked = False
+            ack = True
+        else:
+            ack = self.device.i2c_write(byte)
+            self.bus.board.record("i2c", "byte", byte)
+        self.in_ack = True
+        if ack:
+            self._sink(True)
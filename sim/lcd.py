@@ -0,0 +1,115 @@
+import clock
+from sim.i2c import I2CDevice
+
+# PCF8574 port bits as wired on the LCD backpack
+MASK_RS = 0x01
+MASK_E = 0x04
+MASK_BACKLIGHT = 0x08
+
+EXEC_US = 37          # Most HD44780 instructions
+EXEC_CLEAR_US = 1520  # Clear display and return home
+
+
+class Hd44780(I2CDevice):
+    """HD44780 character LCD behind a PCF8574 I2C expander
+
+    Nibbles are latched on the falling edge of E, exactly as the panel
+    does, so the model shows what the real display would. Instructions
+    sent while the controller is still busy with the previous one are
+    counted in busy_violations.
+    """
+
+    def __init__(self, board, rows=2, cols=16):
+        self.board = board
+        self.rows = rows
+        self.cols = cols
+        self.ddram = bytearray(b" " * 0x80)
+        self.cgram = bytearray(64)
+        self.addr = 0
+        self.in_cgram = False
+        self.four_bit = False
+        self.high_nibble = None
+        self.port = 0
+        self.backlight = False
+        self.display_on = False
+        self.busy_until = 0
+        self.busy_violations = 0
+        self.commands = 0
+        self.writes = 0
+
+    def i2c_write(self, byte):
+        previous = self.port
+        self.port = byte
+        self.backlight = bool(byte & MASK_BACKLIGHT)
+        if previous & MASK_E and not byte & MASK_E:
+            self._latch(previous)
+        return True
+
+    def i2c_read(self):
+        return self.port
+
+    def _latch(self, port):
+        nibble = port >> 4
+        rs = port & MASK_RS
+        if not self.four_bit:
+            # 8-bit mode: only the high data lines are wired
+            self._execute(rs, nibble << 4)
+            return
+        if self.high_nibble is None:
+            self.high_nibble = nibble
+            return
+        value = (self.high_nibble << 4) | nibble
+        self.high_nibble = None
+        self._execute(rs, value)
+
+    def _execute(self, rs, value):
+        now = clock.ticks_us()
+        if clock.ticks_diff(self.busy_until, now) > 0:
+            self.busy_violations += 1
+        exec_us = EXEC_US
+        if rs:
+            self.writes += 1
+            if self.in_cgram:
+                self.cgram[self.addr & 0x3F] = value
+                self.addr = (self.addr + 1) & 0x3F
+            else:
+                self.ddram[self.addr & 0x7F] = value
+                self.addr = (self.addr + 1) & 0x7F
+        else:
+            self.commands += 1
+            if value & 0x80:
+                self.addr = value & 0x7F
+                self.in_cgram = False
+            elif value & 0x40:
+                self.addr = value & 0x3F
+                self.in_cgram = True
+            elif value & 0x20:
+                self.four_bit = not value & 0x10
+                self.high_nibble = None
+            elif value & 0x10:
+                pass  # Cursor/display shift
+            elif value & 0x08:
+                self.display_on = bool(value & 0x04)
+            elif value & 0x04:
+                pass  # Entry mode (the drivers only use increment)
+            elif value & 0x02:
+                self.addr = 0
+                self.in_cgram = False
+                exec_us = EXEC_CLEAR_US
+            elif value & 0x01:
+                for i in range(len(self.ddram)):
+                    self.ddram[i] = 0x20
+                self.addr = 0
+                self.in_cgram = False
+                exec_us = EXEC_CLEAR_US
+        self.busy_until = clock.ticks_add(now, exec_us)
+        self.board.record("lcd", "data" if rs else "command", value)
+
+    def lines(self):
+        """Get the visible text, one string per row"""
+        rows = []
+        for row in range(self.rows):
+            start = (0x40 if row & 1 else 0) + (self.cols if row & 2 else 0)
+            cells = self.ddram[start:start + self.cols]
+            rows.append("".join(chr(c) if 32 <= c < 127 else "?" for c in cells))
+        return rows
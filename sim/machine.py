@@ -0,0 +1,233 @@
+import clock
+from sim import board as _board
+from sim.board import get_board
+
+
+def _freq_arg(freq):
+    return 100000 if freq is None else freq
+
+
+class Pin:
+    """GPIO pin. Pin objects with the same id share one line."""
+
+    IN = _board.MODE_IN
+    OUT = _board.MODE_OUT
+    OPEN_DRAIN = _board.MODE_OPEN_DRAIN
+    PULL_UP = _board.PULL_UP
+    PULL_DOWN = _board.PULL_DOWN
+    IRQ_RISING = _board.IRQ_RISING
+    IRQ_FALLING = _board.IRQ_FALLING
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.board = get_board()
+        self.state = self.board.pin_state(id)
+        self.source = f"pin{id}"
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        state = self.state
+        if value is not None:
+            state.out = 1 if value else 0
+        if mode != -1:
+            state.mode = mode
+        if pull != -1:
+            state.pull = pull
+        self.board.record(self.source, "init", (state.mode, state.pull, value))
+        self.board.update(state)
+
+    def value(self, x=None):
+        if x is None:
+            self.board.record(self.source, "read")
+            return self.state.level
+        self.state.out = 1 if x else 0
+        self.board.record(self.source, "write", self.state.out)
+        self.board.update(self.state)
+        return None
+
+    def __call__(self, x=None):
+        return self.value(x)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        self.state.irq_handler = handler
+        self.state.irq_trigger = trigger
+        self.state.irq_pin = self
+        self.board.record(self.source, "irq", trigger)
+
+    def __repr__(self):
+        return f"Pin({self.id})"
+
+
+class PWM:
+    """LEDC PWM output with 10-bit duty; drives a servo model on servo pins"""
+
+    def __init__(self, pin, freq=5000, duty=512, duty_u16=None):
+        self.pin = pin
+        self.board = get_board()
+        self.source = f"pwm{pin.id}"
+        self._freq = freq
+        self._duty = duty if duty_u16 is None else duty_u16 >> 6
+        self.board.pwms[pin.id] = self
+        self.board.record(self.source, "init", (self._freq, self._duty))
+        self._changed()
+
+    def _changed(self):
+        servo = self.board.servos.get(self.pin.id)
+        if servo is not None:
+            servo.drive(self._freq, self._duty)
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+        self.board.record(self.source, "freq", value)
+        self._changed()
+
+    def duty(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = max(0, min(1023, int(value)))
+        self.board.record(self.source, "duty", self._duty)
+        self._changed()
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty << 6
+        self.duty(value >> 6)
+
+    def deinit(self):
+        self._duty = 0
+        self.board.record(self.source, "deinit")
+        self.board.pwms.pop(self.pin.id, None)
+
+
+class ADC:
+    """12-bit ADC reading the level set in board.analog"""
+
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    WIDTH_9BIT = 0
+    WIDTH_10BIT = 1
+    WIDTH_11BIT = 2
+    WIDTH_12BIT = 3
+
+    def __init__(self, pin, atten=None):
+        self.pin = pin
+        self.board = get_board()
+        self.bits = 12
+
+    def atten(self, value):
+        self.board.record(f"adc{self.pin.id}", "atten", value)
+
+    def width(self, value):
+        self.bits = 9 + value
+
+    def read(self):
+        raw = self.board.analog.get(self.pin.id, 0)
+        self.board.record(f"adc{self.pin.id}", "read", raw)
+        return raw >> (12 - self.bits)
+
+    def read_u16(self):
+        return self.board.analog.get(self.pin.id, 0) << 4
+
+
+class SoftI2C:
+    """I2C controller; transfers take bus time at the configured frequency"""
+
+    def __init__(self, scl, sda, freq=400000, timeout=50000):
+        self.board = get_board()
+        self.bus = self.board.get_bus(scl.id, sda.id)
+        self.freq = _freq_arg(freq)
+
+    def scan(self):
+        return self.bus.scan()
+
+    def writeto(self, addr, buf, stop=True):
+        return self.bus.write(addr, bytes(buf), self.freq, stop)
+
+    def writevto(self, addr, vector, stop=True):
+        return self.writeto(addr, b"".join(bytes(buf) for buf in vector), stop)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return self.bus.read(addr, nbytes, self.freq, stop)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        data = self.readfrom(addr, len(buf), stop)
+        buf[:] = data
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        self.writeto(addr, bytes([memaddr]) + bytes(buf))
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        self.writeto(addr, bytes([memaddr]), False)
+        return self.readfrom(addr, nbytes)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        buf[:] = self.readfrom_mem(addr, memaddr, len(buf))
+
+
+class I2C(SoftI2C):
+    """Hardware I2C peripheral (same bus model, selected by id and pins)"""
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400000, timeout=50000):
+        if scl is None:
+            scl = Pin(_board.PIN_SCL)
+        if sda is None:
+            sda = Pin(_board.PIN_SDA)
+        SoftI2C.__init__(self, scl, sda, freq)
+
+
+class UART:
+    """Serial port that records what is written and reads nothing"""
+
+    def __init__(self, id, baudrate=115200, **kwargs):
+        self.id = id
+        self.board = get_board()
+
+    def write(self, buf):
+        self.board.record(f"uart{self.id}", "write", bytes(buf))
+        return len(buf)
+
+    def read(self, nbytes=None):
+        return None
+
+    def any(self):
+        return 0
+
+
+def freq(hz=None):
+    return 240000000 if hz is None else None
+
+
+def unique_id():
+    return b"\x24\x0a\xc4\x00\x00\x01"
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def idle():
+    clock.sleep_ms(1)
+
+
+def lightsleep(ms=None):
+    get_board().record("machine", "lightsleep", ms)
+    if ms:
+        clock.sleep_ms(ms)
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
@@ -0,0 +1,296 @@
+# python -m sim.mqtt_bench [MESSAGES]
+# Runs MqttClient against a broker stand-in on localhost: publish
+# throughput at QoS 0 and 1, memory held per queued message, QoS 1
+# messages buffered through a broker outage, keep-alive pings, and the
+# assistant taking a schedule from its config topic.
+import io
+import os
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+MESSAGES = 5000
+OFFLINE_MESSAGES = 20
+STATE = b'{"t": 1700000000, "temperature": 21, "humidity": 40}'
+
+
+def _read_packet(sock):
+    # (first byte, body) of the next packet, or None when the peer is gone
+    def read(n):
+        data = b""
+        while len(data) < n:
+            chunk = sock.recv(n - len(data))
+            if not chunk:
+                raise OSError("closed")
+            data += chunk
+        return data
+    try:
+        first = read(1)[0]
+        length = shift = 0
+        while True:
+            byte = read(1)[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return first, read(length)
+    except OSError:
+        return None
+
+
+class Session:
+    def __init__(self):
+        self.subscriptions = []
+        self.sock = None
+        self.pending = []          # Messages (topic, payload) kept while away
+        self.lock = threading.Lock()
+
+    def deliver(self, topic, payload, retain=False):
+        from mqtt_client import _packet, _string, PUBLISH
+        if self.sock is None:
+            self.pending.append((topic, payload))
+            return
+        packet = _packet(PUBLISH | 0x02 | (1 if retain else 0),
+                         _string(topic) + b"\x00\x01" + payload)
+        with self.lock:
+            try:
+                self.sock.sendall(packet)
+            except OSError:
+                pass
+
+
+class Broker:
+    """MQTT 3.1.1 broker stand-in: persistent sessions, retained messages,
+    QoS 1 acknowledgements, last wills and pings"""
+
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(8)
+        self.port = self.server.getsockname()[1]
+        self.sessions = {}
+        self.retained = {}
+        self.up = True
+        self.published = 0
+        self.pings = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            sock, addr = self.server.accept()
+            if not self.up:
+                sock.close()
+                continue
+            threading.Thread(target=self.serve, args=(sock,), daemon=True).start()
+
+    def outage(self):
+        """Drop every connection and refuse new ones until restore()"""
+        self.up = False
+        for session in list(self.sessions.values()):
+            if session.sock is not None:
+                session.sock.shutdown(socket.SHUT_RDWR)
+
+    def restore(self):
+        self.up = True
+
+    def publish(self, topic, payload, retain):
+        from mqtt_client import topic_matches
+        with self.lock:
+            self.published += 1
+            if retain:
+                self.retained[topic] = payload
+            targets = [session for session in self.sessions.values()
+                       if any(topic_matches(p, topic) for p in session.subscriptions)]
+        for session in targets:
+            session.deliver(topic, payload)
+
+    def serve(self, sock):
+        from mqtt_client import _packet, CONNACK, PUBACK, SUBACK, PINGREQ, PINGRESP, topic_matches
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)   # As brokers do
+        packet = _read_packet(sock)
+        if packet is None or packet[0] != 0x10:
+            sock.close()
+            return
+        body = packet[1]
+        flags = body[7]
+        i = 10
+        length = int.from_bytes(body[i:i + 2], "big")
+        client_id = body[i + 2:i + 2 + length].decode()
+        i += 2 + length
+        will = None
+        if flags & 0x04:
+            length = int.from_bytes(body[i:i + 2], "big")
+            will_topic = body[i + 2:i + 2 + length].decode()
+            i += 2 + length
+            length = int.from_bytes(body[i:i + 2], "big")
+            will = (will_topic, body[i + 2:i + 2 + length], bool(flags & 0x20))
+        with self.lock:
+            session = self.sessions.get(client_id)
+            if session is None or flags & 0x02:
+                session = self.sessions[client_id] = Session()
+        session.sock = sock
+        sock.sendall(_packet(CONNACK, b"\x00\x00"))
+        pending, session.pending = session.pending, []
+        for topic, payload in pending:
+            session.deliver(topic, payload)
+        while True:
+            packet = _read_packet(sock)
+            if packet is None:
+                break
+            first, body = packet
+            kind = first & 0xF0
+            if kind == 0x30:
+                length = int.from_bytes(body[:2], "big")
+                topic = body[2:2 + length].decode()
+                payload = body[2 + length:]
+                if first & 0x06:
+                    payload = body[4 + length:]
+                    with session.lock:
+                        sock.sendall(_packet(PUBACK, body[2 + length:4 + length]))
+                self.publish(topic, payload, bool(first & 0x01))
+            elif kind == 0x80:
+                length = int.from_bytes(body[2:4], "big")
+                pattern = body[4:4 + length].decode()
+                session.subscriptions.append(pattern)
+                with session.lock:
+                    sock.sendall(_packet(SUBACK, body[:2] + b"\x01"))
+                for topic, payload in list(self.retained.items()):
+                    if topic_matches(pattern, topic):
+                        session.deliver(topic, payload, retain=True)
+            elif kind == PINGREQ:
+                self.pings += 1
+                with session.lock:
+                    sock.sendall(_packet(PINGRESP, b""))
+            elif kind == 0xE0:
+                will = None        # Clean leave
+                break
+        session.sock = None
+        sock.close()
+        if will is not None:
+            self.publish(*will)
+
+
+def poll_until(client, done, seconds=5):
+    end = time.monotonic() + seconds
+    while not done() and time.monotonic() < end:
+        client.poll()
+        time.sleep(0.001)
+    return done()
+
+
+def run(count=MESSAGES):
+    """Run the checks
+    Returns:
+        bool: True if every check passed
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from mqtt_client import MqttClient
+    broker = Broker()
+    results = []
+
+    client = MqttClient("bench", "127.0.0.1", broker.port)
+    client.connect()
+    start = time.perf_counter()
+    for i in range(count):
+        client.publish("ssa/bench/env", STATE)
+    poll_until(client, lambda: broker.published >= count)
+    qos0 = count / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for i in range(count):
+        client.publish("ssa/bench/env", STATE, retain=True, qos=1)
+        if len(client.queue) >= client.queue_size // 2:
+            # Window of acknowledgements outstanding, so nothing is dropped
+            poll_until(client, lambda: len(client.queue) < client.queue_size // 4)
+    poll_until(client, lambda: not client.queue)
+    qos1 = count / (time.perf_counter() - start)
+    print(f"Publish {count} messages of {len(STATE)} bytes: QoS 0 {qos0:.0f}/s, "
+          f"QoS 1 {qos1:.0f}/s ({client.acked} acknowledged, {client.dropped} dropped)")
+    client.disconnect()
+
+    # Memory held by the offline queue
+    offline = MqttClient("memory", "127.0.0.1", broker.port)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(offline.queue_size):
+        offline.publish("ssa/240ac4000001/env", STATE, retain=True, qos=1)
+    per_message = (tracemalloc.get_traced_memory()[0] - before) / offline.queue_size
+    tracemalloc.stop()
+    print(f"Queued message: {offline.queued_bytes // offline.queue_size} bytes on the wire, "
+          f"{per_message:.0f} bytes of heap on this host")
+
+    # Broker outage: QoS 1 messages wait in the queue and arrive afterwards
+    watcher = MqttClient("watcher", "127.0.0.1", broker.port)
+    seen = []
+    watcher.subscribe("ssa/device/#", lambda topic, payload: seen.append(payload))
+    watcher.connect()
+    device = MqttClient("device", "127.0.0.1", broker.port)
+    device.set_last_will("ssa/device/online", b"0")
+    device.connect()
+    poll_until(watcher, lambda: False, 0.2)
+    broker.outage()
+    poll_until(device, lambda: not device.is_connected())
+    for i in range(OFFLINE_MESSAGES):
+        device.publish("ssa/device/mode", b'{"n": %d}' % i, retain=True, qos=1)
+    queued = len(device.queue)
+    broker.restore()
+    delivered = poll_until(device, lambda: device.is_connected() and not device.queue,
+                           seconds=10)
+    poll_until(watcher, lambda: len(set(seen) & {b'{"n": %d}' % i for i in range(OFFLINE_MESSAGES)})
+               == OFFLINE_MESSAGES, seconds=10)
+    got = {b'{"n": %d}' % i for i in range(OFFLINE_MESSAGES)} & set(seen)
+    results.append((f"{queued} messages queued through the outage, {len(got)} delivered, "
+                    f"retained {broker.retained.get('ssa/device/mode')}",
+                    delivered and len(got) == OFFLINE_MESSAGES and
+                    broker.retained.get("ssa/device/mode") == b'{"n": %d}' % (OFFLINE_MESSAGES - 1)))
+    results.append(("will published while the device was cut off",
+                    b"0" in seen))
+
+    # Keep-alive: an idle client pings instead of being dropped
+    idle = MqttClient("idle", "127.0.0.1", broker.port, keepalive=1)
+    idle.connect()
+    pings = broker.pings
+    poll_until(idle, lambda: False, 2.5)
+    results.append((f"idle connection kept up with {broker.pings - pings} pings",
+                    idle.is_connected() and broker.pings - pings >= 3))
+    idle.disconnect()
+
+    # The assistant: retained state per device, schedule from the config topic
+    import sim
+    import mqtt_client
+    board = sim.install()
+    board.wifi_connect_s = 0
+    mqtt_client.socket = socket    # The stand-in listens on a real host port
+    out = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        from main_logic import SmartSleepAssistant
+        ssa = SmartSleepAssistant()
+        web = ssa.controller.web
+        web.connect()
+        web.use_mqtt("127.0.0.1", broker.port)
+        web.poll_telemetry()
+        web.record("mode", {"night": True, "phone": True})
+        topic = f"ssa/{web.device_id}/mode"
+        poll_until(web.mqtt, lambda: topic in broker.retained)
+        broker.publish(f"ssa/{web.device_id}/config", b'{"sleep_time": "23:15"}', False)
+        poll_until(web.mqtt, lambda: ssa.sleep_time == 23 * 3600 + 15 * 60)
+    finally:
+        sys.stdout = out
+    results.append((f"state retained on {topic}: {broker.retained.get(topic)}",
+                    topic in broker.retained))
+    results.append((f"online flag {broker.retained.get(f'ssa/{web.device_id}/online')}",
+                    broker.retained.get(f"ssa/{web.device_id}/online") == b"1"))
+    results.append((f"sleep time from the config topic: {ssa.format_time(ssa.sleep_time)}",
+                    ssa.sleep_time == 23 * 3600 + 15 * 60))
+
+    for name, ok in results:
+        print(("PASS " if ok else "FAIL ") + name)
+    return all(ok for name, ok in results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run(*[int(arg) for arg in sys.argv[1:]]) else 1)
@@ -0,0 +1,35 @@
+import clock
+from sim.board import get_board
+
+BIT_US = 1.25     # 800 kHz WS2812 bit time
+RESET_US = 50
+
+
+class NeoPixel:
+    """WS2812 strip; write() stores the colours on the board and takes the
+    time the bitstream would"""
+
+    def __init__(self, pin, n, bpp=3, timing=1):
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self.pixels = [(0,) * bpp] * n
+        self.board = get_board()
+        self.board.neopixels[pin.id] = [(0,) * bpp] * n
+
+    def __len__(self):
+        return self.n
+
+    def __setitem__(self, index, value):
+        self.pixels[index] = tuple(value)
+
+    def __getitem__(self, index):
+        return self.pixels[index]
+
+    def fill(self, value):
+        self.pixels = [tuple(value)] * self.n
+
+    def write(self):
+        clock.sleep_us(int(self.n * self.bpp * 8 * BIT_US) + RESET_US)
+        self.board.neopixels[self.pin.id] = list(self.pixels)
+        self.board.record(f"neopixel{self.pin.id}", "write", list(self.pixels))
@@ -0,0 +1,62 @@
+import clock
+from sim.board import get_board
+
+STA_IF = 0
+AP_IF = 1
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = 2
+STAT_NO_AP_FOUND = 3
+STAT_GOT_IP = 5
+
+
+class WLAN:
+    """WiFi interface; connect() completes after board.wifi_connect_s"""
+
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self.board = get_board()
+        self.board.wlan = self
+        self._active = False
+        self._status = STAT_IDLE
+        self.connect_ms = None
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            self._status = STAT_IDLE
+        self.board.record("wlan", "active", self._active)
+
+    def connect(self, ssid=None, key=None):
+        if not self._active:
+            raise OSError("WiFi Internal Error")
+        networks = self.board.wifi_networks
+        if networks and ssid not in networks:
+            self._status = STAT_NO_AP_FOUND
+        elif networks and networks[ssid] != key:
+            self._status = STAT_WRONG_PASSWORD
+        else:
+            self._status = STAT_CONNECTING
+            self.connect_ms = clock.ticks_ms()
+        self.board.record("wlan", "connect", ssid)
+
+    def disconnect(self):
+        self._status = STAT_IDLE
+        self.board.record("wlan", "disconnect")
+
+    def status(self, param=None):
+        if self._status == STAT_CONNECTING:
+            waited = clock.ticks_diff(clock.ticks_ms(), self.connect_ms)
+            if waited >= self.board.wifi_connect_s * 1000:
+                self._status = STAT_GOT_IP
+        return self._status
+
+    def isconnected(self):
+        return self._active and self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        if self.isconnected():
+            return ("192.168.1.50", "255.255.255.0", "192.168.1.1", "192.168.1.1")
+        return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
@@ -0,0 +1,526 @@
+import clock
+from sim.i2c import I2CDevice
+
+# Registers used by the model (see mfrc522Config)
+CommandReg = 0x01
+ComIrqReg = 0x04
+DivIrqReg = 0x05
+ErrorReg = 0x06
+Status2Reg = 0x08
+FIFODataReg = 0x09
+FIFOLevelReg = 0x0A
+ControlReg = 0x0C
+BitFramingReg = 0x0D
+CollReg = 0x0E
+ModeReg = 0x11
+TxControlReg = 0x14
+CRCResultRegH = 0x21
+CRCResultRegL = 0x22
+TModeReg = 0x2A
+TPrescalerReg = 0x2B
+TReloadRegH = 0x2C
+TReloadRegL = 0x2D
+VersionReg = 0x37
+
+# Commands
+PCD_Idle = 0x00
+PCD_CalcCRC = 0x03
+PCD_Transceive = 0x0C
+PCD_MFAuthent = 0x0E
+PCD_SoftReset = 0x0F
+
+# ComIrqReg / DivIrqReg bits
+IRQ_RX = 0x20
+IRQ_IDLE = 0x10
+IRQ_ERR = 0x02
+IRQ_TIMER = 0x01
+DIV_CRC = 0x04
+
+# Status2Reg bits
+MF_CRYPTO1_ON = 0x08
+
+# ErrorReg bits
+ERR_BUFFER_OVFL = 0x10
+ERR_COLL = 0x08
+ERR_CRC = 0x04
+
+FIFO_SIZE = 64
+CHIP_VERSION = 0x92
+BIT_US = 9.44          # One bit at 106 kbit/s
+FRAME_DELAY_US = 86    # PICC frame delay time before a response
+AUTH_US = 1200         # MFAuthent: the three-pass exchange with the card
+
+# Card commands
+PICC_REQA = 0x26
+PICC_WUPA = 0x52
+PICC_CT = 0x88
+PICC_SEL_CL1 = 0x93
+PICC_SEL_CL2 = 0x95
+PICC_SEL_CL3 = 0x97
+PICC_HLTA = 0x50
+MF_AUTH_KEY_A = 0x60
+MF_AUTH_KEY_B = 0x61
+MF_READ = 0x30
+MF_WRITE = 0xA0
+MF_ACK = 0x0A
+MF_NAK = 0x04
+
+MF_BLOCKS = 64         # MIFARE Classic 1K: 16 sectors of 4 blocks
+MF_DEFAULT_KEY = b"\xff" * 6
+MF_ACCESS_BITS = b"\xff\x07\x80\x69"   # Transport configuration: key A reads and writes
+
+# Card states (ISO/IEC 14443-3)
+IDLE = 0
+READY = 1
+ACTIVE = 2
+HALT = 3
+
+
+def crc_a(data, preset=0x6363):
+    """ISO/IEC 14443-3 CRC_A
+    Returns:
+        int: 16-bit CRC, send low byte first
+    """
+    crc = preset
+    for byte in data:
+        byte ^= crc & 0xFF
+        byte = (byte ^ (byte << 4)) & 0xFF
+        crc = (crc >> 8) ^ (byte << 8) ^ (byte << 3) ^ (byte >> 4)
+    return crc & 0xFFFF
+
+
+def _to_bits(data, nbits=None):
+    # LSB-first bit list, as sent over the air
+    bits = []
+    for byte in data:
+        for i in range(8):
+            bits.append((byte >> i) & 1)
+    if nbits is not None:
+        bits = bits[:nbits]
+    return bits
+
+
+class Card:
+    """ISO/IEC 14443-3 type A card (PICC)
+    Args:
+        uid: UID bytes (4, 7 or 10)
+        sak: Select acknowledge of the complete UID (0x08 = MIFARE Classic 1K)
+        atqa: Answer to request, low byte first
+    """
+
+    def __init__(self, uid, sak=0x08, atqa=(0x04, 0x00)):
+        self.uid = bytes(uid)
+        self.sak = sak
+        self.atqa = bytes(atqa)
+        self.state = IDLE
+        self.halted = False   # Came from HALT: falls back there instead of IDLE
+        self.level = 0        # Cascade level being selected
+
+    def levels(self):
+        """Get the 5-byte anticollision field (UID part + BCC) of each level"""
+        uid = self.uid
+        if len(uid) == 4:
+            parts = [uid]
+        elif len(uid) == 7:
+            parts = [bytes([PICC_CT]) + uid[0:3], uid[3:7]]
+        else:
+            parts = [bytes([PICC_CT]) + uid[0:3], bytes([PICC_CT]) + uid[3:6], uid[6:10]]
+        fields = []
+        for part in parts:
+            bcc = part[0] ^ part[1] ^ part[2] ^ part[3]
+            fields.append(part + bytes([bcc]))
+        return fields
+
+    def power_off(self):
+        self.state = IDLE
+        self.halted = False
+        self.level = 0
+
+    def _fall_back(self):
+        self.state = HALT if self.halted else IDLE
+        self.level = 0
+
+    def _with_crc(self, data):
+        crc = crc_a(data)
+        return bytes(data) + bytes([crc & 0xFF, crc >> 8])
+
+    def receive(self, frame, nbits):
+        """Handle a frame from the reader
+        Args:
+            frame: Frame bytes
+            nbits: Number of valid bits in the frame
+        Returns:
+            list: Response bits (LSB first), or None for no response
+        """
+        if nbits == 7:
+            if frame[0] == PICC_REQA and self.state == IDLE or \
+                    frame[0] == PICC_WUPA and self.state in (IDLE, HALT):
+                self.state = READY
+                self.level = 0
+                return _to_bits(self.atqa)
+            if self.state != HALT:
+                self._fall_back()
+            return None
+
+        if self.state == READY and frame[0] in (PICC_SEL_CL1, PICC_SEL_CL2, PICC_SEL_CL3):
+            return self._select(frame, nbits)
+
+        if self.state == ACTIVE and nbits == 32 and frame[0] == PICC_HLTA and \
+                crc_a(frame[0:2]) == frame[2] | (frame[3] << 8):
+            self.state = HALT
+            self.halted = True
+            return None
+
+        if self.state in (READY, ACTIVE):
+            response = self.command(frame, nbits)
+            if response is not None:
+                return response
+            self._fall_back()
+        return None
+
+    def command(self, frame, nbits):
+        """Handle a command in the ACTIVE state (memory commands)
+        Returns:
+            list: Response bits, or None for an unknown command
+        """
+        return None
+
+    def _select(self, frame, nbits):
+        level = (frame[0] - PICC_SEL_CL1) // 2
+        fields = self.levels()
+        if level != self.level or level >= len(fields):
+            self._fall_back()
+            return None
+        field = fields[level]
+        nvb = frame[1]
+        if nvb == 0x70:
+            # SELECT with the complete UID part and CRC_A
+            if nbits < 72 or frame[2:7] != field or \
+                    crc_a(frame[0:7]) != frame[7] | (frame[8] << 8):
+                return None
+            if level + 1 < len(fields):
+                self.level = level + 1
+                return _to_bits(self._with_crc([0x04]))  # Cascade bit: UID not complete
+            self.state = ACTIVE
+            return _to_bits(self._with_crc([self.sak]))
+
+        # ANTICOLLISION: answer if the known bits match, with the rest of the field
+        known = ((nvb >> 4) - 2) * 8 + (nvb & 0x0F)
+        if known < 0 or known > 40:
+            return None
+        field_bits = _to_bits(field)
+        if _to_bits(frame[2:], known) != field_bits[:known]:
+            return None
+        return field_bits[known:]
+
+
+class MifareClassic(Card):
+    """MIFARE Classic 1K card: 64 blocks of 16 bytes behind Crypto1 keys
+
+    Authentication is checked against the sector trailer's keys, but the
+    traffic after it is modelled in plain text (no Crypto1 cipher): READ
+    answers 16 bytes and CRC_A, WRITE is the two-step exchange with a
+    4-bit ACK after the command and after the data. Access bits are not
+    enforced, either key opens the whole sector.
+    """
+
+    def __init__(self, uid, sak=0x08, atqa=(0x04, 0x00)):
+        Card.__init__(self, uid, sak, atqa)
+        self.blocks = [bytearray(16) for _ in range(MF_BLOCKS)]
+        self.blocks[0][0:len(self.uid)] = self.uid
+        for trailer in range(3, MF_BLOCKS, 4):
+            self.blocks[trailer][:] = MF_DEFAULT_KEY + MF_ACCESS_BITS + MF_DEFAULT_KEY
+        self.sector = None          # Authenticated sector
+        self.write_block = None     # Block of a WRITE waiting for its data
+        self.reads = 0
+        self.writes = 0
+        self.auths = 0
+
+    def power_off(self):
+        Card.power_off(self)
+        self.crypto_off()
+
+    def crypto_off(self):
+        self.sector = None
+        self.write_block = None
+
+    def receive(self, frame, nbits):
+        if nbits == 7 or frame[0] == PICC_HLTA:
+            self.crypto_off()
+        return Card.receive(self, frame, nbits)
+
+    def _fall_back(self):
+        Card._fall_back(self)
+        self.crypto_off()
+
+    def authenticate(self, command, block, key):
+        """Handle MFAuthent
+        Returns:
+            bool: True if the key opens the block's sector
+        """
+        if self.state != ACTIVE or block >= MF_BLOCKS:
+            return False
+        trailer = self.blocks[block // 4 * 4 + 3]
+        expected = trailer[0:6] if command == MF_AUTH_KEY_A else trailer[10:16]
+        if command not in (MF_AUTH_KEY_A, MF_AUTH_KEY_B) or bytes(key) != bytes(expected):
+            self._fall_back()
+            return False
+        self.sector = block // 4
+        self.write_block = None
+        self.auths += 1
+        return True
+
+    def command(self, frame, nbits):
+        if self.state != ACTIVE or nbits % 8 or nbits < 24 or \
+                crc_a(frame[0:-2]) != frame[-2] | (frame[-1] << 8):
+            return None
+        if self.write_block is not None:
+            # Second step of a WRITE: the 16 data bytes
+            block = self.write_block
+            self.write_block = None
+            if len(frame) != 18:
+                return self._nak()
+            self.blocks[block][:] = frame[0:16]
+            self.writes += 1
+            return _to_bits([MF_ACK], 4)
+        if len(frame) != 4 or frame[0] not in (MF_READ, MF_WRITE):
+            return None
+        block = frame[1]
+        if self.sector is None or block >= MF_BLOCKS or block // 4 != self.sector:
+            return self._nak()
+        if frame[0] == MF_READ:
+            self.reads += 1
+            return _to_bits(self._with_crc(self.blocks[block]))
+        self.write_block = block
+        return _to_bits([MF_ACK], 4)
+
+    def _nak(self):
+        # A NAK ends the session: the card drops back to IDLE or HALT
+        self._fall_back()
+        return _to_bits([MF_NAK], 4)
+
+
+class Mfrc522(I2CDevice):
+    """MFRC522 reader IC on I2C, with the cards in its RF field
+
+    Models the register file, the 64-byte FIFO, the CRC coprocessor, the
+    timer and the Transceive command, including bit-oriented frames and
+    collisions between several cards. Command completion is timed: the IRQ
+    bits appear only once the RF exchange (or the timer) would have ended.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.cards = []
+        self.reg = 0
+        self.got_reg = False
+        self.reset()
+
+    def reset(self):
+        self.regs = bytearray(64)
+        self.regs[CommandReg] = 0x20
+        self.regs[ModeReg] = 0x3F
+        self.regs[TxControlReg] = 0x80
+        self.regs[VersionReg] = CHIP_VERSION
+        self.fifo = bytearray()
+        self.pending_irq = 0
+        self.irq_due = 0
+        self.transceives = 0
+        for card in self.cards:
+            card.power_off()
+
+    # ---- Field ----
+
+    def place(self, card):
+        card.power_off()
+        if card not in self.cards:
+            self.cards.append(card)
+        self.board.record("rfid", "place", card.uid.hex())
+
+    def remove(self, card=None):
+        if card is None:
+            self.cards = []
+        elif card in self.cards:
+            self.cards.remove(card)
+        self.board.record("rfid", "remove", card.uid.hex() if card else None)
+
+    def field_on(self):
+        return self.regs[TxControlReg] & 0x03 != 0
+
+    # ---- I2C ----
+
+    def i2c_start(self, read):
+        if not read:
+            self.got_reg = False
+
+    def i2c_write(self, byte):
+        if not self.got_reg:
+            self.reg = byte & 0x3F
+            self.got_reg = True
+        else:
+            self.write_register(self.reg, byte)
+        return True
+
+    def i2c_read(self):
+        return self.read_register(self.reg)
+
+    # ---- Registers ----
+
+    def _apply_pending(self):
+        if self.pending_irq and clock.ticks_diff(clock.ticks_us(), self.irq_due) >= 0:
+            self.regs[ComIrqReg] |= self.pending_irq
+            self.pending_irq = 0
+
+    def read_register(self, reg):
+        if reg == FIFODataReg:
+            if not self.fifo:
+                return 0
+            value = self.fifo[0]
+            self.fifo = self.fifo[1:]
+            return value
+        if reg == FIFOLevelReg:
+            return len(self.fifo)
+        if reg == ComIrqReg:
+            self._apply_pending()
+        return self.regs[reg]
+
+    def write_register(self, reg, value):
+        if reg == FIFODataReg:
+            if len(self.fifo) < FIFO_SIZE:
+                self.fifo.append(value)
+            else:
+                self.regs[ErrorReg] |= ERR_BUFFER_OVFL
+        elif reg == FIFOLevelReg:
+            if value & 0x80:
+                self.fifo = bytearray()
+                self.regs[ErrorReg] &= ~ERR_BUFFER_OVFL & 0xFF
+        elif reg in (ComIrqReg, DivIrqReg):
+            # Bit 7 set: set the marked bits, otherwise clear them
+            if value & 0x80:
+                self.regs[reg] |= value & 0x7F
+            else:
+                self.regs[reg] &= ~value & 0xFF
+        elif reg == CommandReg:
+            self.regs[CommandReg] = (self.regs[CommandReg] & 0xF0) | (value & 0x3F)
+            self._command(value & 0x0F)
+        elif reg == BitFramingReg:
+            self.regs[BitFramingReg] = value & 0x7F
+            if value & 0x80 and self.regs[CommandReg] & 0x0F == PCD_Transceive:
+                self._transceive()
+        elif reg == TxControlReg:
+            was_on = self.field_on()
+            self.regs[TxControlReg] = value
+            if was_on and not self.field_on():
+                for card in self.cards:
+                    card.power_off()
+            self.board.record("rfid", "antenna", value & 0x03)
+        elif reg == Status2Reg:
+            if self.regs[Status2Reg] & MF_CRYPTO1_ON and not value & MF_CRYPTO1_ON:
+                for card in self.cards:
+                    if isinstance(card, MifareClassic):
+                        card.crypto_off()
+            # Only MFCrypto1On can be written, and only cleared
+            self.regs[Status2Reg] = (value & 0xC0) | (self.regs[Status2Reg] & value & MF_CRYPTO1_ON)
+        elif reg != VersionReg:
+            self.regs[reg] = value
+
+    def _command(self, command):
+        if command == PCD_SoftReset:
+            self.reset()
+            self.board.record("rfid", "reset")
+        elif command == PCD_Idle:
+            self.pending_irq = 0
+        elif command == PCD_CalcCRC:
+            presets = (0x0000, 0x6363, 0xA671, 0xFFFF)
+            crc = crc_a(self.fifo, presets[self.regs[ModeReg] & 0x03])
+            self.fifo = bytearray()
+            self.regs[CRCResultRegL] = crc & 0xFF
+            self.regs[CRCResultRegH] = crc >> 8
+            self.regs[DivIrqReg] |= DIV_CRC
+        elif command == PCD_MFAuthent:
+            self._authenticate()
+
+    def _authenticate(self):
+        # FIFO: command, block, 6 key bytes, last 4 UID bytes
+        data = bytes(self.fifo)
+        self.fifo = bytearray()
+        self.regs[ErrorReg] &= ERR_BUFFER_OVFL
+        now = clock.ticks_us()
+        self.board.record("rfid", "authent", data[0:2].hex())
+        card = None
+        if len(data) == 12 and self.field_on():
+            for candidate in self.cards:
+                if isinstance(candidate, MifareClassic) and candidate.state == ACTIVE and \
+                        candidate.uid[-4:] == data[8:12]:
+                    card = candidate
+        if card is not None and card.authenticate(data[0], data[1], data[2:8]):
+            self.regs[Status2Reg] |= MF_CRYPTO1_ON
+            self.pending_irq = IRQ_IDLE
+            self.irq_due = clock.ticks_add(now, AUTH_US)
+        else:
+            # The card stops answering: the timer ends the command
+            self.pending_irq = IRQ_TIMER
+            self.irq_due = clock.ticks_add(now, AUTH_US + self.timer_us())
+
+    def timer_us(self):
+        """Get the timer period set by TModeReg/TPrescalerReg/TReloadReg"""
+        prescaler = ((self.regs[TModeReg] & 0x0F) << 8) | self.regs[TPrescalerReg]
+        reload = (self.regs[TReloadRegH] << 8) | self.regs[TReloadRegL]
+        return int((2 * prescaler + 1) * (reload + 1) / 13.56)
+
+    def _transceive(self):
+        framing = self.regs[BitFramingReg]
+        tx_last_bits = framing & 0x07
+        rx_align = (framing >> 4) & 0x07
+        frame = bytes(self.fifo)
+        self.fifo = bytearray()
+        nbits = len(frame) * 8
+        if tx_last_bits and frame:
+            nbits -= 8 - tx_last_bits
+        self.transceives += 1
+        self.board.record("rfid", "transceive", frame.hex())
+
+        responses = []
+        if self.field_on():
+            for card in self.cards:
+                bits = card.receive(frame, nbits)
+                if bits is not None:
+                    responses.append(bits)
+
+        now = clock.ticks_us()
+        tx_us = int(nbits * BIT_US) + FRAME_DELAY_US
+        self.regs[ErrorReg] &= ERR_BUFFER_OVFL
+        self.regs[CollReg] = (self.regs[CollReg] & 0x80) | 0x20
+        if not responses:
+            # Only the timer ends the command
+            self.pending_irq = IRQ_TIMER
+            self.irq_due = clock.ticks_add(now, tx_us + self.timer_us())
+            return
+
+        # Merge the answers bit by bit; the first disagreement is a collision
+        length = max(len(bits) for bits in responses)
+        merged = []
+        collision = None
+        for i in range(length):
+            values = set(bits[i] for bits in responses if i < len(bits))
+            if collision is None and len(values) > 1:
+                collision = i
+            merged.append(0 if collision is not None and i >= collision else values.pop())
+        if collision is not None:
+            self.regs[ErrorReg] |= ERR_COLL
+            self.regs[CollReg] = (self.regs[CollReg] & 0x80) | ((rx_align + collision + 1) & 0x1F)
+
+        # Received bits start at bit position rx_align of the first byte
+        total = rx_align + len(merged)
+        data = bytearray((total + 7) // 8)
+        for i, bit in enumerate(merged):
+            if bit:
+                position = rx_align + i
+                data[position // 8] |= 1 << (position % 8)
+        self.fifo = data
+        self.regs[ControlReg] = (self.regs[ControlReg] & 0xF8) | (total % 8)
+        irq = IRQ_RX | IRQ_IDLE
+        if collision is not None:
+            irq |= IRQ_ERR
+        self.pending_irq = irq
+        self.irq_due = clock.ticks_add(now, tx_us + int(len(merged) * BIT_US))
@@ -0,0 +1,140 @@
+# python -m sim.status_load [BROWSERS]
+# Runs the assistant's loop on the simulated board with the status server
+# listening on a host port, first with nobody watching and then with
+# BROWSERS dashboards open (each loads the page and follows /events) and
+# one script polling /state, and compares the loop iteration times. The
+# browsers run in a separate process so they do not compete for the
+# interpreter.
+import io
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BROWSERS = 4
+DURATION_S = 5
+LOOP_SLEEP_S = 0.01
+STATE_POLL_S = 0.5
+CHANGE_MS = 250            # The strip brightness changes this often, watched or not
+SLOWDOWN_LIMIT_US = 1000   # Allowed growth of the mean loop iteration
+
+
+def get(port, path):
+    # One plain request; returns the status line
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: ssa\r\n\r\n".encode())
+    data = b""
+    while True:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    sock.close()
+    return data.split(b"\r\n", 1)[0]
+
+
+def browser(port, counts, index, stop):
+    get(port, "/")
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.sendall(b"GET /events HTTP/1.1\r\nHost: ssa\r\nAccept: text/event-stream\r\n\r\n")
+    sock.settimeout(0.2)
+    while not stop.is_set():
+        try:
+            counts[index] += sock.recv(4096).count(b"data: ")
+        except socket.timeout:
+            pass
+    sock.close()
+
+
+def poller(port, counts, index, stop):
+    while not stop.wait(STATE_POLL_S):
+        counts[index] += get(port, "/state").endswith(b" 200 OK")
+
+
+def browsers(port, count, seconds):
+    """Run count browsers and a /state poller for a while (in the child process)"""
+    counts = [0] * (count + 1)
+    stop = threading.Event()
+    threads = [threading.Thread(target=browser, args=(port, counts, i, stop)) for i in range(count)]
+    threads.append(threading.Thread(target=poller, args=(port, counts, count, stop)))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(" ".join(str(n) for n in counts))
+
+
+def measure(ssa, seconds):
+    import clock
+    ssa.stats.reset()
+    start = clock.ticks_ms()
+    changes = 0
+    while clock.ticks_diff(clock.ticks_ms(), start) < seconds * 1000:
+        if clock.ticks_diff(clock.ticks_ms(), start) >= changes * CHANGE_MS:
+            changes += 1
+            ssa.controller.actuators.rgb_white(changes * 7 % 100)
+        ssa.run_handlers_once()
+        clock.sleep(LOOP_SLEEP_S)
+    loop = ssa.stats.histogram("loop")
+    http = ssa.stats.histogram("http")
+    return (loop.mean_us(), loop.percentile_us(99), loop.max_us, http.mean_us(), http.max_us)
+
+
+def run(count=BROWSERS):
+    """Run the measurement
+    Returns:
+        bool: True if every browser got events and the loop stayed fast
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    import sim
+    sim.install()
+    out = sys.stdout
+    sys.stdout = io.StringIO()     # The firmware prints every poll
+    try:
+        from main_logic import SmartSleepAssistant
+        ssa = SmartSleepAssistant(use_simulated_time=True, time_factor=1)
+        ssa.set_simulated_time(21, 0)      # Wind-down, far from any transition
+        server = ssa.status_server
+        server.port = 0
+        server.page = os.path.join(root, "sleep_dashboard.html")
+        server.start()
+        port = server.sock.getsockname()[1]
+        idle = measure(ssa, DURATION_S)
+        child = subprocess.Popen([sys.executable, "-m", "sim.status_load", "--browsers",
+                                  str(port), str(count), str(DURATION_S)],
+                                 cwd=root, stdout=subprocess.PIPE)
+        busy = measure(ssa, DURATION_S + 1)
+        received = [int(n) for n in child.communicate()[0].split()]
+        polled = received.pop()
+        stats = server.stats()
+        server.stop()
+    finally:
+        sys.stdout = out
+
+    print(f"Loop iteration, {DURATION_S}s each:")
+    for name, times in (("no browser", idle), (f"{count} browsers", busy)):
+        print("  %s: mean %dus, p99 %dus, max %dus (server poll mean %dus, max %dus)"
+              % ((name,) + times))
+    print(f"  events per browser: {received}, /state answers: {polled}; server {stats}")
+    slowdown = busy[0] - idle[0]
+    checks = (
+        ("every browser got events", len(received) == count and min(received) > 1),
+        ("every /state poll answered", polled >= DURATION_S / STATE_POLL_S - 1),
+        (f"mean loop iteration {slowdown:+}us with browsers (limit {SLOWDOWN_LIMIT_US}us)",
+         slowdown < SLOWDOWN_LIMIT_US),
+    )
+    for name, ok in checks:
+        print(("PASS " if ok else "FAIL ") + name)
+    return all(ok for name, ok in checks)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--browsers"]:
+        browsers(*[int(arg) for arg in sys.argv[2:5]])
+        sys.exit(0)
+    sys.exit(0 if run(*[int(arg) for arg in sys.argv[1:]]) else 1)
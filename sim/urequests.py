@@ -0,0 +1,65 @@
+import json as _json
+import clock
+from sim.board import get_board
+
+EHOSTUNREACH = 113
+
+
+class Response:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.reason = b"OK" if status_code == 200 else b""
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return _json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+def request(method, url, data=None, json=None, headers=None):
+    """HTTP request answered by board.http_handler
+
+    Costs a DNS lookup, a TCP connect and a round trip every time, as the
+    real urequests opens a new connection per request.
+    """
+    board = get_board()
+    if board.wlan is None or not board.wlan.isconnected():
+        raise OSError(EHOSTUNREACH)
+    clock.sleep(board.dns_latency_s + board.tcp_connect_s)
+    board.record("dns", "lookup", url)
+    board.record("tcp", "connect", url)
+    if json is not None:
+        data = _json.dumps(json)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    clock.sleep(board.http_latency_s)
+    board.record("http", method.lower(), (url, len(data) if data else 0))
+    if board.http_handler is None:
+        status, body = 200, b"{}"
+    else:
+        status, body = board.http_handler(method, url, data, headers or {})
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return Response(status, body)
+
+
+def get(url, **kw):
+    return request("GET", url, **kw)
+
+
+def post(url, **kw):
+    return request("POST", url, **kw)
+
+
+def put(url, **kw):
+    return request("PUT", url, **kw)
+
+
+def delete(url, **kw):
+    return request("DELETE", url, **kw)
@@ -0,0 +1,133 @@
+import clock
+from sim.board import get_board
+
+AF_INET = 2
+SOCK_STREAM = 1
+EHOSTUNREACH = 113
+ETIMEDOUT = 110
+SERVER_ADDR = "192.168.1.10"
+
+
+def getaddrinfo(host, port, af=0, type=0, proto=0, flags=0):
+    """Name lookup costing board.dns_latency_s; every host is SERVER_ADDR"""
+    board = get_board()
+    if board.wlan is None or not board.wlan.isconnected():
+        raise OSError(EHOSTUNREACH)
+    clock.sleep(board.dns_latency_s)
+    board.record("dns", "lookup", host)
+    return [(AF_INET, SOCK_STREAM, 0, "", (SERVER_ADDR, port))]
+
+
+class socket:
+    """TCP socket to a simulated HTTP server
+
+    Requests written to it are answered by board.http_handler, one
+    board.http_latency_s round trip per burst of pipelined requests. After
+    board.tcp_reset() reads return end of stream, as from a server that
+    dropped the connection.
+    """
+
+    def __init__(self, af=AF_INET, type=SOCK_STREAM, proto=0):
+        self.board = get_board()
+        self.addr = None
+        self.generation = None
+        self.inbox = b""           # Bytes written, not answered yet
+        self.outbox = b""          # Responses not read yet
+        self.closing = False
+        self.timeout = None
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def connect(self, addr):
+        board = self.board
+        if board.wlan is None or not board.wlan.isconnected():
+            raise OSError(EHOSTUNREACH)
+        if board.server_down:
+            # No answer to the SYN: give up after the timeout
+            clock.sleep(30 if self.timeout is None else self.timeout)
+            board.record("tcp", "timeout", addr)
+            raise OSError(ETIMEDOUT)
+        clock.sleep(board.tcp_connect_s)
+        board.record("tcp", "connect", addr)
+        self.addr = addr
+        self.generation = board.tcp_generation
+
+    def _alive(self):
+        return self.addr is not None and self.generation == self.board.tcp_generation
+
+    def sendall(self, data):
+        if not self._alive():
+            raise OSError(EHOSTUNREACH)
+        self.inbox += bytes(data)
+
+    def send(self, data):
+        self.sendall(data)
+        return len(data)
+
+    write = send
+
+    def recv(self, size):
+        if not self._alive():
+            return b""
+        if not self.outbox:
+            if self.closing:
+                return b""
+            self._serve()
+        data = self.outbox[:size]
+        self.outbox = self.outbox[size:]
+        return data
+
+    read = recv
+
+    def close(self):
+        self.addr = None
+
+    def _serve(self):
+        # Answer every complete request in the inbox
+        board = self.board
+        served = False
+        while not self.closing:
+            request = self._next_request()
+            if request is None:
+                break
+            if not served:
+                clock.sleep(board.http_latency_s)
+                served = True
+            method, path, headers, body = request
+            host = headers.get("host", SERVER_ADDR)
+            url = f"http://{host}{path}"
+            board.record("http", method.lower(), (url, len(body)))
+            if board.http_handler is None:
+                status, content = 200, b"{}"
+            else:
+                status, content = board.http_handler(method, url, body or None, headers)
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            head = f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n" \
+                   f"Content-Length: {len(content)}\r\n"
+            if headers.get("connection", "").lower() == "close":
+                head += "Connection: close\r\n"
+                self.closing = True
+            self.outbox += head.encode("utf-8") + b"\r\n" + content
+        if not served:
+            raise OSError(ETIMEDOUT)
+
+    def _next_request(self):
+        # Take one complete request off the inbox, or None
+        end = self.inbox.find(b"\r\n\r\n")
+        if end < 0:
+            return None
+        lines = self.inbox[:end].decode("utf-8").split("\r\n")
+        method, path = lines[0].split(" ")[:2]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        start = end + 4
+        if len(self.inbox) < start + length:
+            return None
+        body = self.inbox[start:start + length]
+        self.inbox = self.inbox[start + length:]
+        return method, path, headers, body
@@ -0,0 +1,21 @@
+# MicroPython time module on top of the active clock; the drivers loaded
+# from merged_file.py import this as "time"
+import time as _time
+import clock
+
+sleep = clock.sleep
+sleep_ms = clock.sleep_ms
+sleep_us = clock.sleep_us
+ticks_ms = clock.ticks_ms
+ticks_us = clock.ticks_us
+ticks_cpu = clock.ticks_us
+ticks_diff = clock.ticks_diff
+ticks_add = clock.ticks_add
+time = clock.time
+localtime = clock.localtime
+gmtime = clock.localtime
+mktime = _time.mktime
+
+
+def time_ns():
+    return int(clock.time() * 1000000000)
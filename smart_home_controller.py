@@ -4,7 +4,15 @@ from display_manager import DisplayManager
 from web_manager import WebManager
 from rfid_manager import RFIDManager  # Import the new RFID manager
 from light_control import LightManager
-import time
+from input_events import PRESS
+import clock
+
+def pressed(events, source):
+    """Check whether a list of input events has a press of one input"""
+    for event in events:
+        if event.kind == PRESS and event.source == source:
+            return True
+    return False
 
 class SmartHomeController:
     def __init__(self):
@@ -15,16 +23,16 @@ class SmartHomeController:
         self.actuators = ActuatorManager()
         self.display = DisplayManager()
         self.web = WebManager()
-        self.rfid = RFIDManager()
+        self.rfid = RFIDManager(self.display.i2c)  # Share the LCD's bus on the same pins
         self.light = LightManager()  # Add the light manager
         
         # Display welcome message
         #self.display.display_two_lines("Smart Home", "System Ready")
-        #time.sleep(2)
+        #clock.sleep(2)
         
         # Add some test authorized cards (replace with real card IDs)
-        #self.rfid.add_authorized_card("12345678", "Admin Card")
-        #self.rfid.add_authorized_card("87654321", "Guest Card")
+        #self.rfid.add_authorized_card("84-12-125-63", "Admin Card")
+        #self.rfid.add_authorized_card("18-52-86-120", "Guest Card")
         
         print("Smart Home Controller initialized")
     
@@ -42,12 +50,12 @@ class SmartHomeController:
         if self.web.connect():
             self.actuators.rgb_green()
             self.display.display_two_lines("WiFi Connected", "IP: " + self.web.wlan.ifconfig()[0])
-            time.sleep(2)
+            clock.sleep(2)
             self.actuators.rgb_off()
         else:
             self.actuators.rgb_red()
             self.display.display_two_lines("WiFi Failed", "Check settings")
-            time.sleep(2)
+            clock.sleep(2)
             self.actuators.rgb_off()
     
     def motion_detection_demo(self):
@@ -65,7 +73,7 @@ class SmartHomeController:
                     self.actuators.led_off()
                     self.actuators.rgb_off()
                     self.display.display_two_lines("No Motion", "")
-                time.sleep(0.1)
+                clock.sleep(0.1)
         except KeyboardInterrupt:
             self.actuators.led_off()
             self.actuators.rgb_off()
@@ -92,15 +100,15 @@ class SmartHomeController:
                     self.actuators.rgb_green()  # Comfortable - green
                 
                 # Send data to server every 30 seconds
-                if int(time.time()) % 30 == 0:
+                if int(clock.time()) % 30 == 0:
                     data = {
-                        "timestamp": time.time(),
+                        "timestamp": clock.time(),
                         "temperature": temp,
                         "humidity": humidity
                     }
                     self.web.send_data(data, "temperature")
                 
-                time.sleep(1)
+                clock.sleep(1)
         except KeyboardInterrupt:
             self.actuators.rgb_off()
             print("Temperature monitor demo stopped")
@@ -134,12 +142,12 @@ class SmartHomeController:
                         # Open the door
                         self.actuators.servo_angle(180)
                         door_open = True
-                        door_lock_timeout = time.time() + auto_lock_time
+                        door_lock_timeout = clock.time() + auto_lock_time
                         
                         print(f"Door opened for {name}")
                         
                         # Wait a moment to prevent multiple scans
-                        time.sleep(0.5)
+                        clock.sleep(0.5)
                     else:
                         self.display.display_two_lines("Access Denied", "Unknown Card")
                         
@@ -147,46 +155,39 @@ class SmartHomeController:
                         self.actuators.rgb_red()
                         for _ in range(2):  # Two quick error beeps
                             self.actuators.buzzer_beep(220, 0.2)
-                            time.sleep(0.1)
+                            clock.sleep(0.1)
                         
                         print(f"Access denied for card: {card_id}")
-                        time.sleep(1)
+                        clock.sleep(1)
                         self.actuators.rgb_off()
                 
                 # Auto-lock the door after timeout
-                if door_open and time.time() > door_lock_timeout:
+                if door_open and clock.time() > door_lock_timeout:
                     self.display.display_two_lines("Auto-locking", "Door secured")
                     self.actuators.servo_angle(0)  # Close door/gate
                     self.actuators.buzzer_beep(440, 0.1)  # Confirmation beep
                     door_open = False
                     self.actuators.rgb_off()
-                    time.sleep(1)
+                    clock.sleep(1)
                     self.display.display_two_lines("RFID Access", "Scan your card")
                 
+                events = self.sensors.drain_events()
+                
                 # Manual lock with button 1 (if door is open)
-                if door_open and self.sensors.is_button1_pressed():
+                if door_open and pressed(events, "button1"):
                     self.display.display_two_lines("Manual Lock", "Door secured")
                     self.actuators.servo_angle(0)  # Close door/gate
                     self.actuators.buzzer_beep(440, 0.1)  # Confirmation beep
                     door_open = False
                     self.actuators.rgb_off()
-                    
-                    # Wait for button release
-                    while self.sensors.is_button1_pressed():
-                        time.sleep(0.01)
-                    
-                    time.sleep(1)
+                    clock.sleep(1)
                     self.display.display_two_lines("RFID Access", "Scan your card")
                 
                 # Button 2 can add a temporary access card
-                if self.sensors.is_button2_pressed():
+                if pressed(events, "button2"):
                     self.display.display_two_lines("Add New Card", "Scan card now")
                     self.actuators.rgb_blue()
                     
-                    # Wait for button release
-                    while self.sensors.is_button2_pressed():
-                        time.sleep(0.01)
-                    
                     # Wait for a new card (with 10 second timeout)
                     new_card = self.rfid.wait_for_card(timeout=10)
                     
@@ -203,12 +204,12 @@ class SmartHomeController:
                         self.actuators.rgb_red()
                         self.actuators.buzzer_beep(220, 0.3)
                     
-                    time.sleep(2)
+                    clock.sleep(2)
                     self.actuators.rgb_off()
                     self.display.display_two_lines("RFID Access", "Scan your card")
                 
                 # Standby state - slight delay to prevent tight loop
-                time.sleep(0.1)
+                clock.sleep(0.1)
                 
         except KeyboardInterrupt:
             # Clean up on exit
@@ -233,7 +234,7 @@ class SmartHomeController:
                     self.actuators.led_off()
                     self.actuators.rgb_green()
                     self.display.display_two_lines("Air Quality", "Normal")
-                time.sleep(0.2)
+                clock.sleep(0.2)
         except KeyboardInterrupt:
             self.actuators.led_off()
             self.actuators.buzzer_off()
@@ -251,13 +252,13 @@ class SmartHomeController:
                 for angle in range(0, 181, 10):
                     self.actuators.servo_angle(angle)
                     self.display.display_two_lines("Servo Test", f"Angle: {angle}")
-                    time.sleep(0.1)
+                    clock.sleep(0.1)
                 
                 # Sweep from 180 to 0 degrees
                 for angle in range(180, -1, -10):
                     self.actuators.servo_angle(angle)
                     self.display.display_two_lines("Servo Test", f"Angle: {angle}")
-                    time.sleep(0.1)
+                    clock.sleep(0.1)
         except KeyboardInterrupt:
             self.actuators.servo_angle(90)  # Return to middle position
             print("Servo test demo stopped")
@@ -271,8 +272,8 @@ class SmartHomeController:
         
         try:
             while True:
-                # Check if button 1 is pressed
-                if self.sensors.is_button1_pressed():
+                # Toggle on each press of button 1
+                if pressed(self.sensors.drain_events(), "button1"):
                     led_state = not led_state
                     if led_state:
                         self.actuators.led_on()
@@ -280,11 +281,8 @@ class SmartHomeController:
                     else:
                         self.actuators.led_off()
                         self.display.display_two_lines("LED Control", "LED: OFF")
-                    # Wait for button release
-                    while self.sensors.is_button1_pressed():
-                        time.sleep(0.01)
                 
-                time.sleep(0.1)
+                clock.sleep(0.1)
         except KeyboardInterrupt:
             self.actuators.led_off()
             print("Button LED control demo stopped")
@@ -319,12 +317,12 @@ class SmartHomeController:
                             self.display.display_two_lines("System Disarmed", name)
                             alarm_triggered = False  # Reset alarm state when disarmed
                         
-                        time.sleep(2)
+                        clock.sleep(2)
                     else:
                         self.actuators.rgb_red()
                         self.actuators.buzzer_beep(220, 0.5)
                         self.display.display_two_lines("Access Denied", "Unknown Card")
-                        time.sleep(1)
+                        clock.sleep(1)
                 
                 # If armed, check sensors for security events
                 if armed:
@@ -350,16 +348,13 @@ class SmartHomeController:
                     self.actuators.rgb_off()
                 
                 # Button override to stop alarm
-                if alarm_triggered and self.sensors.is_button1_pressed():
+                if pressed(self.sensors.drain_events(), "button1") and alarm_triggered:
                     alarm_triggered = False
                     self.actuators.buzzer_off()
                     self.display.display_two_lines("Alarm Silenced", "System still armed")
                     self.actuators.rgb_green()
-                    # Wait for button release
-                    while self.sensors.is_button1_pressed():
-                        time.sleep(0.01)
                 
-                time.sleep(0.1)
+                clock.sleep(0.1)
         except KeyboardInterrupt:
             self.actuators.rgb_off()
             self.actuators.buzzer_off()
@@ -392,7 +387,7 @@ class SmartHomeController:
                     f"Bright: {brightness:.0f}%"
                 )
                 
-                time.sleep(10)  # Update every 10 seconds
+                clock.sleep(10)  # Update every 10 seconds
                 
         except KeyboardInterrupt:
             self.light.lights_off()
@@ -407,7 +402,7 @@ class SmartHomeController:
         self.light.simulate_sunrise(duration_minutes=1)
         
         self.display.display_two_lines("Sunrise", "Complete")
-        time.sleep(2)
+        clock.sleep(2)
 
     def coffee_tracker_demo(self):
         """Demo function for the coffee habit tracker"""
@@ -422,12 +417,12 @@ class SmartHomeController:
         try:
             # Initial display
             self.actuators.rgb_blue(20)  # Dim blue to show system is ready
-            time.sleep(1)
+            clock.sleep(1)
             self.actuators.rgb_off()
             
             while True:
-                # Check if coffee button is pressed (active low)
-                if self.sensors.is_button1_pressed() and not coffee.brewing:
+                # Brew on each press of the coffee button
+                if pressed(self.sensors.drain_events(), "button1") and not coffee.brewing:
                     # Check if coffee is allowed at this hour
                     if coffee.check_time_allowed():
                         # Update display
@@ -438,11 +433,11 @@ class SmartHomeController:
                         
                         # Update display with count
                         self.display.display_two_lines("Coffee Ready!", f"Count today: {coffee.coffee_count}")
-                        time.sleep(2)
+                        clock.sleep(2)
                         self.display.display_two_lines("Coffee Tracker", "Press left button")
                     else:
                         # Coffee denied due to late hour
-                        current_time = time.localtime()
+                        current_time = clock.localtime()
                         hour = current_time[3]
                         minute = current_time[4]
                         time_str = f"{hour:02d}:{minute:02d}"
@@ -452,11 +447,11 @@ class SmartHomeController:
                         
                         # More detailed message
                         self.display.display_two_lines("No coffee after", "5 PM for sleep")
-                        time.sleep(2)
+                        clock.sleep(2)
                         self.display.display_two_lines("Coffee Tracker", "Press left button")
                 
                 # Small delay to prevent tight loop
-                time.sleep(0.1)
+                clock.sleep(0.1)
                     
         except KeyboardInterrupt:
             # Clean up
@@ -479,19 +474,19 @@ class SmartHomeController:
                 self.display.display_two_lines("Door Test", "Opening door")
                 self.actuators.servo_angle(180)
                 print(f"Door opened ({count})")
-                time.sleep(1)
+                clock.sleep(1)
                 
                 # Close the door (0 degrees)
                 self.display.display_two_lines("Door Test", "Closing door")
                 self.actuators.servo_angle(0)
                 print(f"Door closed ({count})")
-                time.sleep(1)
+                clock.sleep(1)
                 
                 # Middle position (90 degrees)
                 self.display.display_two_lines("Door Test", "Middle position")
                 self.actuators.servo_angle(90)
                 print(f"Door middle ({count})")
-                time.sleep(1)
+                clock.sleep(1)
                 
                 count += 1
                 
@@ -512,25 +507,25 @@ class SmartHomeController:
             self.display.display_two_lines("Window Test", "Closing window")
             self.actuators.window_close()
             print("Window closed")
-            time.sleep(2)
+            clock.sleep(2)
             
             # Open window partially (30%)
             self.display.display_two_lines("Window Test", "Ventilation 30%")
             self.actuators.window_open(30)
             print("Window at 30%")
-            time.sleep(2)
+            clock.sleep(2)
             
             # Open window halfway (50%)
             self.display.display_two_lines("Window Test", "Opening 50%")
             self.actuators.window_open(50)
             print("Window at 50%")
-            time.sleep(2)
+            clock.sleep(2)
             
             # Open window fully (100%)
             self.display.display_two_lines("Window Test", "Opening 100%")
             self.actuators.window_open(100)
             print("Window fully open")
-            time.sleep(2)
+            clock.sleep(2)
             
             # Test temperature-based control
             self.display.display_two_lines("Window Test", "Temp control")
@@ -546,12 +541,12 @@ class SmartHomeController:
             for temp, desc in temp_scenarios:
                 percentage = self.actuators.window_control_by_temperature(temp)
                 self.display.display_two_lines(f"{desc}", f"Temp: {temp}°C ({percentage}%)")
-                time.sleep(2)
+                clock.sleep(2)
             
             # Close window at the end
             self.display.display_two_lines("Window Test", "Test Complete")
             self.actuators.window_close()
-            time.sleep(1)
+            clock.sleep(1)
             
         except KeyboardInterrupt:
             # Return window to closed position when stopping
@@ -586,7 +581,7 @@ class SmartHomeController:
                 )
                 
                 # Wait before next update
-                time.sleep(5)
+                clock.sleep(5)
                 
         except KeyboardInterrupt:
             # Clean up
@@ -0,0 +1,275 @@
+import os
+import json
+import socket
+from clock import ticks_ms, ticks_diff
+
+STATUS_PORT = 80
+MAX_CLIENTS = 6              # Open connections (lwIP has few sockets to spare)
+SNAPSHOT_PERIOD_MS = 500     # State read at most this often
+KEEPALIVE_MS = 15000         # Comment line sent to idle event streams
+REQUEST_TIMEOUT_MS = 5000    # Time a client has to send its request
+MAX_REQUEST = 1024
+MAX_BACKLOG = 4096           # Unsent bytes after which a slow client is dropped
+SEND_CHUNK = 1024            # Bytes written per client per poll
+DASHBOARD_PATH = "sleep_dashboard.html"
+
+EAGAIN = 11                  # Same value on the ESP32 port and Linux
+
+
+def _blocked(e):
+    return e.args and e.args[0] == EAGAIN
+
+
+class Client:
+    """One browser connection: a plain request or an event stream"""
+
+    def __init__(self, sock, now):
+        self.sock = sock
+        self.opened = now
+        self.request = b""
+        self.out = b""             # Bytes waiting to be sent
+        self.file = None           # File being sent after out
+        self.stream = False        # Subscribed to /events
+        self.last_sent = now
+        self.done = False          # Close once everything is sent
+
+
+class StatusServer:
+    """Non-blocking HTTP server for the dashboard
+
+    GET /state answers a JSON snapshot of the assistant, GET /events is a
+    server-sent-events stream that starts with the full snapshot and then
+    only carries the keys that changed, and GET / serves the dashboard
+    page. Nothing ever waits on a socket: poll(), called from the run
+    loop, accepts connections, reads requests and writes at most
+    SEND_CHUNK bytes per client, so a browser cannot hold up the other
+    handlers. The snapshot is taken at most every SNAPSHOT_PERIOD_MS
+    however many browsers are watching, and a client falling more than
+    MAX_BACKLOG bytes behind is dropped (EventSource reconnects by
+    itself).
+    """
+
+    def __init__(self, snapshot, port=STATUS_PORT, max_clients=MAX_CLIENTS, page=DASHBOARD_PATH):
+        """
+        Args:
+            snapshot: Callable returning the state as a dict of JSON values
+            port: TCP port to listen on
+            max_clients: Connections served at once; more get a 503
+            page: File served at /
+        """
+        self.snapshot = snapshot
+        self.port = port
+        self.max_clients = max_clients
+        self.page = page
+        self.sock = None
+        self.clients = []
+        self.state = None          # Last snapshot
+        self.state_ms = None
+        self.published = {}        # Snapshot the event streams have seen
+
+        # Counters
+        self.requests = 0
+        self.events = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    def start(self):
+        """Listen for connections
+        Returns:
+            bool: True if listening
+        """
+        if self.sock is not None:
+            return True
+        try:
+            sock = socket.socket()
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(socket.getaddrinfo("0.0.0.0", self.port)[0][-1])
+            sock.listen(self.max_clients)
+            sock.setblocking(False)
+        except OSError as e:
+            print("Status server error:", e)
+            return False
+        self.sock = sock
+        print(f"Status server on port {self.port}")
+        return True
+
+    def stop(self):
+        """Close the listening socket and every connection"""
+        for client in self.clients:
+            self._close(client)
+        self.clients = []
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def subscribers(self):
+        """Get the number of open event streams"""
+        return sum(1 for client in self.clients if client.stream)
+
+    def stats(self):
+        """Get the counters
+        Returns:
+            dict: clients, subscribers, requests, events, rejected, dropped
+        """
+        return {"clients": len(self.clients), "subscribers": self.subscribers(),
+                "requests": self.requests, "events": self.events,
+                "rejected": self.rejected, "dropped": self.dropped}
+
+    # ---- Run loop ----
+
+    def poll(self):
+        """Serve whatever is ready without blocking (call from the run loop)"""
+        if self.sock is None:
+            return
+        now = ticks_ms()
+        self._accept(now)
+        if self.subscribers():
+            self._publish(now)
+        for client in self.clients:
+            if not client.done:
+                self._read(client, now)
+            if client.stream and not client.out and \
+                    ticks_diff(now, client.last_sent) >= KEEPALIVE_MS:
+                client.out = b":\n\n"
+            self._write(client, now)
+        if any(client.sock is None for client in self.clients):
+            self.clients = [client for client in self.clients if client.sock is not None]
+
+    def _accept(self, now):
+        while True:
+            try:
+                sock, addr = self.sock.accept()
+            except OSError:
+                return             # Nobody waiting
+            sock.setblocking(False)
+            client = Client(sock, now)
+            if len(self.clients) >= self.max_clients:
+                self.rejected += 1
+                self._respond(client, 503, "text/plain", b"Busy\n")
+            self.clients.append(client)
+
+    def _read(self, client, now):
+        try:
+            data = client.sock.recv(MAX_REQUEST)
+        except OSError as e:
+            if not _blocked(e):
+                self._close(client)
+            elif not client.stream and ticks_diff(now, client.opened) > REQUEST_TIMEOUT_MS:
+                self._close(client)
+            return
+        if not data:
+            self._close(client)
+            return
+        if client.stream:
+            return                 # Nothing more is expected from a stream
+        client.request += data
+        end = client.request.find(b"\r\n\r\n")
+        if end < 0:
+            if len(client.request) > MAX_REQUEST:
+                self._respond(client, 400, "text/plain", b"Bad request\n")
+            return
+        line = client.request[:client.request.find(b"\r\n")].split()
+        client.request = b""
+        if len(line) < 2 or line[0] != b"GET":
+            self._respond(client, 405, "text/plain", b"GET only\n")
+            return
+        self.requests += 1
+        path = line[1].split(b"?")[0]
+        if path == b"/state":
+            body = json.dumps(self._state(now)).encode("utf-8")
+            self._respond(client, 200, "application/json", body)
+        elif path == b"/events":
+            # Bring the other streams up to date first, so that the changes
+            # published next apply to this client's full state as well
+            self._publish(now)
+            client.out = b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n" \
+                         b"Cache-Control: no-cache\r\nAccess-Control-Allow-Origin: *\r\n\r\n" + \
+                         self._event(self.published)
+            client.stream = True
+        elif path in (b"/", b"/dashboard") and self._page_size() is not None:
+            self._respond(client, 200, "text/html", b"", self._page_size())
+            client.file = open(self.page, "rb")
+        else:
+            self._respond(client, 404, "text/plain", b"Not found\n")
+
+    def _write(self, client, now):
+        if client.sock is None:
+            return
+        if not client.out and client.file is not None:
+            client.out = client.file.read(SEND_CHUNK)
+            if not client.out:
+                client.file.close()
+                client.file = None
+        if not client.out:
+            if client.done:
+                self._close(client)
+            return
+        try:
+            sent = client.sock.send(client.out[:SEND_CHUNK])
+        except OSError as e:
+            if not _blocked(e):
+                self._close(client)
+            return
+        client.out = client.out[sent:]
+        client.last_sent = now
+
+    def _respond(self, client, status, content_type, body, length=None):
+        # Queue a complete response; the connection closes once it is sent
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                  405: "Method Not Allowed", 503: "Service Unavailable"}[status]
+        head = f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n" \
+               f"Content-Length: {len(body) if length is None else length}\r\n" \
+               "Access-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n"
+        client.out = head.encode("utf-8") + body
+        client.done = True
+
+    def _close(self, client):
+        if client.file is not None:
+            client.file.close()
+            client.file = None
+        if client.sock is not None:
+            try:
+                client.sock.close()
+            except OSError:
+                pass
+            client.sock = None
+
+    # ---- State ----
+
+    def _state(self, now):
+        if self.state is None or ticks_diff(now, self.state_ms) >= SNAPSHOT_PERIOD_MS:
+            self.state = self.snapshot()
+            self.state_ms = now
+        return self.state
+
+    def _event(self, changes):
+        return b"data: " + json.dumps(changes).encode("utf-8") + b"\n\n"
+
+    def _publish(self, now):
+        # Send the keys that changed since the last event to every stream
+        state = self._state(now)
+        if state is self.published:
+            return
+        changes = {}
+        for key, value in state.items():
+            if self.published.get(key) != value:
+                changes[key] = value
+        self.published = state
+        if not changes:
+            return
+        event = self._event(changes)
+        self.events += 1
+        for client in self.clients:
+            if not client.stream or client.sock is None:
+                continue
+            if len(client.out) + len(event) > MAX_BACKLOG:
+                self.dropped += 1
+                self._close(client)
+            else:
+                client.out += event
+
+    def _page_size(self):
+        try:
+            return os.stat(self.page)[6]
+        except OSError:
+            return None
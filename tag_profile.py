@@ -0,0 +1,72 @@
+import struct
+from binascii import crc32
+from card_index import encode_name, decode_name
+from schedule import SLEEP_TIME, WAKE_TIME, COFFEE_CUTOFF_HARD
+
+# Where the profile lives on a MIFARE Classic 1K tag: the first two data
+# blocks of sector 1 (sector 0 starts with the read-only manufacturer
+# block), read and written under one key A authentication
+PROFILE_BLOCK = 4
+PROFILE_BLOCKS = 2
+BLOCK_SIZE = 16
+PROFILE_KEY = b"\xff\xff\xff\xff\xff\xff"   # Key A as delivered
+
+# Layout: magic, version, name length, sleep/wake/coffee cutoff in
+# minutes since midnight, name, CRC32 of everything before it
+PROFILE_MAGIC = b"SP"
+PROFILE_VERSION = 1
+PROFILE_FORMAT = "<2sBBHHH18s"
+PROFILE_SIZE = PROFILE_BLOCKS * BLOCK_SIZE
+NAME_MAX = 18
+
+
+class TagProfile:
+    """Owner settings stored on the card itself
+
+    Attributes:
+        name: Owner name (cut to NAME_MAX bytes on a character boundary)
+        sleep_time: Bedtime in seconds since midnight
+        wake_time: Wake-up time in seconds since midnight
+        coffee_cutoff: No coffee from this time (seconds since midnight)
+            until wake time
+    """
+
+    def __init__(self, name, sleep_time=SLEEP_TIME, wake_time=WAKE_TIME,
+                 coffee_cutoff=COFFEE_CUTOFF_HARD):
+        self.name = name
+        self.sleep_time = sleep_time
+        self.wake_time = wake_time
+        self.coffee_cutoff = coffee_cutoff
+
+    def __repr__(self):
+        return (f"TagProfile({self.name}, sleep {self.sleep_time // 60}min, "
+                f"wake {self.wake_time // 60}min, coffee {self.coffee_cutoff // 60}min)")
+
+    def encode(self):
+        """Get the PROFILE_SIZE bytes written to the tag"""
+        name = encode_name(self.name, NAME_MAX)
+        data = struct.pack(PROFILE_FORMAT, PROFILE_MAGIC, PROFILE_VERSION, len(name),
+                           self.sleep_time // 60, self.wake_time // 60,
+                           self.coffee_cutoff // 60, name)
+        return data + struct.pack("<I", crc32(data))
+
+    @staticmethod
+    def decode(data):
+        """Get the profile stored in the bytes read from the tag
+        Returns:
+            TagProfile, or None for a blank, foreign or damaged tag
+        """
+        if len(data) < PROFILE_SIZE:
+            return None
+        data = bytes(data[:PROFILE_SIZE])
+        body = data[:-4]
+        if struct.unpack("<I", data[-4:])[0] != crc32(body):
+            return None
+        magic, version, length, sleep, wake, coffee, name = struct.unpack(PROFILE_FORMAT, body)
+        if magic != PROFILE_MAGIC or version != PROFILE_VERSION or length > NAME_MAX:
+            return None
+        try:
+            name = decode_name(name[:length], strict=True)
+        except UnicodeError:
+            return None
+        return TagProfile(name, sleep * 60, wake * 60, coffee * 60)
@@ -0,0 +1,125 @@
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio  # CPython host
+from clock import ticks_ms, ticks_diff, ticks_add
+
+
+class PeriodicTask:
+    """A handler called every period_ms, with start latency tracking"""
+
+    def __init__(self, name, handler, period_ms):
+        self.name = name
+        self.handler = handler
+        self.period_ms = period_ms
+
+        # Statistics
+        self.runs = 0
+        self.errors = 0
+        self.last_latency_ms = 0   # How late the last run started
+        self.max_latency_ms = 0
+        self.total_latency_ms = 0
+        self.max_run_ms = 0        # Longest time spent inside the handler
+
+    def run_once(self, due):
+        """Call the handler once and record how late it started
+        Args:
+            due: Tick (ms) at which this run was scheduled
+        Returns:
+            int: Tick (ms) at which the handler returned
+        """
+        start = ticks_ms()
+        latency = max(0, ticks_diff(start, due))
+        self.last_latency_ms = latency
+        self.total_latency_ms += latency
+        if latency > self.max_latency_ms:
+            self.max_latency_ms = latency
+
+        try:
+            self.handler()
+        except Exception as e:
+            self.errors += 1
+            print(f"Task {self.name} error:", e)
+
+        end = ticks_ms()
+        run_ms = ticks_diff(end, start)
+        if run_ms > self.max_run_ms:
+            self.max_run_ms = run_ms
+        self.runs += 1
+        return end
+
+    def average_latency_ms(self):
+        """Get the mean start latency
+        Returns: Latency in milliseconds
+        """
+        if self.runs == 0:
+            return 0
+        return self.total_latency_ms / self.runs
+
+    async def loop(self):
+        """Run the handler forever at its own period"""
+        due = ticks_ms()
+        while True:
+            end = self.run_once(due)
+            due = ticks_add(due, self.period_ms)
+            delay = ticks_diff(due, end)
+            if delay < 0:
+                # Overran the period - skip the missed runs instead of bursting
+                due = end
+                delay = 0
+            await asyncio.sleep(delay / 1000)
+
+
+class TaskScheduler:
+    """Cooperative runtime: every periodic handler is its own task"""
+
+    def __init__(self):
+        self.tasks = []
+
+    def add(self, name, handler, period_ms):
+        """Register a periodic handler
+        Args:
+            name: Task name used in reports
+            handler: Callable without arguments
+            period_ms: Time between runs in milliseconds
+        Returns: The created PeriodicTask
+        """
+        task = PeriodicTask(name, handler, period_ms)
+        self.tasks.append(task)
+        return task
+
+    def get_task(self, name):
+        """Get a registered task by name, or None"""
+        for task in self.tasks:
+            if task.name == name:
+                return task
+        return None
+
+    def worst_case_latency_ms(self, name):
+        """Get the reaction latency bound of a task
+        An event is seen at the latest one period later, plus the time every
+        other handler may hold the CPU before this task gets its turn.
+        Args:
+            name: Task name
+        Returns:
+            tuple: (observed, bound) in milliseconds
+        """
+        task = self.get_task(name)
+        if task is None:
+            return (0, 0)
+        others = sum(t.max_run_ms for t in self.tasks if t is not task)
+        observed = task.period_ms + task.max_latency_ms
+        bound = task.period_ms + others + task.max_run_ms
+        return (observed, bound)
+
+    def report(self):
+        """Print per-task latency statistics"""
+        print("Task latency (ms): runs avg max run worst/bound")
+        for task in self.tasks:
+            observed, bound = self.worst_case_latency_ms(task.name)
+            print(f"  {task.name}: {task.runs} {task.average_latency_ms():.1f} "
+                  f"{task.max_latency_ms} {task.max_run_ms} {observed}/{bound}")
+
+    async def run(self):
+        """Run all registered handlers until cancelled"""
+        await asyncio.gather(*[task.loop() for task in self.tasks])
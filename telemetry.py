@@ -0,0 +1,330 @@
+import os
+import json
+import clock
+from clock import ticks_ms, ticks_diff, ticks_add
+
+TELEMETRY_ENDPOINT = "telemetry"
+RING_SIZE = 64               # Samples held in RAM
+BATCH_SIZE = 32              # Flush once this many samples are queued...
+BATCH_AGE_MS = 60000         # ...or the oldest one is this old
+SPILL_PATH = "telemetry.log"
+SPILL_MAX_BYTES = 65536      # Flash kept for samples taken while offline
+RETRY_MIN_MS = 2000          # Wait after a failed upload, doubling...
+RETRY_MAX_MS = 300000        # ...up to this
+REPLAY_BATCHES = 4           # Spilled batches pipelined per replay
+
+
+def _exists(path):
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+
+class SampleRing:
+    """Bounded FIFO of samples in lists allocated up front"""
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.times = [0] * size
+        self.kinds = [None] * size
+        self.data = [None] * size
+        self.ticks = [0] * size    # ticks_ms() when the sample was queued
+        self.head = 0              # Oldest sample
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, time, kind, data):
+        """Queue a sample
+        Returns:
+            bool: False if the ring is full (nothing queued)
+        """
+        if self.count == self.size:
+            return False
+        i = (self.head + self.count) % self.size
+        self.times[i] = time
+        self.kinds[i] = kind
+        self.data[i] = data
+        self.ticks[i] = ticks_ms()
+        self.count += 1
+        return True
+
+    def oldest_ticks(self):
+        return self.ticks[self.head]
+
+    def records(self, count=None):
+        """Get the oldest samples as dicts (time in "t", kind in "type")"""
+        if count is None or count > self.count:
+            count = self.count
+        records = []
+        for n in range(count):
+            i = (self.head + n) % self.size
+            record = {"t": self.times[i], "type": self.kinds[i]}
+            record.update(self.data[i])
+            records.append(record)
+        return records
+
+    def drop(self, count):
+        """Remove the oldest samples"""
+        count = min(count, self.count)
+        for n in range(count):
+            i = (self.head + n) % self.size
+            self.data[i] = None
+        self.head = (self.head + count) % self.size
+        self.count -= count
+
+
+class Telemetry:
+    """Batched telemetry upload with an on-flash spill queue
+
+    add() only queues a sample in a SampleRing. poll(), called from the
+    run loop, uploads the ring as one POST once BATCH_SIZE samples are
+    queued or the oldest is BATCH_AGE_MS old, instead of one request per
+    sample. When the upload fails (WiFi down, server error) the batch is
+    appended to an append-only file on flash, one JSON record per line,
+    and uploads are retried with a delay doubling from RETRY_MIN_MS to
+    RETRY_MAX_MS. Once they go through again the file is replayed oldest
+    first, one batch per poll, before anything newer is sent, and
+    removed when it has all been sent. Replay sends up to REPLAY_BATCHES
+    batches per poll, pipelined on one connection.
+
+    Samples are lost only when both the ring and the spill file are full
+    (counted in dropped). A reset during replay sends the replayed part
+    of the file again: delivery is at least once.
+    """
+
+    def __init__(self, web, endpoint=TELEMETRY_ENDPOINT, ring_size=RING_SIZE,
+                 batch_size=BATCH_SIZE, batch_age_ms=BATCH_AGE_MS,
+                 spill_path=None, spill_max_bytes=SPILL_MAX_BYTES):
+        self.web = web
+        self.endpoint = endpoint
+        self.ring = SampleRing(ring_size)
+        self.batch_size = batch_size
+        self.batch_age_ms = batch_age_ms
+        self.spill_path = SPILL_PATH if spill_path is None else spill_path
+        self.spill_max_bytes = spill_max_bytes
+        self.spill_size = None     # Bytes in the spill file, scanned on first use
+        self.spill_offset = 0      # Start of the records not replayed yet
+        self.spilled = 0           # Records in the file not replayed yet
+        self.retry_ms = RETRY_MIN_MS
+        self.retry_at = None       # Tick before which no upload is tried
+
+        # Counters
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+
+    # ---- Queueing ----
+
+    def add(self, kind, data, time=None):
+        """Queue a sample
+        Args:
+            kind: Sample type (e.g. "env", "presence", "coffee", "mode")
+            data: Dict of the sample's values (JSON types)
+            time: clock.time() of the sample (default now)
+        """
+        if time is None:
+            time = clock.time()
+        if self.ring.push(time, kind, data):
+            return
+        # Full: the uploads are failing, move the ring to flash
+        self._spill_ring()
+        if not self.ring.push(time, kind, data):
+            self.dropped += 1
+
+    def depth(self):
+        """Get the number of samples waiting (in RAM and on flash)"""
+        self._load_spill()
+        return len(self.ring) + self.spilled
+
+    def stats(self):
+        """Get the counters
+        Returns:
+            dict: queued, spilled, sent, batches, failures, dropped
+        """
+        self._load_spill()
+        return {"queued": len(self.ring), "spilled": self.spilled, "sent": self.sent,
+                "batches": self.batches, "failures": self.failures, "dropped": self.dropped}
+
+    # ---- Uploading ----
+
+    def due(self):
+        """Check if poll() would try an upload now"""
+        if self.retry_at is not None and ticks_diff(ticks_ms(), self.retry_at) < 0:
+            return False
+        if self.spilled:
+            return True
+        ring = self.ring
+        if not ring.count:
+            return False
+        return ring.count >= self.batch_size or \
+            ticks_diff(ticks_ms(), ring.oldest_ticks()) >= self.batch_age_ms
+
+    def next_due_ms(self):
+        """Get the time until poll() has something to do
+        Returns:
+            int: Milliseconds, or None while nothing is queued
+        """
+        self._load_spill()
+        now = ticks_ms()
+        if self.spilled:
+            due = 0
+        elif self.ring.count:
+            due = self.batch_age_ms - ticks_diff(now, self.ring.oldest_ticks())
+        else:
+            return None
+        if self.retry_at is not None:
+            due = max(due, ticks_diff(self.retry_at, now))
+        return max(0, due)
+
+    def poll(self):
+        """Upload one batch if it is due
+        Returns:
+            int: Samples uploaded
+        """
+        self._load_spill()
+        if not self.due():
+            return 0
+        if self.spilled:
+            # Older samples first: whatever is in RAM goes behind them
+            if self.ring.count >= self.batch_size:
+                self._spill_ring()
+            return self._replay()
+        return self._send_ring()
+
+    def flush(self):
+        """Upload everything queued now, ignoring the triggers and the retry delay
+        Returns:
+            bool: True if nothing is left waiting
+        """
+        self.retry_at = None
+        while self.depth():
+            sent = self._replay() if self.spilled else self._send_ring()
+            if not sent:
+                return False
+        return True
+
+    def _send_ring(self):
+        records = self.ring.records(self.batch_size)
+        if not self._upload(records):
+            self._spill_ring()
+            return 0
+        self.ring.drop(len(records))
+        return len(records)
+
+    def _upload(self, records):
+        if self.web.post_batch(records, self.endpoint):
+            self.sent += len(records)
+            self.batches += 1
+            self.retry_ms = RETRY_MIN_MS
+            self.retry_at = None
+            return True
+        self.failures += 1
+        self.retry_at = ticks_add(ticks_ms(), self.retry_ms)
+        self.retry_ms = min(self.retry_ms * 2, RETRY_MAX_MS)
+        return False
+
+    # ---- Spill file ----
+
+    def _load_spill(self):
+        if self.spill_size is not None:
+            return
+        self.spill_size = 0
+        self.spilled = 0
+        if not _exists(self.spill_path):
+            return
+        with open(self.spill_path, "rb") as f:
+            for line in f:
+                self.spill_size += len(line)
+                if line.endswith(b"\n"):
+                    self.spilled += 1
+        if self.spilled:
+            print(f"Telemetry: {self.spilled} samples waiting in {self.spill_path}")
+
+    def _spill_ring(self):
+        # Append the ring to the spill file, dropping what does not fit
+        self._load_spill()
+        ring = self.ring
+        if not ring.count:
+            return
+        records = ring.records()
+        ring.drop(len(records))
+        lines = []
+        size = self.spill_size
+        for record in records:
+            line = json.dumps(record) + "\n"
+            if size + len(line) > self.spill_max_bytes:
+                self.dropped += 1
+                continue
+            lines.append(line)
+            size += len(line)
+        if not lines:
+            return
+        with open(self.spill_path, "a") as f:
+            for line in lines:
+                f.write(line)
+        self.spill_size = size
+        self.spilled += len(lines)
+
+    def _replay(self):
+        # Upload the next batches from the spill file
+        batches = []
+        ends = []                  # File offset after each batch
+        offset = self.spill_offset
+        with open(self.spill_path, "rb") as f:
+            f.seek(offset)
+            records = []
+            while len(batches) < REPLAY_BATCHES:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break          # End of file, or a line torn by a reset
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    self.spilled -= 1
+                    self.dropped += 1
+                if len(records) == self.batch_size:
+                    batches.append(records)
+                    ends.append(offset)
+                    records = []
+            if records or not batches:
+                batches.append(records)
+                ends.append(offset)
+        sent = 0
+        if batches[0]:
+            accepted = self._upload_batches(batches)
+            if not accepted:
+                return 0
+            batches = batches[:accepted]
+            offset = ends[accepted - 1]
+            sent = sum(len(records) for records in batches)
+        self.spilled -= sent
+        self.spill_offset = offset
+        if self.spilled <= 0 or offset >= self.spill_size:
+            os.remove(self.spill_path)
+            self.spill_size = 0
+            self.spill_offset = 0
+            self.spilled = 0
+        return sent
+
+    def _upload_batches(self, batches):
+        # Like _upload() for several batches; returns how many went through
+        if len(batches) == 1:
+            return 1 if self._upload(batches[0]) else 0
+        accepted = self.web.post_batches(batches, self.endpoint)
+        for records in batches[:accepted]:
+            self.sent += len(records)
+            self.batches += 1
+        if accepted == len(batches):
+            self.retry_ms = RETRY_MIN_MS
+            self.retry_at = None
+        else:
+            self.failures += 1
+            self.retry_at = ticks_add(ticks_ms(), self.retry_ms)
+            self.retry_ms = min(self.retry_ms * 2, RETRY_MAX_MS)
+        return accepted
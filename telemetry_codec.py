@@ -0,0 +1,228 @@
+import gc
+import json
+import struct
+import clock
+
+# Batch layout: magic, version, record count, time of the first record
+# (whole seconds), then per record its type id, the time since the
+# previous record as a zigzag varint, and the type's fields packed with
+# struct. Types missing from SCHEMA are sent as UNKNOWN with a JSON body.
+MAGIC = b"ST"
+VERSION = 1
+HEADER_FORMAT = "<2sBHI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+BUFFER_SIZE = 1024           # Grows when a batch does not fit
+UNKNOWN = 0xFF
+MISSING = 2                  # Value of an optional flag left out of the dict
+
+# Type name -> (id, struct format, fields); a field is (name, scale), with
+# scale None for a flag and "optional" for a flag that may be missing
+SCHEMA = {
+    "env": (1, "<hH", (("temperature", 10), ("humidity", 10))),
+    "presence": (2, "<BB", (("present", None), ("phones", 1))),
+    "coffee": (3, "<BH", (("brewed", None), ("count", 1))),
+    "mode": (4, "<BB", (("night", None), ("phone", "optional"))),
+}
+_BY_ID = {entry[0]: (name,) + entry[1:] for name, entry in SCHEMA.items()}
+_SIZES = {name: struct.calcsize(entry[1]) for name, entry in SCHEMA.items()}
+
+
+class Encoder:
+    """Packs telemetry records into one preallocated buffer
+
+    Records are the dicts Telemetry uploads: "t" (clock.time()), "type"
+    and the type's values. encode() reuses the same bytearray for every
+    batch instead of building a JSON string per upload, so the only
+    allocation is the memoryview it returns.
+    """
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.buf = bytearray(size)
+
+    def encode(self, records):
+        """Encode a batch
+        Args:
+            records: List of record dicts, oldest first
+        Returns:
+            memoryview: The encoded batch (valid until the next encode())
+        """
+        base = int(records[0]["t"]) if records else 0
+        struct.pack_into(HEADER_FORMAT, self.buf, 0, MAGIC, VERSION, len(records), base)
+        pos = HEADER_SIZE
+        last = base
+        for record in records:
+            t = int(record["t"])
+            entry = SCHEMA.get(record["type"])
+            body = None
+            if entry is None:
+                body = json.dumps(record).encode("utf-8")
+                size = len(body) + 5
+            else:
+                size = _SIZES[record["type"]]
+            self._reserve(pos + size + 6)
+            buf = self.buf
+            buf[pos] = UNKNOWN if entry is None else entry[0]
+            pos = self._varint(pos + 1, _zigzag(t - last))
+            last = t
+            if entry is None:
+                pos = self._varint(pos, len(body))
+                buf[pos:pos + len(body)] = body
+                pos += len(body)
+                continue
+            values = []
+            for name, scale in entry[2]:
+                value = record.get(name)
+                if scale is None:
+                    values.append(1 if value else 0)
+                elif scale == "optional":
+                    values.append(MISSING if value is None else 1 if value else 0)
+                else:
+                    values.append(int(round(value * scale)))
+            struct.pack_into(entry[1], buf, pos, *values)
+            pos += size
+        return memoryview(self.buf)[:pos]
+
+    def _reserve(self, size):
+        if size > len(self.buf):
+            self.buf.extend(bytearray(max(size, len(self.buf)) - len(self.buf) + BUFFER_SIZE))
+
+    def _varint(self, pos, value):
+        buf = self.buf
+        while value >= 0x80:
+            buf[pos] = (value & 0x7F) | 0x80
+            value >>= 7
+            pos += 1
+        buf[pos] = value
+        return pos + 1
+
+
+def _zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def decode(data):
+    """Expand an encoded batch back into record dicts (runs on the server)
+    Returns:
+        list: Record dicts with "t", "type" and the values; scaled values
+              come back as floats
+    Raises:
+        ValueError: For data that is not a batch of a known version
+    """
+    data = bytes(data)
+    if len(data) < HEADER_SIZE:
+        raise ValueError("Truncated telemetry batch")
+    magic, version, count, t = struct.unpack_from(HEADER_FORMAT, data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a telemetry batch (version %d)" % version)
+    pos = HEADER_SIZE
+    records = []
+    for _ in range(count):
+        type_id = data[pos]
+        delta, pos = _read_varint(data, pos + 1)
+        t += (delta >> 1) ^ -(delta & 1)
+        if type_id == UNKNOWN:
+            length, pos = _read_varint(data, pos)
+            record = json.loads(data[pos:pos + length])
+            record["t"] = t
+            pos += length
+            records.append(record)
+            continue
+        if type_id not in _BY_ID:
+            raise ValueError("Unknown record type %d" % type_id)
+        name, fmt, fields = _BY_ID[type_id]
+        values = struct.unpack_from(fmt, data, pos)
+        pos += _SIZES[name]
+        record = {"t": t, "type": name}
+        for (field, scale), value in zip(fields, values):
+            if scale is None:
+                record[field] = bool(value)
+            elif scale == "optional":
+                if value != MISSING:
+                    record[field] = bool(value)
+            elif scale == 1:
+                record[field] = value
+            else:
+                record[field] = value / scale
+        records.append(record)
+    return records
+
+
+BENCH_RECORDS = 32
+
+
+def _heap_used(fn):
+    """Heap taken by one call of fn: bytes allocated on the board
+    (gc.mem_alloc), peak traced bytes on the host (tracemalloc)"""
+    if hasattr(gc, "mem_alloc"):
+        gc.collect()
+        before = gc.mem_alloc()
+        fn()
+        return gc.mem_alloc() - before
+    import tracemalloc
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def codec_benchmark(records=BENCH_RECORDS, rounds=100):
+    """Compare batch size, encode time and heap use with the JSON upload"""
+    start = 1700000000
+    batch = []
+    for i in range(records):
+        t = start + i * 37
+        kind = ("env", "env", "presence", "coffee", "mode", "env")[i % 6]
+        if kind == "env":
+            data = {"temperature": 21 + i % 3, "humidity": 40 + i % 7}
+        elif kind == "presence":
+            data = {"present": i % 2 == 0, "phones": i % 2}
+        elif kind == "coffee":
+            data = {"brewed": True, "count": i // 6 + 1}
+        else:
+            data = {"night": i % 4 == 0, "phone": True} if i % 4 == 0 else {"night": False}
+        record = {"t": t, "type": kind}
+        record.update(data)
+        batch.append(record)
+
+    encoder = Encoder()
+    binary = bytes(encoder.encode(batch))
+    text = json.dumps({"samples": batch})
+    assert decode(binary) == [dict(r, **{k: float(v) for k, v in r.items()
+                                          if r["type"] == "env" and k in ("temperature", "humidity")})
+                              for r in batch]
+    begin = clock.ticks_us()
+    for _ in range(rounds):
+        json.dumps({"samples": batch})
+    json_us = clock.ticks_diff(clock.ticks_us(), begin) / (rounds * records)
+    begin = clock.ticks_us()
+    for _ in range(rounds):
+        encoder.encode(batch)
+    binary_us = clock.ticks_diff(clock.ticks_us(), begin) / (rounds * records)
+    begin = clock.ticks_us()
+    for _ in range(rounds):
+        decode(binary)
+    decode_us = clock.ticks_diff(clock.ticks_us(), begin) / (rounds * records)
+    json_heap = _heap_used(lambda: json.dumps({"samples": batch}))
+    binary_heap = _heap_used(lambda: encoder.encode(batch))
+    print(f"Telemetry batch of {records} records: JSON {len(text)} bytes, "
+          f"binary {len(binary)} bytes ({len(binary) * 100 // len(text)}%)")
+    print(f"  encode per record: JSON {json_us:.1f}us, binary {binary_us:.1f}us; "
+          f"decode {decode_us:.1f}us")
+    print(f"  heap per batch encode: JSON {json_heap} bytes, binary {binary_heap} bytes")
+
+
+if __name__ == "__main__":
+    codec_benchmark()
@@ -1,11 +1,28 @@
 import network
-import time
+import machine
+import clock
+import json
 import urequests
+from binascii import hexlify
+from http_client import HttpClient, split_url
+from mqtt_client import MqttClient, MQTT_PORT
+from telemetry import Telemetry
+from telemetry_codec import Encoder
 
 # Default network settings
 DEFAULT_SSID = "Google Pixel 8 Pro"
 DEFAULT_PASSWORD = "Matebook17"
 DEFAULT_SERVER_URL = "http://yourserver.com/api/data"
+JSON_HEADERS = {'Content-Type': 'application/json'}
+BINARY_HEADERS = {'Content-Type': 'application/x-ssa-telemetry'}
+
+# Telemetry payloads: "json", or "binary" for telemetry_codec batches
+# (decode them on the server with telemetry_codec.decode)
+TELEMETRY_ENCODING = "json"
+
+# MQTT transport (see use_mqtt), off while MQTT_BROKER is None
+MQTT_BROKER = None
+MQTT_PREFIX = "ssa"          # Topics: ssa/<device id>/<sample type>, .../online, .../config
 
 class WebManager:
     def __init__(self, ssid=DEFAULT_SSID, password=DEFAULT_PASSWORD):
@@ -14,6 +31,12 @@ class WebManager:
         self.server_url = DEFAULT_SERVER_URL
         self.wlan = network.WLAN(network.STA_IF)
         self.is_connected = False
+        self.http = {}                     # (host, port) -> HttpClient kept open
+        self.telemetry = Telemetry(self)   # Batched sample upload, see record()
+        self.mqtt = None                   # MqttClient replacing it, see use_mqtt()
+        self.encoder = Encoder()           # Binary telemetry, see TELEMETRY_ENCODING
+        self.device_id = hexlify(machine.unique_id()).decode()
+        self.on_config = None              # Callable(dict) for messages on the config topic
     
     def connect(self, timeout=20):
         """Connect to WiFi network
@@ -39,12 +62,12 @@ class WebManager:
             self.wlan.connect(self.ssid, self.password)
             
             # Wait for connection with timeout
-            start_time = time.time()
+            start_time = clock.time()
             while not self.wlan.isconnected():
-                if time.time() - start_time > timeout:
+                if clock.time() - start_time > timeout:
                     print("WiFi connection timeout")
                     return False
-                time.sleep(0.5)
+                clock.sleep(0.5)
             
             self.is_connected = True
             print("Connected to WiFi")
@@ -58,6 +81,7 @@ class WebManager:
     def disconnect(self):
         """Disconnect from WiFi network"""
         if self.wlan.active():
+            self.close_connections()
             self.wlan.disconnect()
             self.is_connected = False
             print("Disconnected from WiFi")
@@ -94,11 +118,7 @@ class WebManager:
         
         try:
             print(f"Sending data to {url}")
-            response = urequests.post(
-                url,
-                json=data,
-                headers={'Content-Type': 'application/json'}
-            )
+            response = self._request("POST", url, data)
             
             if response.status_code == 200:
                 print("Data sent successfully")
@@ -130,7 +150,7 @@ class WebManager:
         
         try:
             print(f"Getting data from {url}")
-            response = urequests.get(url)
+            response = self._request("GET", url)
             
             if response.status_code == 200:
                 data = response.json()
@@ -143,4 +163,177 @@ class WebManager:
                 
         except Exception as e:
             print("Error getting data:", e)
-            return None
\ No newline at end of file
+            return None
+    
+    def post_batch(self, records, endpoint):
+        """Send a batch of telemetry records as one POST
+        Args:
+            records: List of record dicts
+            endpoint: API endpoint appended to the server URL
+        Returns:
+            bool: True if the server accepted the batch
+        """
+        if not self.is_wifi_connected():
+            return False
+        try:
+            body, headers = self._samples_body(records)
+            response = self._send("POST", self.server_url + "/" + endpoint, body, headers)
+            ok = response.status_code == 200
+            if not ok:
+                print(f"Telemetry upload: server error {response.status_code}")
+            response.close()
+            return ok
+        except Exception as e:
+            print("Telemetry upload error:", e)
+            return False
+    
+    def post_batches(self, batches, endpoint):
+        """Send several batches of telemetry records, pipelined on one connection
+        Args:
+            batches: List of lists of record dicts
+            endpoint: API endpoint appended to the server URL
+        Returns:
+            int: Number of leading batches the server accepted
+        """
+        if not self.is_wifi_connected():
+            return 0
+        url = self.server_url + "/" + endpoint
+        try:
+            client, path = self._client(url)
+        except ValueError:
+            # No pipelining over urequests: one POST after the other
+            for n, records in enumerate(batches):
+                if not self.post_batch(records, endpoint):
+                    return n
+            return len(batches)
+        try:
+            for records in batches:
+                client.queue("POST", path, *self._samples_body(records))
+            responses = client.flush()
+        except Exception as e:
+            print("Telemetry upload error:", e)
+            return 0
+        for n, response in enumerate(responses):
+            if response.status_code != 200:
+                print(f"Telemetry upload: server error {response.status_code}")
+                return n
+        return len(responses)
+    
+    def close_connections(self):
+        """Close the kept-open server and broker connections"""
+        for client in self.http.values():
+            client.close()
+        if self.mqtt is not None and self.mqtt.is_connected():
+            self.mqtt.publish(f"{MQTT_PREFIX}/{self.device_id}/online", b"0", retain=True)
+            self.mqtt.disconnect()
+    
+    def http_stats(self):
+        """Get the connection counters summed over all servers
+        Returns:
+            dict: lookups, connects, reconnects, requests, failures
+        """
+        total = {"lookups": 0, "connects": 0, "reconnects": 0, "requests": 0, "failures": 0}
+        for client in self.http.values():
+            for name, value in client.stats().items():
+                total[name] += value
+        return total
+    
+    def _client(self, url):
+        # Get the HttpClient for the URL's server, and the path on it
+        host, port, path = split_url(url)
+        client = self.http.get((host, port))
+        if client is None:
+            client = HttpClient(host, port)
+            self.http[(host, port)] = client
+        return client, path
+    
+    def _request(self, method, url, data=None):
+        body = None if data is None else json.dumps(data)
+        return self._send(method, url, body, JSON_HEADERS if body is not None else None)
+    
+    def _send(self, method, url, body, headers):
+        # Request over the server's kept-open connection; https URLs
+        # still go through urequests
+        try:
+            client, path = self._client(url)
+        except ValueError:
+            if isinstance(body, memoryview):
+                body = bytes(body)
+            return urequests.request(method, url, data=body, headers=headers)
+        return client.request(method, path, body, headers)
+    
+    def _samples_body(self, records):
+        # Body and headers of one telemetry batch upload
+        if TELEMETRY_ENCODING == "binary":
+            return self.encoder.encode(records), BINARY_HEADERS
+        return json.dumps({"samples": records}), JSON_HEADERS
+    
+    def use_mqtt(self, host, port=MQTT_PORT):
+        """Send samples to an MQTT broker instead of batched HTTP POSTs
+        
+        Every sample is published with QoS 1 as the retained last state of
+        MQTT_PREFIX/<device id>/<sample type>; messages published while the
+        broker is out of reach wait in the client's queue. The broker marks
+        the device offline in .../online when the connection is lost, and
+        JSON messages on .../config are passed to on_config.
+        
+        Args:
+            host: Broker host name or address
+            port: Broker port
+        """
+        base = f"{MQTT_PREFIX}/{self.device_id}/"
+        self.mqtt = MqttClient(f"ssa-{self.device_id}", host, port)
+        self.mqtt.set_last_will(base + "online", b"0")
+        self.mqtt.on_connect = lambda: self.mqtt.publish(base + "online", b"1", retain=True)
+        self.mqtt.subscribe(base + "config", self._on_mqtt_config)
+    
+    def _on_mqtt_config(self, topic, payload):
+        try:
+            config = json.loads(payload)
+        except ValueError:
+            config = None
+        if not isinstance(config, dict):
+            print("Bad config message:", payload)
+            return
+        if self.on_config is not None:
+            self.on_config(config)
+    
+    def record(self, kind, data):
+        """Queue a telemetry sample for the next batched upload (or MQTT publish)
+        Args:
+            kind: Sample type (e.g. "env", "presence", "coffee", "mode")
+            data: Dictionary of the sample's values
+        """
+        if self.mqtt is None:
+            self.telemetry.add(kind, data)
+            return
+        record = {"t": clock.time()}
+        record.update(data)
+        if TELEMETRY_ENCODING == "binary":
+            record["type"] = kind
+            payload = self.encoder.encode([record])
+        else:
+            payload = json.dumps(record)
+        self.mqtt.publish(f"{MQTT_PREFIX}/{self.device_id}/{kind}", payload,
+                          retain=True, qos=1)
+    
+    def queue_depth(self):
+        """Get the number of samples waiting to be sent"""
+        if self.mqtt is None:
+            return self.telemetry.depth()
+        return len(self.mqtt.queue)
+    
+    def poll_telemetry(self):
+        """Upload queued samples when a batch is due (call from the run loop)
+        
+        With MQTT, keeps the broker connection alive and handles incoming
+        messages instead.
+        
+        Returns:
+            int: Samples uploaded (packets handled with MQTT)
+        """
+        if self.mqtt is None:
+            return self.telemetry.poll()
+        if not self.is_wifi_connected():
+            return 0
+        return self.mqtt.poll()